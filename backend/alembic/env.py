@@ -0,0 +1,64 @@
+"""Alembic environment: runs migrations over the app's async engine settings."""
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import pool
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.db.base import Base
+
+# Import all models so they're registered with Base
+from app.models.user import User
+from app.models.parking_spot import ParkingSpot, AvailabilitySlot
+from app.models.booking import Booking
+from app.models.payment import Payment, Payout, StripeEvent
+from app.models.review import Review
+from app.models.outbox import OutboxMessage
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# DDL (CREATE INDEX CONCURRENTLY, partition setup) shouldn't go through PgBouncer
+MIGRATION_URL = settings.DATABASE_DIRECT_URL or settings.DATABASE_URL
+
+
+def run_migrations_offline():
+    """Emit SQL to stdout instead of running it (alembic upgrade --sql)."""
+    context.configure(
+        url=MIGRATION_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online():
+    # NullPool: a one-shot migration run shouldn't hold pooled connections
+    connectable = create_async_engine(MIGRATION_URL, poolclass=pool.NullPool)
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await connectable.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
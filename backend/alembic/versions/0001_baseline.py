@@ -0,0 +1,205 @@
+"""Baseline schema (what init_db.py has been creating)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+The tables as init_db.py's create_all built them before migrations existed,
+spelled out so this revision never changes with the models; later schema
+changes are their own revisions. Databases created by that init_db.py
+already have all of it, so for them this revision only records itself.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.types import GUID
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Enum columns store member names
+USER_ROLES = ("OWNER", "RENTER", "ADMIN")
+SPOT_TYPES = ("INDOOR", "OUTDOOR", "COVERED", "GARAGE", "DRIVEWAY", "LOT")
+VEHICLE_SIZES = ("MOTORCYCLE", "COMPACT", "STANDARD", "LARGE", "OVERSIZED")
+BOOKING_STATUSES = ("PENDING", "CONFIRMED", "IN_PROGRESS", "COMPLETED", "CANCELLED", "REFUNDED")
+PAYMENT_STATUSES = ("PENDING", "PROCESSING", "SUCCEEDED", "FAILED", "REFUNDED", "PARTIALLY_REFUNDED")
+PAYOUT_STATUSES = ("PENDING", "PROCESSING", "PAID", "FAILED")
+
+
+def _timestamps():
+    return [
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    ]
+
+
+def upgrade():
+    bind = op.get_bind()
+    if sa.inspect(bind).has_table("users"):
+        # Created by the pre-migration init_db.py: the baseline is already in place
+        return
+
+    op.create_table(
+        "users",
+        sa.Column("id", GUID(), primary_key=True),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("hashed_password", sa.String(255), nullable=True),
+        sa.Column("full_name", sa.String(255), nullable=False),
+        sa.Column("phone_number", sa.String(20), nullable=True),
+        sa.Column("profile_image", sa.String(500), nullable=True),
+        sa.Column("role", sa.Enum(*USER_ROLES, name="userrole"), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_verified", sa.Boolean(), nullable=True),
+        sa.Column("oauth_provider", sa.String(50), nullable=True),
+        sa.Column("oauth_id", sa.String(255), nullable=True),
+        sa.Column("stripe_customer_id", sa.String(255), nullable=True),
+        sa.Column("latitude", sa.Float(), nullable=True),
+        sa.Column("longitude", sa.Float(), nullable=True),
+        *_timestamps(),
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_oauth_id", "users", ["oauth_id"])
+
+    op.create_table(
+        "parking_spots",
+        sa.Column("id", GUID(), primary_key=True),
+        sa.Column("owner_id", GUID(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("title", sa.String(255), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("spot_type", sa.Enum(*SPOT_TYPES, name="parkingspottype"), nullable=True),
+        sa.Column("vehicle_size", sa.Enum(*VEHICLE_SIZES, name="vehiclesize"), nullable=True),
+        sa.Column("address", sa.String(500), nullable=False),
+        sa.Column("city", sa.String(100), nullable=False),
+        sa.Column("prefecture", sa.String(100), nullable=False),
+        sa.Column("zip_code", sa.String(20), nullable=False),
+        sa.Column("country", sa.String(100), nullable=True),
+        sa.Column("latitude", sa.Float(), nullable=False),
+        sa.Column("longitude", sa.Float(), nullable=False),
+        sa.Column("hourly_rate", sa.Integer(), nullable=False),
+        sa.Column("daily_rate", sa.Integer(), nullable=True),
+        sa.Column("monthly_rate", sa.Integer(), nullable=True),
+        sa.Column("is_covered", sa.Boolean(), nullable=True),
+        sa.Column("has_ev_charging", sa.Boolean(), nullable=True),
+        sa.Column("has_security", sa.Boolean(), nullable=True),
+        sa.Column("has_lighting", sa.Boolean(), nullable=True),
+        sa.Column("is_handicap_accessible", sa.Boolean(), nullable=True),
+        sa.Column("images", sa.JSON(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_available", sa.Boolean(), nullable=True),
+        sa.Column("operating_hours", sa.JSON(), nullable=True),
+        sa.Column("access_instructions", sa.Text(), nullable=True),
+        sa.Column("total_bookings", sa.Integer(), nullable=True),
+        sa.Column("average_rating", sa.Float(), nullable=True),
+        sa.Column("total_reviews", sa.Integer(), nullable=True),
+        *_timestamps(),
+    )
+
+    op.create_table(
+        "availability_slots",
+        sa.Column("id", GUID(), primary_key=True),
+        sa.Column("parking_spot_id", GUID(), sa.ForeignKey("parking_spots.id"), nullable=False),
+        sa.Column("day_of_week", sa.Integer(), nullable=True),
+        sa.Column("specific_date", sa.String(10), nullable=True),
+        sa.Column("start_time", sa.String(5), nullable=False),
+        sa.Column("end_time", sa.String(5), nullable=False),
+        sa.Column("is_available", sa.Boolean(), nullable=True),
+        *_timestamps(),
+    )
+
+    op.create_table(
+        "bookings",
+        sa.Column("id", GUID(), primary_key=True),
+        sa.Column("user_id", GUID(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("parking_spot_id", GUID(), sa.ForeignKey("parking_spots.id"), nullable=False),
+        sa.Column("start_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("end_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("status", sa.Enum(*BOOKING_STATUSES, name="bookingstatus"), nullable=True),
+        sa.Column("total_amount", sa.Integer(), nullable=False),
+        sa.Column("service_fee", sa.Integer(), nullable=True),
+        sa.Column("owner_payout", sa.Integer(), nullable=True),
+        sa.Column("payment_intent_id", sa.String(255), nullable=True),
+        sa.Column("payment_status", sa.String(50), nullable=True),
+        sa.Column("vehicle_plate", sa.String(20), nullable=True),
+        sa.Column("vehicle_make", sa.String(50), nullable=True),
+        sa.Column("vehicle_model", sa.String(50), nullable=True),
+        sa.Column("vehicle_color", sa.String(30), nullable=True),
+        sa.Column("special_requests", sa.Text(), nullable=True),
+        sa.Column("cancellation_reason", sa.Text(), nullable=True),
+        sa.Column("checked_in_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("checked_out_at", sa.DateTime(timezone=True), nullable=True),
+        *_timestamps(),
+    )
+
+    op.create_table(
+        "payments",
+        sa.Column("id", GUID(), primary_key=True),
+        sa.Column("booking_id", GUID(), sa.ForeignKey("bookings.id"), nullable=False),
+        sa.Column("user_id", GUID(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("stripe_payment_intent_id", sa.String(255), nullable=True, unique=True),
+        sa.Column("stripe_charge_id", sa.String(255), nullable=True),
+        sa.Column("amount", sa.Integer(), nullable=False),
+        sa.Column("currency", sa.String(3), nullable=True),
+        sa.Column("status", sa.Enum(*PAYMENT_STATUSES, name="paymentstatus"), nullable=True),
+        sa.Column("refund_amount", sa.Integer(), nullable=True),
+        sa.Column("refund_reason", sa.Text(), nullable=True),
+        sa.Column("refunded_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("payment_method", sa.String(50), nullable=True),
+        sa.Column("last_four", sa.String(4), nullable=True),
+        sa.Column("card_brand", sa.String(20), nullable=True),
+        *_timestamps(),
+    )
+
+    op.create_table(
+        "payouts",
+        sa.Column("id", GUID(), primary_key=True),
+        sa.Column("owner_id", GUID(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("booking_id", GUID(), sa.ForeignKey("bookings.id"), nullable=True),
+        sa.Column("stripe_transfer_id", sa.String(255), nullable=True),
+        sa.Column("stripe_payout_id", sa.String(255), nullable=True),
+        sa.Column("amount", sa.Integer(), nullable=False),
+        sa.Column("currency", sa.String(3), nullable=True),
+        sa.Column("status", sa.Enum(*PAYOUT_STATUSES, name="payoutstatus"), nullable=True),
+        sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("failure_reason", sa.Text(), nullable=True),
+        *_timestamps(),
+    )
+
+    op.create_table(
+        "reviews",
+        sa.Column("id", GUID(), primary_key=True),
+        sa.Column("booking_id", GUID(), sa.ForeignKey("bookings.id"), nullable=False),
+        sa.Column("parking_spot_id", GUID(), sa.ForeignKey("parking_spots.id"), nullable=False),
+        sa.Column("reviewer_id", GUID(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("overall_rating", sa.Integer(), nullable=False),
+        sa.Column("cleanliness_rating", sa.Integer(), nullable=True),
+        sa.Column("accessibility_rating", sa.Integer(), nullable=True),
+        sa.Column("accuracy_rating", sa.Integer(), nullable=True),
+        sa.Column("value_rating", sa.Integer(), nullable=True),
+        sa.Column("title", sa.String(255), nullable=True),
+        sa.Column("comment", sa.Text(), nullable=True),
+        sa.Column("owner_response", sa.Text(), nullable=True),
+        sa.Column("owner_responded_at", sa.String(50), nullable=True),
+        sa.Column("helpful_count", sa.Integer(), nullable=True),
+        *_timestamps(),
+    )
+
+    if bind.dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+        op.execute("""
+            ALTER TABLE bookings
+            ADD CONSTRAINT no_overlapping_bookings
+            EXCLUDE USING gist (
+                parking_spot_id WITH =,
+                tstzrange(start_time, end_time, '[)') WITH &&
+            ) WHERE (status IN ('PENDING', 'CONFIRMED', 'IN_PROGRESS'))
+        """)
+
+
+def downgrade():
+    for table in ("reviews", "payouts", "payments", "bookings", "availability_slots", "parking_spots", "users"):
+        op.drop_table(table)
+    if op.get_bind().dialect.name == "postgresql":
+        for enum_name in ("payoutstatus", "paymentstatus", "bookingstatus", "vehiclesize", "parkingspottype", "userrole"):
+            op.execute(f"DROP TYPE IF EXISTS {enum_name}")
@@ -0,0 +1,75 @@
+"""Indexes for the hot query predicates
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+Each index matches the WHERE/ORDER BY of a specific endpoint or background
+sweep (see the comments next to __table_args__ in the models). Partial indexes
+only cover the booking statuses those queries filter on, so the long tail of
+completed and cancelled bookings doesn't bloat them.
+
+On PostgreSQL the indexes are built CONCURRENTLY so a deploy doesn't lock the
+bookings table against writes.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+ACTIVE_STATUSES = "status IN ('PENDING', 'CONFIRMED', 'IN_PROGRESS')"
+SWEEP_STATUSES = "status IN ('CONFIRMED', 'IN_PROGRESS')"
+
+# (name, table, columns, partial WHERE clause or None)
+INDEXES = [
+    ("ix_bookings_spot_active_window", "bookings", ["parking_spot_id", "start_time", "end_time"], ACTIVE_STATUSES),
+    ("ix_bookings_user_created", "bookings", ["user_id", "created_at"], None),
+    ("ix_bookings_spot_created", "bookings", ["parking_spot_id", "created_at"], None),
+    ("ix_bookings_status_end_time", "bookings", ["status", "end_time"], SWEEP_STATUSES),
+    ("ix_bookings_confirmed_start_time", "bookings", ["start_time"], "status = 'CONFIRMED'"),
+    ("ix_bookings_payment_intent_id", "bookings", ["payment_intent_id"], "payment_intent_id IS NOT NULL"),
+    ("ix_reviews_spot_created", "reviews", ["parking_spot_id", "created_at"], None),
+    ("ix_reviews_booking_id", "reviews", ["booking_id"], None),
+    ("ix_payments_user_created", "payments", ["user_id", "created_at"], None),
+    ("ix_payouts_owner_status", "payouts", ["owner_id", "status", "processed_at"], None),
+    ("ix_payouts_owner_created", "payouts", ["owner_id", "created_at"], None),
+    ("ix_parking_spots_owner_id", "parking_spots", ["owner_id"], None),
+    ("ix_availability_slots_parking_spot_id", "availability_slots", ["parking_spot_id"], None),
+]
+
+
+def _create_indexes(concurrently: bool):
+    for name, table, columns, where in INDEXES:
+        clause = sa.text(where) if where else None
+        op.create_index(
+            name, table, columns,
+            if_not_exists=True,
+            postgresql_where=clause,
+            sqlite_where=clause,
+            postgresql_concurrently=concurrently,
+        )
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction
+        with op.get_context().autocommit_block():
+            _create_indexes(concurrently=True)
+    else:
+        _create_indexes(concurrently=False)
+
+
+def _drop_indexes(concurrently: bool):
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=concurrently)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            _drop_indexes(concurrently=True)
+    else:
+        _drop_indexes(concurrently=False)
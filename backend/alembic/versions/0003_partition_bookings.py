@@ -0,0 +1,209 @@
+"""Partition bookings by archive state and start month
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+Layout on PostgreSQL:
+
+    bookings                      PARTITION BY LIST (archived)
+      bookings_active             FOR VALUES IN (false), PARTITION BY RANGE (start_time)
+        bookings_YYYY_MM          one per month, plus bookings_active_default
+      bookings_archive            FOR VALUES IN (true), PARTITION BY RANGE (start_time)
+        bookings_archive_YYYY_MM  one per month, plus bookings_archive_default
+
+Finished bookings are moved to the archive side by flipping `archived`
+(see app/db/partitions.py), so availability checks and the background sweeps
+only touch the small live partitions and vacuum work stays proportional to
+recent activity.
+
+PostgreSQL can't enforce an exclusion constraint across partitions, so
+no_overlapping_bookings becomes one constraint per live partition. A booking
+that straddles a month boundary is still protected by create_booking (and
+update_booking_status, when it makes a booking active again) locking the
+spot row before its conflict check.
+
+The primary key must contain the partition keys, so it becomes
+(id, archived, start_time) and bookings.id can no longer be the target of a
+foreign key: the FKs from reviews, payments and payouts are dropped (the ORM
+relationships are unaffected). Revision 0007 restores id uniqueness and those
+FKs through a trigger-maintained booking_ids table.
+
+This rewrites the bookings table; run it in a maintenance window.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+ACTIVE_STATUSES = "status IN (''PENDING'', ''CONFIRMED'', ''IN_PROGRESS'')"
+
+# Creates the live and archive month partitions for [from_month, to_month]
+# that don't exist yet. Rows that already landed in a default partition for
+# one of those months are moved out first, otherwise the new partition can't
+# be created. Returns the number of partitions created.
+ENSURE_PARTITIONS_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION ensure_booking_partitions(from_month date, to_month date)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month date := date_trunc('month', from_month)::date;
+    lo text;
+    hi text;
+    side text;
+    part text;
+    parked boolean;
+    created integer := 0;
+BEGIN
+    WHILE month <= to_month LOOP
+        lo := month::text || ' 00:00:00+00';
+        hi := (month + interval '1 month')::date::text || ' 00:00:00+00';
+        FOREACH side IN ARRAY ARRAY['active', 'archive'] LOOP
+            part := CASE side WHEN 'active' THEN 'bookings_' ELSE 'bookings_archive_' END
+                    || to_char(month, 'YYYY_MM');
+            CONTINUE WHEN to_regclass(part) IS NOT NULL;
+
+            EXECUTE format(
+                'SELECT EXISTS (SELECT 1 FROM %I WHERE start_time >= %L AND start_time < %L)',
+                'bookings_' || side || '_default', lo, hi
+            ) INTO parked;
+            IF parked THEN
+                CREATE TEMP TABLE _parked_bookings (LIKE bookings);
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM %I WHERE start_time >= %L AND start_time < %L RETURNING *)
+                     INSERT INTO _parked_bookings SELECT * FROM moved',
+                    'bookings_' || side || '_default', lo, hi
+                );
+            END IF;
+
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                part, 'bookings_' || side, lo, hi
+            );
+            IF side = 'active' THEN
+                EXECUTE format(
+                    'ALTER TABLE %I ADD CONSTRAINT %I EXCLUDE USING gist (
+                        parking_spot_id WITH =, tstzrange(start_time, end_time, ''[)'') WITH &&
+                     ) WHERE ({ACTIVE_STATUSES})',
+                    part, part || '_no_overlap'
+                );
+            END IF;
+
+            IF parked THEN
+                INSERT INTO bookings SELECT * FROM _parked_bookings;
+                DROP TABLE _parked_bookings;
+            END IF;
+            created := created + 1;
+        END LOOP;
+        month := (month + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END $$;
+"""
+
+# FKs into bookings.id that a partitioned bookings table can't back
+REFERENCING_FKS = [
+    ("reviews", "booking_id"),
+    ("payments", "booking_id"),
+    ("payouts", "booking_id"),
+]
+
+
+# The bookings indexes from 0002; LIKE doesn't copy them to the new table.
+# (name, columns, partial WHERE clause or None)
+BOOKING_INDEXES = [
+    ("ix_bookings_spot_active_window", ["parking_spot_id", "start_time", "end_time"],
+     ACTIVE_STATUSES.replace("''", "'")),
+    ("ix_bookings_user_created", ["user_id", "created_at"], None),
+    ("ix_bookings_spot_created", ["parking_spot_id", "created_at"], None),
+    ("ix_bookings_status_end_time", ["status", "end_time"], "status IN ('CONFIRMED', 'IN_PROGRESS')"),
+    ("ix_bookings_confirmed_start_time", ["start_time"], "status = 'CONFIRMED'"),
+    ("ix_bookings_payment_intent_id", ["payment_intent_id"], "payment_intent_id IS NOT NULL"),
+]
+
+
+def _create_booking_indexes():
+    for name, columns, where in BOOKING_INDEXES:
+        op.create_index(name, "bookings", columns, postgresql_where=sa.text(where) if where else None)
+
+
+def upgrade():
+    bind = op.get_bind()
+    op.add_column(
+        "bookings",
+        sa.Column("archived", sa.Boolean(), nullable=False, server_default=sa.false())
+    )
+
+    if bind.dialect.name != "postgresql":
+        # SQLite dev databases stay a plain table; archival just flips the flag
+        return
+
+    op.execute("ALTER TABLE bookings RENAME TO bookings_unpartitioned")
+    op.execute("""
+        CREATE TABLE bookings (LIKE bookings_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY LIST (archived)
+    """)
+    op.execute("""
+        CREATE TABLE bookings_active PARTITION OF bookings
+        FOR VALUES IN (false) PARTITION BY RANGE (start_time)
+    """)
+    op.execute("""
+        CREATE TABLE bookings_archive PARTITION OF bookings
+        FOR VALUES IN (true) PARTITION BY RANGE (start_time)
+    """)
+    op.execute("CREATE TABLE bookings_active_default PARTITION OF bookings_active DEFAULT")
+    op.execute("CREATE TABLE bookings_archive_default PARTITION OF bookings_archive DEFAULT")
+    op.execute(f"""
+        ALTER TABLE bookings_active_default ADD CONSTRAINT bookings_active_default_no_overlap
+        EXCLUDE USING gist (
+            parking_spot_id WITH =, tstzrange(start_time, end_time, '[)') WITH &&
+        ) WHERE ({ACTIVE_STATUSES.replace("''", "'")})
+    """)
+
+    op.execute(ENSURE_PARTITIONS_FUNCTION)
+    op.execute("""
+        SELECT ensure_booking_partitions(
+            COALESCE((SELECT min(start_time) FROM bookings_unpartitioned), now())::date,
+            (now() + interval '12 months')::date
+        )
+    """)
+
+    op.execute("INSERT INTO bookings SELECT * FROM bookings_unpartitioned")
+    # CASCADE drops the FKs from reviews/payments/payouts and no_overlapping_bookings
+    op.execute("DROP TABLE bookings_unpartitioned CASCADE")
+
+    op.execute("ALTER TABLE bookings ADD PRIMARY KEY (id, archived, start_time)")
+    op.execute("ALTER TABLE bookings ADD FOREIGN KEY (user_id) REFERENCES users (id)")
+    op.execute("ALTER TABLE bookings ADD FOREIGN KEY (parking_spot_id) REFERENCES parking_spots (id)")
+    _create_booking_indexes()
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("""
+            CREATE TABLE bookings_unpartitioned
+            (LIKE bookings INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        """)
+        op.execute("INSERT INTO bookings_unpartitioned SELECT * FROM bookings")
+        op.execute("DROP TABLE bookings CASCADE")
+        op.execute("DROP FUNCTION IF EXISTS ensure_booking_partitions(date, date)")
+        op.execute("ALTER TABLE bookings_unpartitioned RENAME TO bookings")
+
+        op.execute("ALTER TABLE bookings ADD PRIMARY KEY (id)")
+        op.execute("ALTER TABLE bookings ADD FOREIGN KEY (user_id) REFERENCES users (id)")
+        op.execute("ALTER TABLE bookings ADD FOREIGN KEY (parking_spot_id) REFERENCES parking_spots (id)")
+        for table, column in REFERENCING_FKS:
+            op.execute(f"ALTER TABLE {table} ADD FOREIGN KEY ({column}) REFERENCES bookings (id)")
+        op.execute(f"""
+            ALTER TABLE bookings ADD CONSTRAINT no_overlapping_bookings
+            EXCLUDE USING gist (
+                parking_spot_id WITH =, tstzrange(start_time, end_time, '[)') WITH &&
+            ) WHERE ({ACTIVE_STATUSES.replace("''", "'")})
+        """)
+        _create_booking_indexes()
+
+    with op.batch_alter_table("bookings") as batch:
+        batch.drop_column("archived")
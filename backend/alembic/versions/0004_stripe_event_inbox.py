@@ -0,0 +1,43 @@
+"""Inbox table for Stripe webhook events
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+The webhook endpoint stores each verified event in stripe_events (keyed by
+Stripe's event id, so redeliveries are ignored) and acknowledges it; a
+background consumer applies pending events in batches. The partial index
+covers only unprocessed events, so it stays small however long processed
+events are retained.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "stripe_events",
+        sa.Column("id", sa.String(255), primary_key=True),
+        sa.Column("type", sa.String(100), nullable=False),
+        sa.Column("object_id", sa.String(255), nullable=True),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("stripe_created", sa.Integer(), nullable=False),
+        sa.Column("received_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("attempts", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+    )
+    pending = sa.text("processed_at IS NULL")
+    op.create_index(
+        "ix_stripe_events_pending", "stripe_events", ["received_at"],
+        postgresql_where=pending, sqlite_where=pending
+    )
+
+
+def downgrade():
+    op.drop_table("stripe_events")
@@ -0,0 +1,42 @@
+"""Transactional outbox for booking and payment side effects
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+Handlers write cache invalidations and payout creation to the outbox table
+in the same transaction as the booking or payment change; app/outbox.py
+delivers them in batches. The partial index covers only undelivered
+messages.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "outbox",
+        # INTEGER on SQLite so it autoincrements
+        sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True, autoincrement=True),
+        sa.Column("kind", sa.String(50), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("available_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("dispatched_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("attempts", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+    )
+    pending = sa.text("dispatched_at IS NULL")
+    op.create_index(
+        "ix_outbox_pending", "outbox", ["id"],
+        postgresql_where=pending, sqlite_where=pending
+    )
+
+
+def downgrade():
+    op.drop_table("outbox")
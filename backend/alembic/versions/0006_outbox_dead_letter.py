@@ -0,0 +1,52 @@
+"""Dead-letter exhausted outbox messages
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+A message that failed OUTBOX_MAX_ATTEMPTS times used to stay undelivered
+forever: it kept its place in ix_outbox_pending, was rescanned on every poll
+and never purged. Such messages now get dead_lettered_at, drop out of the
+pending index and are purged after OUTBOX_RETENTION_HOURS like delivered ones.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+# OUTBOX_MAX_ATTEMPTS's default when this revision was written; a literal so
+# the backfill doesn't depend on the environment of the host running it
+MAX_ATTEMPTS = 10
+
+
+def upgrade():
+    op.add_column("outbox", sa.Column("dead_lettered_at", sa.DateTime(timezone=True), nullable=True))
+    # Database effects already given up on; cache effects are retried until
+    # delivered (app/outbox.py)
+    op.execute(
+        sa.text(
+            "UPDATE outbox SET dead_lettered_at = CURRENT_TIMESTAMP "
+            "WHERE dispatched_at IS NULL AND attempts >= :max_attempts "
+            "AND kind NOT IN ('spot.invalidate', 'spot.refresh')"
+        ).bindparams(max_attempts=MAX_ATTEMPTS)
+    )
+    op.drop_index("ix_outbox_pending", table_name="outbox")
+    pending = sa.text("dispatched_at IS NULL AND dead_lettered_at IS NULL")
+    op.create_index(
+        "ix_outbox_pending", "outbox", ["id"],
+        postgresql_where=pending, sqlite_where=pending
+    )
+
+
+def downgrade():
+    op.drop_index("ix_outbox_pending", table_name="outbox")
+    pending = sa.text("dispatched_at IS NULL")
+    op.create_index(
+        "ix_outbox_pending", "outbox", ["id"],
+        postgresql_where=pending, sqlite_where=pending
+    )
+    with op.batch_alter_table("outbox") as batch:
+        batch.drop_column("dead_lettered_at")
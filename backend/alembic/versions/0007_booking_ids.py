@@ -0,0 +1,177 @@
+"""Anchor booking ids for uniqueness and foreign keys
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+
+Revision 0003 partitioned bookings with the primary key (id, archived,
+start_time), which left bookings.id without a unique constraint and dropped
+the foreign keys from reviews, payments and payouts. booking_ids holds one
+row per booking id, maintained by triggers on bookings:
+
+  • an insert adds the id, so a duplicate booking id fails with a unique
+    violation just as it did before partitioning
+  • a delete removes it, so deleting a booking that is still referenced
+    fails the foreign key check just as it did before
+  • an update that moves a row to another partition (archival flipping
+    `archived`, a start_time changing month) runs as a delete plus an insert
+    on the partitions; the id is flagged by the BEFORE UPDATE trigger so
+    that pair leaves booking_ids alone
+  • ensure_booking_partitions moving rows out of a default partition sets
+    bookings.keep_ids for the same reason
+
+The foreign keys from reviews, payments and payouts point at booking_ids.
+Needs PostgreSQL 13+ (row-level BEFORE triggers on partitioned tables).
+Existing rows that reference missing bookings make this migration fail; fix
+or delete them first.
+"""
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+REFERENCING_FKS = [
+    ("reviews", "booking_id"),
+    ("payments", "booking_id"),
+    ("payouts", "booking_id"),
+]
+
+ACTIVE_STATUSES = "status IN (''PENDING'', ''CONFIRMED'', ''IN_PROGRESS'')"
+
+SYNC_FUNCTION = """
+CREATE OR REPLACE FUNCTION booking_ids_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_WHEN = 'AFTER' THEN
+        -- An update that stayed in its partition: nothing to skip any more
+        PERFORM set_config('bookings.moving_id', '', true);
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        IF NEW.id <> OLD.id THEN
+            RAISE EXCEPTION 'bookings.id can not be changed' USING ERRCODE = 'integrity_constraint_violation';
+        END IF;
+        -- If the row changes partition, the delete and insert that follow are this move
+        PERFORM set_config('bookings.moving_id', OLD.id::text, true);
+        RETURN NEW;
+    END IF;
+    IF current_setting('bookings.keep_ids', true) = 'on' THEN
+        RETURN CASE TG_OP WHEN 'DELETE' THEN OLD ELSE NEW END;
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        IF current_setting('bookings.moving_id', true) IS DISTINCT FROM OLD.id::text THEN
+            DELETE FROM booking_ids WHERE id = OLD.id;
+        END IF;
+        RETURN OLD;
+    END IF;
+    IF current_setting('bookings.moving_id', true) = NEW.id::text THEN
+        PERFORM set_config('bookings.moving_id', '', true);
+    ELSE
+        INSERT INTO booking_ids (id) VALUES (NEW.id);
+    END IF;
+    RETURN NEW;
+END $$;
+"""
+
+# ensure_booking_partitions from 0003, with bookings.keep_ids set while rows
+# parked in a default partition are moved to their new month partition
+ENSURE_PARTITIONS_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION ensure_booking_partitions(from_month date, to_month date)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month date := date_trunc('month', from_month)::date;
+    lo text;
+    hi text;
+    side text;
+    part text;
+    parked boolean;
+    created integer := 0;
+BEGIN
+    WHILE month <= to_month LOOP
+        lo := month::text || ' 00:00:00+00';
+        hi := (month + interval '1 month')::date::text || ' 00:00:00+00';
+        FOREACH side IN ARRAY ARRAY['active', 'archive'] LOOP
+            part := CASE side WHEN 'active' THEN 'bookings_' ELSE 'bookings_archive_' END
+                    || to_char(month, 'YYYY_MM');
+            CONTINUE WHEN to_regclass(part) IS NOT NULL;
+
+            EXECUTE format(
+                'SELECT EXISTS (SELECT 1 FROM %I WHERE start_time >= %L AND start_time < %L)',
+                'bookings_' || side || '_default', lo, hi
+            ) INTO parked;
+            IF parked THEN
+                PERFORM set_config('bookings.keep_ids', 'on', true);
+                CREATE TEMP TABLE _parked_bookings (LIKE bookings);
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM %I WHERE start_time >= %L AND start_time < %L RETURNING *)
+                     INSERT INTO _parked_bookings SELECT * FROM moved',
+                    'bookings_' || side || '_default', lo, hi
+                );
+            END IF;
+
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                part, 'bookings_' || side, lo, hi
+            );
+            IF side = 'active' THEN
+                EXECUTE format(
+                    'ALTER TABLE %I ADD CONSTRAINT %I EXCLUDE USING gist (
+                        parking_spot_id WITH =, tstzrange(start_time, end_time, ''[)'') WITH &&
+                     ) WHERE ({ACTIVE_STATUSES})',
+                    part, part || '_no_overlap'
+                );
+            END IF;
+
+            IF parked THEN
+                INSERT INTO bookings SELECT * FROM _parked_bookings;
+                DROP TABLE _parked_bookings;
+                PERFORM set_config('bookings.keep_ids', 'off', true);
+            END IF;
+            created := created + 1;
+        END LOOP;
+        month := (month + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END $$;
+"""
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        # Unpartitioned: bookings.id is still the primary key the FKs reference
+        return
+
+    op.execute("CREATE TABLE booking_ids (id uuid PRIMARY KEY)")
+    op.execute("INSERT INTO booking_ids (id) SELECT id FROM bookings")
+
+    op.execute(SYNC_FUNCTION)
+    op.execute("""
+        CREATE TRIGGER booking_ids_sync BEFORE INSERT OR UPDATE OR DELETE ON bookings
+        FOR EACH ROW EXECUTE FUNCTION booking_ids_sync()
+    """)
+    op.execute("""
+        CREATE TRIGGER booking_ids_sync_done AFTER UPDATE ON bookings
+        FOR EACH ROW EXECUTE FUNCTION booking_ids_sync()
+    """)
+    op.execute(ENSURE_PARTITIONS_FUNCTION)
+
+    for table, column in REFERENCING_FKS:
+        op.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey "
+            f"FOREIGN KEY ({column}) REFERENCES booking_ids (id)"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    for table, column in REFERENCING_FKS:
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {table}_{column}_fkey")
+    op.execute("DROP TRIGGER booking_ids_sync_done ON bookings")
+    op.execute("DROP TRIGGER booking_ids_sync ON bookings")
+    op.execute("DROP FUNCTION booking_ids_sync()")
+    op.execute("DROP TABLE booking_ids")
+    # Back to 0003's ensure_booking_partitions; its keep_ids calls are harmless
+    # without the triggers, so the function is left as is
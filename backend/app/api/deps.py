@@ -1,48 +1,152 @@
+import uuid
+from typing import Optional, Tuple
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from app.db.session import get_db
 from app.models.user import User, UserRole
-from app.core.security import decode_token
+from app.core.security import decode_token, user_version
 from app.core.config import settings
+from app.cache import parse_entity_id
+from app.user_cache import load_user, tokens_revoked
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
-) -> User:
-    """Get current authenticated user."""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"}
     )
-    
+
+def _inactive_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Inactive user"
+    )
+
+def _access_payload(token: str) -> Tuple[dict, uuid.UUID]:
+    """Decoded access token and its subject, or 401."""
     payload = decode_token(token)
     if not payload or payload.get("type") != "access":
-        raise credentials_exception
-    
-    user_id = payload.get("sub")
+        raise _credentials_exception()
+
+    user_id = parse_entity_id(payload.get("sub"))
     if not user_id:
-        raise credentials_exception
-    
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
-    
+        raise _credentials_exception()
+    return payload, user_id
+
+class AuthClaims:
+    """
+    The caller as described by a claims-mode access token.
+
+    Carries what read routes authorize on (id, role) without loading the
+    user; routes that change data keep depending on get_current_user.
+    """
+
+    def __init__(self, id: uuid.UUID, role: UserRole, is_active: bool, version: int):
+        self.id = id
+        self.role = role
+        self.is_active = is_active
+        self.version = version
+
+    @classmethod
+    def from_payload(cls, user_id: uuid.UUID, payload: dict) -> Optional["AuthClaims"]:
+        if "role" not in payload or "ver" not in payload:
+            return None
+        try:
+            role = UserRole(payload["role"])
+        except ValueError:
+            return None
+        return cls(user_id, role, bool(payload.get("active", True)), int(payload["ver"]))
+
+    @classmethod
+    def from_user(cls, user: User) -> "AuthClaims":
+        return cls(user.id, user.role, bool(user.is_active), user_version(user))
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """Get current authenticated user."""
+    payload, user_id = _access_payload(token)
+
+    # Usually served from the user snapshot cache, without a query
+    user = await load_user(db, user_id)
+
     if not user:
-        raise credentials_exception
-    
+        raise _credentials_exception()
+
     if not user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Inactive user"
-        )
-    
+        raise _inactive_exception()
+
+    # Claims-mode tokens issued before a password change or deactivation
+    if "ver" in payload and await tokens_revoked(user_id, payload["ver"]):
+        raise _credentials_exception()
+
     return user
 
+async def get_token_claims(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> AuthClaims:
+    """
+    Authorize from the access token's claims alone (no DB, no Redis).
+
+    Tokens without claims (AUTH_TOKEN_CLAIMS off, or issued before it was
+    turned on) fall back to the user lookup. Revocations are not checked
+    here; claims tokens live ACCESS_TOKEN_EXPIRE_MINUTES at most. Routes that
+    must honour them right away use get_unrevoked_claims.
+    """
+    payload, user_id = _access_payload(token)
+    claims = AuthClaims.from_payload(user_id, payload)
+    if claims is None:
+        user = await load_user(db, user_id)
+        if not user:
+            raise _credentials_exception()
+        claims = AuthClaims.from_user(user)
+
+    if not claims.is_active:
+        raise _inactive_exception()
+    return claims
+
+async def get_unrevoked_claims(
+    claims: AuthClaims = Depends(get_token_claims)
+) -> AuthClaims:
+    """
+    get_token_claims plus the revocation check (one Redis GET).
+
+    For read routes exposing sensitive data (payment history, payouts), which
+    must stop answering as soon as a password change or deactivation
+    revokes the caller's tokens.
+    """
+    if await tokens_revoked(claims.id, claims.version):
+        raise _credentials_exception()
+    return claims
+
+async def get_owner_claims(
+    claims: AuthClaims = Depends(get_unrevoked_claims),
+    db: AsyncSession = Depends(get_db)
+) -> AuthClaims:
+    """
+    get_unrevoked_claims for owner-only read routes; 403 unless owner or admin.
+
+    Owners are authorized from the token alone. A non-owner role is confirmed
+    against the user first: listing a first spot promotes a renter to owner,
+    and tokens issued before that still say renter.
+    """
+    if claims.role not in (UserRole.OWNER, UserRole.ADMIN):
+        user = await load_user(db, claims.id)
+        if not user or user.role not in (UserRole.OWNER, UserRole.ADMIN):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized. Owner access required."
+            )
+        claims.role = user.role
+    return claims
+
 async def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -0,0 +1,49 @@
+"""HTTP conditional GET helpers (ETag / If-None-Match / Cache-Control)."""
+import hashlib
+from typing import Optional
+from fastapi import Request, Response, status
+
+from app.core.config import settings
+
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from the version parts of a response."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """Check whether the client's If-None-Match already names this ETag."""
+    if not etag:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison per RFC 9110 §13.1.2 (proxies may add the W/ prefix)
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates
+
+
+def cache_control(max_age: Optional[int] = None) -> str:
+    """Cache-Control value for public, revalidatable responses."""
+    if max_age is None:
+        max_age = settings.HTTP_CACHE_MAX_AGE
+    return f"public, max-age={max_age}, must-revalidate"
+
+
+def apply_cache_headers(response: Response, etag: Optional[str], max_age: Optional[int] = None):
+    """Attach ETag and Cache-Control headers to an outgoing response."""
+    if not etag:
+        return
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control(max_age)
+
+
+def not_modified(etag: str, max_age: Optional[int] = None) -> Response:
+    """Empty 304 response carrying the validators the client should keep."""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": cache_control(max_age)},
+    )
@@ -11,12 +11,20 @@ from app.schemas.user import (
 )
 from app.core.security import (
     get_password_hash_async, verify_password_async,
-    create_access_token, create_refresh_token, decode_token
+    create_user_access_token, decode_token
 )
+from app.core.passwords import needs_rehash, password_hasher
+from app.cache import parse_entity_id
+from app.rate_limit import rate_limit
+from app.refresh_tokens import (
+    issue_refresh_token, rotate_refresh_token, check_unfamilied_token, revoke_family,
+    RefreshTokenRejected, RefreshStoreUnavailable
+)
+from app.user_cache import load_user
 
 router = APIRouter()
 
-@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(rate_limit("register"))])
 async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user."""
     # Check if user already exists
@@ -44,7 +52,7 @@ async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
     
     return user
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(rate_limit("login"))])
 async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
     """Login and get access token."""
     result = await db.execute(select(User).where(User.email == login_data.email))
@@ -63,25 +71,63 @@ async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
             detail="User account is inactive"
         )
     
+    # Upgrade hashes made with an older BCRYPT_ROUNDS while we have the plain password;
+    # skipped when the hashing pool is backed up, the next login will do it
+    if needs_rehash(user.hashed_password) and not password_hasher.busy():
+        user.hashed_password = await get_password_hash_async(login_data.password)
+    
     return Token(
-        access_token=create_access_token(str(user.id)),
-        refresh_token=create_refresh_token(str(user.id))
+        access_token=create_user_access_token(user),
+        refresh_token=await issue_refresh_token(user.id)
     )
 
-@router.post("/refresh", response_model=Token)
+def _invalid_refresh_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token"
+    )
+
+def _refresh_unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Token refresh temporarily unavailable",
+        headers={"Retry-After": "5"}
+    )
+
+@router.post("/refresh", response_model=Token, dependencies=[Depends(rate_limit("refresh"))])
 async def refresh_token(token_data: RefreshTokenRequest, db: AsyncSession = Depends(get_db)):
-    """Refresh access token using refresh token."""
+    """Refresh access token using refresh token (rotates the refresh token)."""
     payload = decode_token(token_data.refresh_token)
     
     if not payload or payload.get("type") != "refresh":
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid refresh token"
-        )
+        raise _invalid_refresh_token()
     
-    user_id = payload.get("sub")
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    user_id = parse_entity_id(payload.get("sub"))
+    if user_id is None:
+        raise _invalid_refresh_token()
+    
+    if payload.get("fam"):
+        # Validated and rotated in Redis; the user comes from the user cache.
+        # Without Redis a revoked or copied token can't be told apart: 503.
+        try:
+            new_refresh_token = await rotate_refresh_token(payload)
+        except RefreshTokenRejected:
+            raise _invalid_refresh_token()
+        except RefreshStoreUnavailable:
+            raise _refresh_unavailable()
+        user = await load_user(db, user_id)
+    else:
+        # Issued without Redis, or from before families: checked against the
+        # user's revocation time, then moved into a new family if Redis is up
+        try:
+            await check_unfamilied_token(payload)
+        except RefreshTokenRejected:
+            raise _invalid_refresh_token()
+        except RefreshStoreUnavailable:
+            raise _refresh_unavailable()
+        result = await db.execute(select(User).where(User.id == user_id))
+        user = result.scalar_one_or_none()
+        new_refresh_token = None
     
     if not user or not user.is_active:
         raise HTTPException(
@@ -90,11 +136,23 @@ async def refresh_token(token_data: RefreshTokenRequest, db: AsyncSession = Depe
         )
     
     return Token(
-        access_token=create_access_token(str(user.id)),
-        refresh_token=create_refresh_token(str(user.id))
+        access_token=create_user_access_token(user),
+        refresh_token=new_refresh_token or await issue_refresh_token(user.id)
     )
 
-@router.post("/forgot-password")
+@router.post("/logout", dependencies=[Depends(rate_limit("refresh"))])
+async def logout(token_data: RefreshTokenRequest):
+    """Revoke the refresh token's family, ending this login session."""
+    payload = decode_token(token_data.refresh_token)
+    
+    if not payload or payload.get("type") != "refresh":
+        raise _invalid_refresh_token()
+    
+    await revoke_family(payload)
+    
+    return {"message": "Logged out successfully"}
+
+@router.post("/forgot-password", dependencies=[Depends(rate_limit("forgot_password"))])
 async def forgot_password(data: PasswordReset, db: AsyncSession = Depends(get_db)):
     """Send password reset email."""
     result = await db.execute(select(User).where(User.email == data.email))
@@ -7,6 +7,7 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 
 from app.db.session import get_db
+from app.db.budget import db_budget
 from app.models.user import User, UserRole
 from app.models.parking_spot import ParkingSpot
 from app.models.booking import Booking, BookingStatus
@@ -14,14 +15,57 @@ from app.schemas.booking import (
     BookingCreate, BookingUpdate, BookingResponse, 
     BookingStatusUpdate, BookingPriceCalculation, BookingPriceResponse
 )
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_token_claims, get_owner_claims, AuthClaims
 from app.core.config import settings
-from app.cache import invalidate_spot_cache, invalidate_search_cache
+from app.outbox import emit
 
 router = APIRouter()
 
 SERVICE_FEE_PERCENT = 0.10  # 10% service fee
 
+# Hot query statements, also EXPLAINed by check_query_plans.py
+
+ACTIVE_STATUSES = [BookingStatus.PENDING, BookingStatus.CONFIRMED, BookingStatus.IN_PROGRESS]
+
+def conflicting_bookings_query(spot_id, start_time: datetime, end_time: datetime):
+    """Live bookings holding the spot at any point of [start_time, end_time), locked."""
+    return select(Booking).where(
+        and_(
+            Booking.parking_spot_id == spot_id,
+            Booking.archived == False,
+            Booking.status.in_(ACTIVE_STATUSES),
+            or_(
+                and_(
+                    Booking.start_time <= start_time,
+                    Booking.end_time > start_time
+                ),
+                and_(
+                    Booking.start_time < end_time,
+                    Booking.end_time >= end_time
+                ),
+                and_(
+                    Booking.start_time >= start_time,
+                    Booking.end_time <= end_time
+                )
+            )
+        )
+    ).with_for_update()  # Lock rows to prevent race conditions
+
+def user_bookings_query(user_id, status_filter: BookingStatus | None = None):
+    query = select(Booking).where(Booking.user_id == user_id)
+    if status_filter:
+        query = query.where(Booking.status == status_filter)
+    return query.options(selectinload(Booking.parking_spot)).order_by(Booking.created_at.desc())
+
+def owner_spot_ids_query(owner_id):
+    return select(ParkingSpot.id).where(ParkingSpot.owner_id == owner_id)
+
+def spot_bookings_query(spot_ids, status_filter: BookingStatus | None = None):
+    query = select(Booking).where(Booking.parking_spot_id.in_(spot_ids))
+    if status_filter:
+        query = query.where(Booking.status == status_filter)
+    return query.options(selectinload(Booking.parking_spot)).order_by(Booking.created_at.desc())
+
 async def _load_booking(db: AsyncSession, booking_id) -> Booking:
     """Re-fetch booking with all relationships so response serialization never hits lazy-load."""
     result = await db.execute(
@@ -92,9 +136,11 @@ async def create_booking(
     db: AsyncSession = Depends(get_db)
 ):
     """Create a new booking."""
-    # Get parking spot
+    # Get parking spot, locked so concurrent bookings for it are serialized.
+    # The per-partition exclusion constraints can't see overlaps across a
+    # month boundary; this lock keeps the conflict check below authoritative.
     result = await db.execute(
-        select(ParkingSpot).where(ParkingSpot.id == booking_in.parking_spot_id)
+        select(ParkingSpot).where(ParkingSpot.id == booking_in.parking_spot_id).with_for_update()
     )
     spot = result.scalar_one_or_none()
     
@@ -126,26 +172,7 @@ async def create_booking(
     # The with_for_update() ensures no other transaction can read/modify these rows
     # until this transaction commits, preventing double bookings
     result = await db.execute(
-        select(Booking).where(
-            and_(
-                Booking.parking_spot_id == booking_in.parking_spot_id,
-                Booking.status.in_([BookingStatus.PENDING, BookingStatus.CONFIRMED, BookingStatus.IN_PROGRESS]),
-                or_(
-                    and_(
-                        Booking.start_time <= booking_in.start_time,
-                        Booking.end_time > booking_in.start_time
-                    ),
-                    and_(
-                        Booking.start_time < booking_in.end_time,
-                        Booking.end_time >= booking_in.end_time
-                    ),
-                    and_(
-                        Booking.start_time >= booking_in.start_time,
-                        Booking.end_time <= booking_in.end_time
-                    )
-                )
-            )
-        ).with_for_update()  # Lock rows to prevent race conditions
+        conflicting_bookings_query(booking_in.parking_spot_id, booking_in.start_time, booking_in.end_time)
     )
     conflicting = result.scalars().first()
     
@@ -192,6 +219,8 @@ async def create_booking(
     )
     
     db.add(booking)
+    # Availability changed: invalidated once the booking commits
+    emit(db, "spot.invalidate", spot_id=booking_in.parking_spot_id)
     try:
         await db.commit()
     except IntegrityError:
@@ -210,26 +239,17 @@ async def create_booking(
     )
     booking = result.scalar_one()
     
-    # Invalidate cache since booking affects availability
-    await invalidate_spot_cache(str(booking_in.parking_spot_id))
-    
     return booking
 
 @router.get("/", response_model=List[BookingResponse])
 async def list_my_bookings(
     status_filter: BookingStatus | None = None,
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: AuthClaims = Depends(get_token_claims),
+    # Bookings + selectinload of their spots
+    db: AsyncSession = Depends(db_budget(timeout_ms=2000, max_queries=2))
 ):
     """List bookings for current user."""
-    query = select(Booking).where(Booking.user_id == current_user.id)
-    
-    if status_filter:
-        query = query.where(Booking.status == status_filter)
-    
-    query = query.options(selectinload(Booking.parking_spot)).order_by(Booking.created_at.desc())
-    
-    result = await db.execute(query)
+    result = await db.execute(user_bookings_query(current_user.id, status_filter))
     bookings = result.scalars().all()
     
     return bookings
@@ -237,27 +257,19 @@ async def list_my_bookings(
 @router.get("/owner", response_model=List[BookingResponse])
 async def list_owner_bookings(
     status_filter: BookingStatus | None = None,
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: AuthClaims = Depends(get_owner_claims),
+    # Owner's spot IDs, bookings, selectinload of their spots
+    db: AsyncSession = Depends(db_budget(timeout_ms=2000, max_queries=3))
 ):
     """List bookings for spots owned by current user."""
     # Get owner's parking spots
-    spots_result = await db.execute(
-        select(ParkingSpot.id).where(ParkingSpot.owner_id == current_user.id)
-    )
+    spots_result = await db.execute(owner_spot_ids_query(current_user.id))
     spot_ids = [s[0] for s in spots_result.fetchall()]
     
     if not spot_ids:
         return []
     
-    query = select(Booking).where(Booking.parking_spot_id.in_(spot_ids))
-    
-    if status_filter:
-        query = query.where(Booking.status == status_filter)
-    
-    query = query.options(selectinload(Booking.parking_spot)).order_by(Booking.created_at.desc())
-    
-    result = await db.execute(query)
+    result = await db.execute(spot_bookings_query(spot_ids, status_filter))
     bookings = result.scalars().all()
     
     return bookings
@@ -265,7 +277,7 @@ async def list_owner_bookings(
 @router.get("/{booking_id}", response_model=BookingResponse)
 async def get_booking(
     booking_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthClaims = Depends(get_token_claims),
     db: AsyncSession = Depends(get_db)
 ):
     """Get booking by ID."""
@@ -317,10 +329,14 @@ async def update_booking_status(
             detail="Booking not found"
         )
     
-    # Get parking spot for authorization
-    spot_result = await db.execute(
-        select(ParkingSpot).where(ParkingSpot.id == booking.parking_spot_id)
-    )
+    # Get parking spot for authorization. Making a finished booking active
+    # again needs the same spot lock and conflict check as create_booking:
+    # the per-partition exclusion constraints miss overlaps across months.
+    reactivating = status_update.status in ACTIVE_STATUSES and booking.status not in ACTIVE_STATUSES
+    spot_query = select(ParkingSpot).where(ParkingSpot.id == booking.parking_spot_id)
+    if reactivating:
+        spot_query = spot_query.with_for_update()
+    spot_result = await db.execute(spot_query)
     spot = spot_result.scalar_one_or_none()
     
     # Authorization based on action
@@ -340,7 +356,21 @@ async def update_booking_status(
                 detail="Only the owner can confirm bookings"
             )
     
+    if reactivating:
+        result = await db.execute(
+            conflicting_bookings_query(booking.parking_spot_id, booking.start_time, booking.end_time)
+            .where(Booking.id != booking.id)
+        )
+        if result.scalars().first():
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Time slot is already booked"
+            )
+        # Back to the live partitions, where conflict checks can see it
+        booking.archived = False
+    
     booking.status = status_update.status
+    emit(db, "spot.invalidate", spot_id=booking.parking_spot_id)
     await db.flush()
     
     return await _load_booking(db, booking.id)
@@ -426,7 +456,11 @@ async def check_out(
     spot = spot_result.scalar_one_or_none()
     if spot:
         spot.total_bookings += 1
+        # total_bookings is part of the spot detail only, so no search invalidation
+        emit(db, "spot.refresh", spot_id=spot.id)
+    if booking.payment_status == "paid":
+        emit(db, "payout.create", booking_id=booking.id)
     
-    await db.flush()
+    await db.commit()
     
     return await _load_booking(db, booking.id)
@@ -1,6 +1,4 @@
 from fastapi import APIRouter, HTTPException, Depends
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import uuid
@@ -8,7 +6,13 @@ import uuid
 from app.core.config import settings
 from app.db.session import get_db
 from app.models.user import User, UserRole
-from app.core.security import create_access_token, create_refresh_token
+from app.models.review import Review
+from app.core.security import create_user_access_token
+from app.core.google_tokens import google_verifier
+from app.cache import invalidate_review_caches
+from app.user_cache import store_user
+from app.refresh_tokens import issue_refresh_token
+from app.rate_limit import rate_limit
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -23,7 +27,7 @@ class TokenResponse(BaseModel):
     token_type: str = "bearer"
     user: dict
 
-@router.post("/google", response_model=TokenResponse)
+@router.post("/google", response_model=TokenResponse, dependencies=[Depends(rate_limit("oauth"))])
 async def google_auth(
     auth_data: GoogleAuthRequest,
     db: AsyncSession = Depends(get_db)
@@ -37,16 +41,9 @@ async def google_auth(
     - Creates a new user if email doesn't exist
     """
     try:
-        # Verify the Google token
-        idinfo = id_token.verify_oauth2_token(
-            auth_data.token,
-            requests.Request(),
-            settings.GOOGLE_CLIENT_ID
-        )
-        
-        # Check if token is from correct issuer
-        if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
-            raise ValueError('Wrong issuer.')
+        # Verify the Google token locally against the cached Google key set
+        # (signature, audience, issuer and expiry)
+        idinfo = await google_verifier.verify(auth_data.token)
         
         # Extract user data from Google token
         google_id = idinfo['sub']
@@ -81,12 +78,21 @@ async def google_auth(
         if not user.oauth_provider:
             user.oauth_provider = "google"
             user.oauth_id = google_id
-            if profile_image and not user.profile_image:
+            image_added = bool(profile_image and not user.profile_image)
+            if image_added:
                 user.profile_image = profile_image
             if email_verified and not user.is_verified:
                 user.is_verified = True
             await db.flush()
             await db.refresh(user)
+            await db.commit()
+            await store_user(user)
+            if image_added:
+                # Review listings show the reviewer's image
+                result = await db.execute(
+                    select(Review.parking_spot_id).where(Review.reviewer_id == user.id).distinct()
+                )
+                await invalidate_review_caches(str(spot_id) for spot_id in result.scalars())
     else:
         # Create new user
         user = User(
@@ -106,8 +112,8 @@ async def google_auth(
         await db.refresh(user)
     
     # Generate tokens
-    access_token = create_access_token(subject=str(user.id))
-    refresh_token = create_refresh_token(subject=str(user.id))
+    access_token = create_user_access_token(user)
+    refresh_token = await issue_refresh_token(user.id)
     
     return TokenResponse(
         access_token=access_token,
@@ -1,12 +1,14 @@
 from typing import List, Optional
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, or_
 from math import radians, cos, sin, asin, sqrt
 import json
 
-from app.db.session import get_db
+from app.db.session import get_db, get_db_read, served_by_replica
+from app.db.budget import db_budget
+from app.db.fastpath import fastpath_available, fetch_spot_listing_rows, fetch_spot_detail
 from app.models.user import User, UserRole
 from app.models.parking_spot import ParkingSpot, AvailabilitySlot, ParkingSpotType, VehicleSize
 from app.models.booking import Booking, BookingStatus
@@ -15,11 +17,28 @@ from app.schemas.parking_spot import (
     ParkingSpotListResponse, ParkingSpotSearch, AvailabilitySlotCreate,
     AvailabilitySlotResponse
 )
-from app.api.deps import get_current_user, get_current_owner
-from app.cache import cache, invalidate_spot_cache, invalidate_search_cache
+from app.api.deps import get_current_user, get_token_claims, AuthClaims
+from app.api.http_cache import make_etag, etag_matches, apply_cache_headers, not_modified
+from app.bloom import spot_id_filter, SPOT_IDS_GENERATION
+from app.user_cache import store_user
+from app.rate_limit import rate_limit
+from app.cache import (
+    cache, invalidate_spot_cache, invalidate_search_cache, get_generation, bump_generations,
+    parse_entity_id, missing_key, remember_missing, store_spot_details, write_through_spots,
+    SEARCH_CACHE_TTL
+)
+from app.core.config import settings
 
 router = APIRouter()
 
+# Hot query statements, also EXPLAINed by check_query_plans.py
+
+def owner_spots_query(owner_id):
+    return select(ParkingSpot).where(ParkingSpot.owner_id == owner_id)
+
+def availability_slots_query(spot_id):
+    return select(AvailabilitySlot).where(AvailabilitySlot.parking_spot_id == spot_id)
+
 def haversine(lon1, lat1, lon2, lat2):
     """Calculate the great circle distance in kilometers between two points."""
     lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
@@ -38,7 +57,8 @@ async def create_parking_spot(
 ):
     """Create a new parking spot listing."""
     # Update user role to owner if they're a renter
-    if current_user.role == UserRole.RENTER:
+    promoted = current_user.role == UserRole.RENTER
+    if promoted:
         current_user.role = UserRole.OWNER
     
     spot = ParkingSpot(
@@ -47,12 +67,21 @@ async def create_parking_spot(
     )
     
     db.add(spot)
-    await db.flush()
+    await db.commit()
     await db.refresh(spot)
+    if promoted:
+        await db.refresh(current_user)
+        await store_user(current_user)
+    
+    # Let every worker's spot ID filter know there's a new ID to accept
+    spot_id_filter.add(spot.id)
+    await bump_generations(SPOT_IDS_GENERATION)
+    # The new spot belongs in search results: drop them and change their ETags
+    await invalidate_search_cache()
     
     return spot
 
-@router.get("/search", response_model=List[ParkingSpotListResponse])
+@router.get("/search", response_model=List[ParkingSpotListResponse], dependencies=[Depends(rate_limit("search"))])
 async def search_parking_spots(
     q: Optional[str] = Query(None, description="General search query (searches title, address, city)"),
     city: Optional[str] = None,
@@ -69,7 +98,8 @@ async def search_parking_spots(
     longitude: Optional[float] = Query(None, ge=-180, le=180),
     radius_km: float = Query(50.0, gt=0, le=500),
     limit: int = Query(20, ge=1, le=100),
-    db: AsyncSession = Depends(get_db)
+    # Listing query + one availability check per spot (up to 100)
+    db: AsyncSession = Depends(db_budget(timeout_ms=3000, max_queries=101, read_only=True))
 ):
     """Search parking spots with multiple filter options including time-based availability and general text search."""
     query = select(ParkingSpot).where(
@@ -128,6 +158,7 @@ async def search_parking_spots(
             conflict_query = select(Booking).where(
                 and_(
                     Booking.parking_spot_id == spot.id,
+                    Booking.archived == False,
                     Booking.status.in_([BookingStatus.PENDING, BookingStatus.CONFIRMED, BookingStatus.IN_PROGRESS]),
                     Booking.start_time < end_time,
                     Booking.end_time > start_time
@@ -183,57 +214,22 @@ async def search_parking_spots(
     
     return response_spots
 
-@router.get("/", response_model=List[ParkingSpotListResponse])
-async def list_parking_spots(
-    q: Optional[str] = Query(None, description="General search query (searches title, address, city)"),
-    latitude: Optional[float] = Query(None, ge=-90, le=90),
-    longitude: Optional[float] = Query(None, ge=-180, le=180),
-    radius_km: float = Query(10.0, gt=0, le=100),
-    city: Optional[str] = None,
-    spot_type: Optional[ParkingSpotType] = None,
-    vehicle_size: Optional[VehicleSize] = None,
-    max_hourly_rate: Optional[int] = Query(None, gt=0),
-    has_ev_charging: Optional[bool] = None,
-    is_covered: Optional[bool] = None,
-    start_time: Optional[datetime] = None,
-    end_time: Optional[datetime] = None,
-    limit: Optional[int] = Query(None, ge=1, le=100),
-    page: int = Query(1, ge=1),
-    page_size: int = Query(20, ge=1, le=100),
-    db: AsyncSession = Depends(get_db)
-):
-    """List parking spots with optional filters, text search, and location-based search."""
-    # Use limit if provided, otherwise use page_size
-    effective_page_size = limit if limit else page_size
-    
-    # Skip cache when date/time filters or search query are used (dynamic results)
-    use_cache = not (start_time and end_time) and not q
-    
-    if use_cache:
-        # Generate cache key from query parameters
-        cache_key = cache.generate_cache_key(
-            "search",
-            latitude=latitude,
-            longitude=longitude,
-            radius_km=radius_km,
-            city=city,
-            spot_type=spot_type,
-            vehicle_size=vehicle_size,
-            max_hourly_rate=max_hourly_rate,
-            has_ev_charging=has_ev_charging,
-            is_covered=is_covered,
-            page=page,
-            page_size=effective_page_size
-        )
-        
-        # Try to get from cache
-        cached_result = await cache.get(cache_key)
-        if cached_result:
-            try:
-                return json.loads(cached_result)
-            except json.JSONDecodeError:
-                pass
-    
+async def _fetch_spot_rows_orm(
+    db: AsyncSession,
+    *,
+    q: Optional[str],
+    city: Optional[str],
+    spot_type: Optional[ParkingSpotType],
+    vehicle_size: Optional[VehicleSize],
+    max_hourly_rate: Optional[int],
+    has_ev_charging: Optional[bool],
+    is_covered: Optional[bool],
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    offset: int,
+    limit: int
+) -> List[dict]:
+    """ORM version of the listing query; rows in ParkingSpotListResponse shape."""
     query = select(ParkingSpot).where(
         and_(
             ParkingSpot.is_active == True,
@@ -268,8 +264,7 @@ async def list_parking_spots(
         query = query.where(ParkingSpot.is_covered == is_covered)
     
     # Pagination
-    offset = (page - 1) * effective_page_size
-    query = query.offset(offset).limit(effective_page_size)
+    query = query.offset(offset).limit(limit)
     
     result = await db.execute(query)
     spots = result.scalars().all()
@@ -284,6 +279,7 @@ async def list_parking_spots(
             booking_query = select(Booking).where(
                 and_(
                     Booking.parking_spot_id == spot.id,
+                    Booking.archived == False,
                     Booking.status.in_([BookingStatus.PENDING, BookingStatus.CONFIRMED, BookingStatus.IN_PROGRESS]),
                     Booking.start_time < end_time,
                     Booking.end_time > start_time
@@ -297,10 +293,8 @@ async def list_parking_spots(
         
         spots = available_spots
     
-    # Calculate distance if location provided
-    response_spots = []
-    for spot in spots:
-        spot_dict = {
+    return [
+        {
             "id": spot.id,
             "title": spot.title,
             "address": spot.address,
@@ -316,9 +310,51 @@ async def list_parking_spots(
             "images": spot.images or [],
             "distance_km": None
         }
-        
+        for spot in spots
+    ]
+
+async def fetch_spot_listing(
+    db: AsyncSession,
+    *,
+    q: Optional[str] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    radius_km: float = 10.0,
+    city: Optional[str] = None,
+    spot_type: Optional[ParkingSpotType] = None,
+    vehicle_size: Optional[VehicleSize] = None,
+    max_hourly_rate: Optional[int] = None,
+    has_ev_charging: Optional[bool] = None,
+    is_covered: Optional[bool] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    page: int = 1,
+    page_size: int = 20
+) -> List[dict]:
+    """Run the spot listing query and build its response rows (also used by the cache warmer)."""
+    filters = dict(
+        q=q,
+        city=city,
+        spot_type=spot_type,
+        vehicle_size=vehicle_size,
+        max_hourly_rate=max_hourly_rate,
+        has_ev_charging=has_ev_charging,
+        is_covered=is_covered,
+        start_time=start_time,
+        end_time=end_time,
+        offset=(page - 1) * page_size,
+        limit=page_size
+    )
+    if fastpath_available(db):
+        rows = await fetch_spot_listing_rows(db, **filters)
+    else:
+        rows = await _fetch_spot_rows_orm(db, **filters)
+    
+    # Calculate distance if location provided
+    response_spots = []
+    for spot_dict in rows:
         if latitude and longitude:
-            distance = haversine(longitude, latitude, spot.longitude, spot.latitude)
+            distance = haversine(longitude, latitude, spot_dict["longitude"], spot_dict["latitude"])
             if distance <= radius_km:
                 spot_dict["distance_km"] = round(distance, 2)
                 response_spots.append(spot_dict)
@@ -329,10 +365,97 @@ async def list_parking_spots(
     if latitude and longitude:
         response_spots.sort(key=lambda x: x["distance_km"] or float('inf'))
     
-    # Cache the results only if not using date/time filters (300 seconds = 5 minutes)
+    return response_spots
+
+@router.get("/", response_model=List[ParkingSpotListResponse], dependencies=[Depends(rate_limit("search"))])
+async def list_parking_spots(
+    request: Request,
+    response: Response,
+    q: Optional[str] = Query(None, description="General search query (searches title, address, city)"),
+    latitude: Optional[float] = Query(None, ge=-90, le=90),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: float = Query(10.0, gt=0, le=100),
+    city: Optional[str] = None,
+    spot_type: Optional[ParkingSpotType] = None,
+    vehicle_size: Optional[VehicleSize] = None,
+    max_hourly_rate: Optional[int] = Query(None, gt=0),
+    has_ev_charging: Optional[bool] = None,
+    is_covered: Optional[bool] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    # Listing query + one availability check per spot (up to 100)
+    db: AsyncSession = Depends(db_budget(timeout_ms=3000, max_queries=101, read_only=True))
+):
+    """List parking spots with optional filters, text search, and location-based search."""
+    # Use limit if provided, otherwise use page_size
+    effective_page_size = limit if limit else page_size
+    
+    # Skip cache when date/time filters or search query are used (dynamic results)
+    use_cache = not (start_time and end_time) and not q
+    etag = None
+    
+    if use_cache:
+        # Generate cache key from query parameters
+        cache_params = dict(
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=radius_km,
+            city=city,
+            spot_type=spot_type,
+            vehicle_size=vehicle_size,
+            max_hourly_rate=max_hourly_rate,
+            has_ev_charging=has_ev_charging,
+            is_covered=is_covered,
+            page=page,
+            page_size=effective_page_size
+        )
+        cache_key = cache.generate_cache_key("search", **cache_params)
+        
+        # Access stats tell the cache warmer which searches are hot
+        await cache.record_access("search", json.dumps(cache_params, sort_keys=True, default=str))
+        
+        # Results are versioned by the search generation, so a client that
+        # already holds this page can be answered without touching the DB
+        generation = await get_generation("search")
+        if generation:
+            etag = make_etag(cache_key, generation)
+            if etag_matches(request, etag):
+                return not_modified(etag)
+            apply_cache_headers(response, etag)
+        
+        # Try to get from cache
+        cached_result = await cache.get(cache_key)
+        if cached_result:
+            try:
+                return json.loads(cached_result)
+            except json.JSONDecodeError:
+                pass
+    
+    response_spots = await fetch_spot_listing(
+        db,
+        q=q,
+        latitude=latitude,
+        longitude=longitude,
+        radius_km=radius_km,
+        city=city,
+        spot_type=spot_type,
+        vehicle_size=vehicle_size,
+        max_hourly_rate=max_hourly_rate,
+        has_ev_charging=has_ev_charging,
+        is_covered=is_covered,
+        start_time=start_time,
+        end_time=end_time,
+        page=page,
+        page_size=effective_page_size
+    )
+    
+    # Cache the results only if not using date/time filters
     if use_cache:
         try:
-            await cache.set(cache_key, json.dumps(response_spots, default=str), ttl=300)
+            await cache.set(cache_key, json.dumps(response_spots, default=str), ttl=SEARCH_CACHE_TTL)
         except Exception as e:
             print(f"Cache set error: {e}")
     
@@ -340,75 +463,86 @@ async def list_parking_spots(
 
 @router.get("/my-spots", response_model=List[ParkingSpotResponse])
 async def get_my_parking_spots(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthClaims = Depends(get_token_claims),
     db: AsyncSession = Depends(get_db)
 ):
     """Get parking spots owned by current user."""
-    result = await db.execute(
-        select(ParkingSpot).where(ParkingSpot.owner_id == current_user.id)
-    )
+    result = await db.execute(owner_spots_query(current_user.id))
     spots = result.scalars().all()
     return spots
 
+async def _apply_spot_etag(response: Response, spot_id: str):
+    """Start the generation of a spot now known to exist and attach its ETag."""
+    generation = await get_generation(f"spot:{spot_id}")
+    if generation:
+        apply_cache_headers(response, make_etag("spot", spot_id, generation))
+
 @router.get("/{spot_id}", response_model=ParkingSpotResponse)
-async def get_parking_spot(spot_id: str, db: AsyncSession = Depends(get_db)):
+async def get_parking_spot(
+    spot_id: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(db_budget(timeout_ms=1000, max_queries=1, read_only=True))
+):
     """Get parking spot by ID."""
-    # Try to get from cache
+    # Unknown IDs (scrapers, stale deep links) are answered without a DB query:
+    # malformed IDs can't exist, and the bloom filter rules out most others
+    spot_uuid = parse_entity_id(spot_id)
+    if spot_uuid is None or (
+        settings.SPOT_BLOOM_ENABLED and await spot_id_filter.definitely_missing(spot_uuid)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Parking spot not found"
+        )
+    # Every key below uses the canonical form, which is what writes bump and
+    # overwrite; an upper-case ID must not get its own cache entry and ETag
+    spot_id = str(spot_uuid)
+    
+    await cache.record_access("spot", spot_id)
+    
+    # Conditional GET: the spot generation changes whenever the spot is invalidated.
+    # It's only read here; unknown IDs must not mint a generation key each
+    generation = await get_generation(f"spot:{spot_id}", create=False)
+    etag = make_etag("spot", spot_id, generation) if generation else None
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    apply_cache_headers(response, etag)
+    
+    # Try to get from cache (the negative entry comes back in the same round trip)
     cache_key = f"spot:{spot_id}"
-    cached_spot = await cache.get(cache_key)
+    cached_spot, known_missing = await cache.get_many([cache_key, missing_key("spot", spot_id)])
     if cached_spot:
         try:
-            return json.loads(cached_spot)
+            body = json.loads(cached_spot)
         except json.JSONDecodeError:
             pass
-    
-    result = await db.execute(select(ParkingSpot).where(ParkingSpot.id == spot_id))
-    spot = result.scalar_one_or_none()
+        else:
+            if etag is None:
+                await _apply_spot_etag(response, spot_id)
+            return body
+    
+    if known_missing:
+        spot = None
+    elif fastpath_available(db):
+        spot = await fetch_spot_detail(db, spot_uuid)
+    else:
+        result = await db.execute(select(ParkingSpot).where(ParkingSpot.id == spot_uuid))
+        spot = result.scalar_one_or_none()
     
     if not spot:
+        # A lagging replica may not have a spot created moments ago yet
+        if not known_missing and not served_by_replica(db):
+            await remember_missing("spot", spot_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Parking spot not found"
         )
     
-    # Cache the spot details for 10 minutes (600 seconds)
-    try:
-        spot_dict = {
-            "id": str(spot.id),
-            "owner_id": str(spot.owner_id),
-            "title": spot.title,
-            "description": spot.description,
-            "spot_type": spot.spot_type,
-            "vehicle_size": spot.vehicle_size,
-            "address": spot.address,
-            "city": spot.city,
-            "prefecture": spot.prefecture,
-            "zip_code": spot.zip_code,
-            "country": spot.country,
-            "latitude": spot.latitude,
-            "longitude": spot.longitude,
-            "hourly_rate": spot.hourly_rate,
-            "daily_rate": spot.daily_rate,
-            "monthly_rate": spot.monthly_rate,
-            "is_covered": spot.is_covered,
-            "has_ev_charging": spot.has_ev_charging,
-            "has_security": spot.has_security,
-            "has_lighting": spot.has_lighting,
-            "is_handicap_accessible": spot.is_handicap_accessible,
-            "images": spot.images or [],
-            "is_active": spot.is_active,
-            "is_available": spot.is_available,
-            "operating_hours": spot.operating_hours,
-            "access_instructions": spot.access_instructions,
-            "total_bookings": spot.total_bookings,
-            "average_rating": spot.average_rating,
-            "total_reviews": spot.total_reviews,
-            "created_at": spot.created_at.isoformat() if spot.created_at else None,
-            "updated_at": spot.updated_at.isoformat() if spot.updated_at else None
-        }
-        await cache.set(cache_key, json.dumps(spot_dict), ttl=600)
-    except Exception as e:
-        print(f"Cache set error: {e}")
+    # Cache the spot details (mutations write through, so this is mostly cold starts)
+    await store_spot_details([spot])
+    if etag is None:
+        await _apply_spot_etag(response, spot_id)
     
     return spot
 
@@ -439,11 +573,12 @@ async def update_parking_spot(
     for field, value in update_data.items():
         setattr(spot, field, value)
     
-    await db.flush()
+    await db.commit()
     await db.refresh(spot)
     
-    # Invalidate cache for this spot and search results
-    await invalidate_spot_cache(spot_id)
+    # Write the committed spot through to the cache; search pages embed spot
+    # fields, so those are still invalidated
+    await write_through_spots([spot], invalidate_search=True)
     
     return spot
 
@@ -470,6 +605,7 @@ async def delete_parking_spot(
         )
     
     await db.delete(spot)
+    await db.commit()
     
     # Invalidate cache for this spot and search results
     await invalidate_spot_cache(spot_id)
@@ -512,11 +648,9 @@ async def add_availability_slot(
     return slot
 
 @router.get("/{spot_id}/availability", response_model=List[AvailabilitySlotResponse])
-async def get_availability_slots(spot_id: str, db: AsyncSession = Depends(get_db)):
+async def get_availability_slots(spot_id: str, db: AsyncSession = Depends(get_db_read)):
     """Get availability slots for a parking spot."""
-    result = await db.execute(
-        select(AvailabilitySlot).where(AvailabilitySlot.parking_spot_id == spot_id)
-    )
+    result = await db.execute(availability_slots_query(spot_id))
     slots = result.scalars().all()
     return slots
 
@@ -1,10 +1,13 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func
+import json
+import math
 import stripe
 
 from app.db.session import get_db
+from app.db.budget import db_budget
 from app.models.user import User
 from app.models.booking import Booking, BookingStatus
 from app.models.payment import Payment, PaymentStatus, Payout, PayoutStatus
@@ -13,13 +16,48 @@ from app.schemas.payment import (
     RefundRequest, RefundResponse, PayoutResponse, PayoutSummary,
     ConnectAccountCreate, ConnectAccountResponse
 )
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_unrevoked_claims, get_owner_claims, AuthClaims
+from app.user_cache import store_user
 from app.core.config import settings
+from app.core.stripe_gateway import stripe_gateway, StripeError, StripeUnavailable
+from app.webhooks import enqueue_event, HANDLED_EVENTS
+from app.outbox import emit
 
 router = APIRouter()
 
-# Initialize Stripe
-stripe.api_key = settings.STRIPE_SECRET_KEY
+# Hot query statements, also EXPLAINed by check_query_plans.py
+
+def payment_by_intent_query(payment_intent_id: str):
+    return select(Payment).where(Payment.stripe_payment_intent_id == payment_intent_id)
+
+def booking_by_intent_query(payment_intent_id: str):
+    return select(Booking).where(Booking.payment_intent_id == payment_intent_id)
+
+def user_payments_query(user_id):
+    return select(Payment).where(Payment.user_id == user_id).order_by(Payment.created_at.desc())
+
+def owner_payouts_query(owner_id):
+    return select(Payout).where(Payout.owner_id == owner_id).order_by(Payout.created_at.desc())
+
+def payout_aggregate_query(aggregate, owner_id, payout_status: PayoutStatus, since=None):
+    """One aggregate over an owner's payouts in a status, optionally processed since a time."""
+    query = select(aggregate).where(Payout.owner_id == owner_id, Payout.status == payout_status)
+    if since is not None:
+        query = query.where(Payout.processed_at >= since)
+    return query
+
+def _stripe_error(e: StripeError) -> HTTPException:
+    """503 with Retry-After when Stripe is unreachable, 400 with Stripe's message otherwise."""
+    if isinstance(e, StripeUnavailable):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Payment provider is temporarily unavailable, please retry shortly",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=e.message
+    )
 
 @router.post("/create-payment-intent", response_model=PaymentIntentResponse)
 async def create_payment_intent(
@@ -53,16 +91,20 @@ async def create_payment_intent(
     try:
         # Create or get Stripe customer
         if not current_user.stripe_customer_id:
-            customer = stripe.Customer.create(
+            customer = await stripe_gateway.create_customer(
                 email=current_user.email,
                 name=current_user.full_name,
                 metadata={"user_id": str(current_user.id)}
             )
-            current_user.stripe_customer_id = customer.id
-            await db.flush()
+            current_user.stripe_customer_id = customer["id"]
+            # Committed right away: the Stripe customer exists even if the rest fails,
+            # and cached snapshots of the user must not go on without the ID
+            await db.commit()
+            await db.refresh(current_user)
+            await store_user(current_user)
         
         # Create payment intent
-        intent = stripe.PaymentIntent.create(
+        intent = await stripe_gateway.create_payment_intent(
             amount=booking.total_amount,
             currency="usd",
             customer=current_user.stripe_customer_id,
@@ -74,13 +116,13 @@ async def create_payment_intent(
         )
         
         # Store payment intent ID
-        booking.payment_intent_id = intent.id
+        booking.payment_intent_id = intent["id"]
         
         # Create payment record
         payment = Payment(
             booking_id=booking.id,
             user_id=current_user.id,
-            stripe_payment_intent_id=intent.id,
+            stripe_payment_intent_id=intent["id"],
             amount=booking.total_amount,
             status=PaymentStatus.PENDING
         )
@@ -89,17 +131,14 @@ async def create_payment_intent(
         await db.flush()
         
         return PaymentIntentResponse(
-            client_secret=intent.client_secret,
-            payment_intent_id=intent.id,
+            client_secret=intent["client_secret"],
+            payment_intent_id=intent["id"],
             amount=booking.total_amount,
             currency="usd"
         )
     
-    except stripe.error.StripeError as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
+    except StripeError as e:
+        raise _stripe_error(e)
 
 @router.post("/confirm-payment")
 async def confirm_payment(
@@ -108,40 +147,43 @@ async def confirm_payment(
     db: AsyncSession = Depends(get_db)
 ):
     """Confirm payment after successful Stripe payment."""
+    result = await db.execute(payment_by_intent_query(payment_intent_id))
+    payment = result.scalar_one_or_none()
+    booking_result = await db.execute(booking_by_intent_query(payment_intent_id))
+    booking = booking_result.scalar_one_or_none()
+    
+    # Usually the webhook inbox has already applied the payment (it doesn't
+    # record card details); then there's nothing to ask Stripe
+    if (
+        payment and payment.status == PaymentStatus.SUCCEEDED
+        and booking and booking.payment_status == "paid"
+    ):
+        return {"message": "Payment confirmed", "status": "succeeded"}
+    
     try:
         # Verify payment intent with Stripe
-        intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+        intent = await stripe_gateway.retrieve_payment_intent(payment_intent_id)
         
-        if intent.status != "succeeded":
+        if intent["status"] != "succeeded":
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Payment has not been completed"
             )
         
         # Update payment record
-        result = await db.execute(
-            select(Payment).where(Payment.stripe_payment_intent_id == payment_intent_id)
-        )
-        payment = result.scalar_one_or_none()
-        
         if payment:
             payment.status = PaymentStatus.SUCCEEDED
-            payment.stripe_charge_id = intent.latest_charge
+            payment.stripe_charge_id = intent.get("latest_charge")
             
             # Get payment method details
-            if intent.payment_method:
-                pm = stripe.PaymentMethod.retrieve(intent.payment_method)
-                if pm.card:
-                    payment.last_four = pm.card.last4
-                    payment.card_brand = pm.card.brand
-                    payment.payment_method = pm.type
+            if intent.get("payment_method"):
+                pm = await stripe_gateway.retrieve_payment_method(intent["payment_method"])
+                if pm.get("card"):
+                    payment.last_four = pm["card"].get("last4")
+                    payment.card_brand = pm["card"].get("brand")
+                    payment.payment_method = pm.get("type")
         
         # Update booking status
-        booking_result = await db.execute(
-            select(Booking).where(Booking.payment_intent_id == payment_intent_id)
-        )
-        booking = booking_result.scalar_one_or_none()
-        
         if booking:
             booking.status = BookingStatus.CONFIRMED
             booking.payment_status = "paid"
@@ -150,48 +192,30 @@ async def confirm_payment(
         
         return {"message": "Payment confirmed", "status": "succeeded"}
     
-    except stripe.error.StripeError as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
+    except StripeError as e:
+        raise _stripe_error(e)
 
 @router.post("/webhook")
 async def stripe_webhook(request: Request, db: AsyncSession = Depends(get_db)):
-    """Handle Stripe webhooks."""
+    """Verify a Stripe webhook and queue it; the webhook inbox consumer applies it."""
     payload = await request.body()
     sig_header = request.headers.get("stripe-signature")
     
+    if not sig_header:
+        raise HTTPException(status_code=400, detail="Invalid signature")
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
+        stripe.WebhookSignature.verify_header(
+            payload.decode("utf-8"), sig_header, settings.STRIPE_WEBHOOK_SECRET
         )
+        event = json.loads(payload)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid payload")
     except stripe.error.SignatureVerificationError:
         raise HTTPException(status_code=400, detail="Invalid signature")
     
-    # Handle the event
-    if event["type"] == "payment_intent.succeeded":
-        intent = event["data"]["object"]
-        # Update payment and booking status
-        result = await db.execute(
-            select(Payment).where(Payment.stripe_payment_intent_id == intent["id"])
-        )
-        payment = result.scalar_one_or_none()
-        if payment:
-            payment.status = PaymentStatus.SUCCEEDED
-            await db.flush()
-    
-    elif event["type"] == "payment_intent.payment_failed":
-        intent = event["data"]["object"]
-        result = await db.execute(
-            select(Payment).where(Payment.stripe_payment_intent_id == intent["id"])
-        )
-        payment = result.scalar_one_or_none()
-        if payment:
-            payment.status = PaymentStatus.FAILED
-            await db.flush()
+    # Stored and acknowledged only; redeliveries of the same event are ignored
+    if event.get("type") in HANDLED_EVENTS:
+        await enqueue_event(db, event)
     
     return {"status": "success"}
 
@@ -230,7 +254,7 @@ async def create_refund(
     try:
         refund_amount = refund_data.amount if refund_data.amount else payment.amount
         
-        refund = stripe.Refund.create(
+        await stripe_gateway.create_refund(
             payment_intent=payment.stripe_payment_intent_id,
             amount=refund_amount,
             reason="requested_by_customer"
@@ -244,6 +268,8 @@ async def create_refund(
         
         # Update booking status
         booking.status = BookingStatus.REFUNDED if refund_amount == payment.amount else BookingStatus.CANCELLED
+        # The slot is free again
+        emit(db, "spot.invalidate", spot_id=booking.parking_spot_id)
         
         await db.flush()
         await db.refresh(payment)
@@ -256,88 +282,59 @@ async def create_refund(
             refunded_at=payment.refunded_at
         )
     
-    except stripe.error.StripeError as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
+    except StripeError as e:
+        raise _stripe_error(e)
 
 @router.get("/my-payments", response_model=List[PaymentResponse])
 async def get_my_payments(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthClaims = Depends(get_unrevoked_claims),
     db: AsyncSession = Depends(get_db)
 ):
     """Get payment history for current user."""
-    result = await db.execute(
-        select(Payment)
-        .where(Payment.user_id == current_user.id)
-        .order_by(Payment.created_at.desc())
-    )
+    result = await db.execute(user_payments_query(current_user.id))
     payments = result.scalars().all()
     return payments
 
 @router.get("/owner/payouts", response_model=List[PayoutResponse])
 async def get_owner_payouts(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthClaims = Depends(get_owner_claims),
     db: AsyncSession = Depends(get_db)
 ):
     """Get payout history for parking spot owner."""
-    result = await db.execute(
-        select(Payout)
-        .where(Payout.owner_id == current_user.id)
-        .order_by(Payout.created_at.desc())
-    )
+    result = await db.execute(owner_payouts_query(current_user.id))
     payouts = result.scalars().all()
     return payouts
 
 @router.get("/owner/summary", response_model=PayoutSummary)
 async def get_payout_summary(
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: AuthClaims = Depends(get_owner_claims),
+    db: AsyncSession = Depends(db_budget(timeout_ms=2000, max_queries=4))
 ):
     """Get payout summary for parking spot owner."""
-    from sqlalchemy import func
     from datetime import datetime
     
     # Total earnings (completed payouts)
     total_result = await db.execute(
-        select(func.sum(Payout.amount))
-        .where(
-            Payout.owner_id == current_user.id,
-            Payout.status == PayoutStatus.PAID
-        )
+        payout_aggregate_query(func.sum(Payout.amount), current_user.id, PayoutStatus.PAID)
     )
     total_earnings = total_result.scalar() or 0
     
     # Pending payouts
     pending_result = await db.execute(
-        select(func.sum(Payout.amount))
-        .where(
-            Payout.owner_id == current_user.id,
-            Payout.status == PayoutStatus.PENDING
-        )
+        payout_aggregate_query(func.sum(Payout.amount), current_user.id, PayoutStatus.PENDING)
     )
     pending_payouts = pending_result.scalar() or 0
     
     # Completed payouts count
     completed_result = await db.execute(
-        select(func.count(Payout.id))
-        .where(
-            Payout.owner_id == current_user.id,
-            Payout.status == PayoutStatus.PAID
-        )
+        payout_aggregate_query(func.count(Payout.id), current_user.id, PayoutStatus.PAID)
     )
     completed_payouts = completed_result.scalar() or 0
     
     # This month earnings
     current_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     month_result = await db.execute(
-        select(func.sum(Payout.amount))
-        .where(
-            Payout.owner_id == current_user.id,
-            Payout.status == PayoutStatus.PAID,
-            Payout.processed_at >= current_month
-        )
+        payout_aggregate_query(func.sum(Payout.amount), current_user.id, PayoutStatus.PAID, since=current_month)
     )
     this_month_earnings = month_result.scalar() or 0
     
@@ -356,7 +353,7 @@ async def create_connect_account(
 ):
     """Create Stripe Connect account for owners to receive payouts."""
     try:
-        account = stripe.Account.create(
+        account = await stripe_gateway.create_account(
             type="express",
             country=account_data.country,
             email=current_user.email,
@@ -368,20 +365,17 @@ async def create_connect_account(
         )
         
         # Create account link for onboarding
-        account_link = stripe.AccountLink.create(
-            account=account.id,
+        account_link = await stripe_gateway.create_account_link(
+            account=account["id"],
             refresh_url=f"{settings.BACKEND_CORS_ORIGINS[0]}/owner/onboarding/refresh",
             return_url=f"{settings.BACKEND_CORS_ORIGINS[0]}/owner/onboarding/complete",
             type="account_onboarding"
         )
         
         return ConnectAccountResponse(
-            account_id=account.id,
-            onboarding_url=account_link.url
+            account_id=account["id"],
+            onboarding_url=account_link["url"]
         )
     
-    except stripe.error.StripeError as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
+    except StripeError as e:
+        raise _stripe_error(e)
@@ -1,9 +1,10 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 
-from app.db.session import get_db
+from app.db.session import get_db, get_db_read, served_by_replica
+from app.db.budget import db_budget
 from app.models.user import User, UserRole
 from app.models.parking_spot import ParkingSpot
 from app.models.booking import Booking, BookingStatus
@@ -13,9 +14,32 @@ from app.schemas.review import (
     ReviewOwnerResponse, ReviewSummary
 )
 from app.api.deps import get_current_user
+from app.api.http_cache import make_etag, etag_matches, apply_cache_headers, not_modified
+from app.cache import (
+    get_generation, invalidate_review_cache, write_through_spots,
+    parse_entity_id, is_known_missing, remember_missing
+)
 
 router = APIRouter()
 
+# Hot query statements, also EXPLAINed by check_query_plans.py
+
+def booking_review_query(booking_id):
+    return select(Review).where(Review.booking_id == booking_id)
+
+def spot_rating_query(spot_id):
+    return select(func.avg(Review.overall_rating), func.count(Review.id)).where(Review.parking_spot_id == spot_id)
+
+def spot_reviews_query(spot_id, offset: int, limit: int):
+    return (
+        select(Review, User)
+        .join(User, Review.reviewer_id == User.id)
+        .where(Review.parking_spot_id == spot_id)
+        .order_by(Review.created_at.desc())
+        .offset(offset)
+        .limit(limit)
+    )
+
 @router.post("/", response_model=ReviewResponse, status_code=status.HTTP_201_CREATED)
 async def create_review(
     review_in: ReviewCreate,
@@ -46,9 +70,7 @@ async def create_review(
         )
     
     # Check if already reviewed
-    existing_result = await db.execute(
-        select(Review).where(Review.booking_id == review_in.booking_id)
-    )
+    existing_result = await db.execute(booking_review_query(review_in.booking_id))
     if existing_result.scalar_one_or_none():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -79,10 +101,7 @@ async def create_review(
     
     if spot:
         # Calculate new average
-        reviews_result = await db.execute(
-            select(func.avg(Review.overall_rating), func.count(Review.id))
-            .where(Review.parking_spot_id == spot.id)
-        )
+        reviews_result = await db.execute(spot_rating_query(spot.id))
         avg_rating, count = reviews_result.one()
         
         # Include the new review in calculation
@@ -92,29 +111,47 @@ async def create_review(
         spot.average_rating = round(new_avg, 2)
         spot.total_reviews = new_count
     
-    await db.flush()
+    await db.commit()
     await db.refresh(review)
     
+    # New review changes the spot's rating (shown on search pages too) as well
+    # as its review listing; write the re-rated spot through to the cache
+    await invalidate_review_cache(str(booking.parking_spot_id))
+    if spot:
+        await db.refresh(spot)
+        await write_through_spots([spot], invalidate_search=True)
+    
     return review
 
 @router.get("/spot/{spot_id}", response_model=List[ReviewWithUserResponse])
 async def get_spot_reviews(
     spot_id: str,
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(db_budget(timeout_ms=1000, max_queries=1, read_only=True))
 ):
     """Get reviews for a parking spot."""
+    spot_uuid = parse_entity_id(spot_id)
+    if spot_uuid is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Parking spot not found"
+        )
+    
+    # Generations are minted only by writes (invalidate_review_cache), so an
+    # arbitrary ID can't create Redis keys; until a spot's reviews change its
+    # listing carries no ETag. Reviewer name/image changes bump it too (users.py)
+    generation = await get_generation(f"reviews:{spot_uuid}", create=False)
+    etag = make_etag("reviews", spot_id, page, page_size, generation) if generation else None
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    apply_cache_headers(response, etag)
+    
     offset = (page - 1) * page_size
     
-    result = await db.execute(
-        select(Review, User)
-        .join(User, Review.reviewer_id == User.id)
-        .where(Review.parking_spot_id == spot_id)
-        .order_by(Review.created_at.desc())
-        .offset(offset)
-        .limit(page_size)
-    )
+    result = await db.execute(spot_reviews_query(spot_uuid, offset, page_size))
     
     reviews = []
     for review, user in result.fetchall():
@@ -143,7 +180,10 @@ async def get_spot_reviews(
     return reviews
 
 @router.get("/spot/{spot_id}/summary", response_model=ReviewSummary)
-async def get_review_summary(spot_id: str, db: AsyncSession = Depends(get_db)):
+async def get_review_summary(
+    spot_id: str,
+    db: AsyncSession = Depends(db_budget(timeout_ms=1000, max_queries=2, read_only=True))
+):
     """Get review summary for a parking spot."""
     # Get overall stats
     stats_result = await db.execute(
@@ -180,12 +220,23 @@ async def get_review_summary(spot_id: str, db: AsyncSession = Depends(get_db)):
     }
 
 @router.get("/{review_id}", response_model=ReviewResponse)
-async def get_review(review_id: str, db: AsyncSession = Depends(get_db)):
+async def get_review(review_id: str, db: AsyncSession = Depends(get_db_read)):
     """Get review by ID."""
-    result = await db.execute(select(Review).where(Review.id == review_id))
+    # Malformed and recently-missing IDs are answered without a DB query
+    review_uuid = parse_entity_id(review_id)
+    if review_uuid is None or await is_known_missing("review", str(review_uuid)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Review not found"
+        )
+    
+    result = await db.execute(select(Review).where(Review.id == review_uuid))
     review = result.scalar_one_or_none()
     
     if not review:
+        # A lagging replica may not have a review posted moments ago yet
+        if not served_by_replica(db):
+            await remember_missing("review", str(review_uuid))
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Review not found"
@@ -220,9 +271,11 @@ async def update_review(
     for field, value in update_data.items():
         setattr(review, field, value)
     
-    await db.flush()
+    await db.commit()
     await db.refresh(review)
     
+    await invalidate_review_cache(str(review.parking_spot_id))
+    
     return review
 
 @router.post("/{review_id}/response", response_model=ReviewResponse)
@@ -258,9 +311,11 @@ async def add_owner_response(
     review.owner_response = response_data.response
     review.owner_responded_at = datetime.utcnow().isoformat()
     
-    await db.flush()
+    await db.commit()
     await db.refresh(review)
     
+    await invalidate_review_cache(str(review.parking_spot_id))
+    
     return review
 
 @router.post("/{review_id}/helpful")
@@ -280,6 +335,9 @@ async def mark_review_helpful(
         )
     
     review.helpful_count += 1
+    await db.commit()
+    
+    await invalidate_review_cache(str(review.parking_spot_id))
     
     return {"message": "Review marked as helpful", "helpful_count": review.helpful_count}
 
@@ -305,6 +363,10 @@ async def delete_review(
             detail="Not authorized to delete this review"
         )
     
+    spot_id = str(review.parking_spot_id)
     await db.delete(review)
+    await db.commit()
+    
+    await invalidate_review_cache(spot_id)
     
     return {"message": "Review deleted successfully"}
@@ -4,9 +4,13 @@ from sqlalchemy import select
 
 from app.db.session import get_db
 from app.models.user import User
+from app.models.review import Review
 from app.schemas.user import UserResponse, UserUpdate, PasswordChange
 from app.api.deps import get_current_user
 from app.core.security import verify_password_async, get_password_hash_async
+from app.cache import parse_entity_id, is_known_missing, remember_missing, invalidate_review_caches
+from app.user_cache import store_user, revoke_tokens
+from app.refresh_tokens import revoke_user_refresh_tokens
 
 router = APIRouter()
 
@@ -29,6 +33,15 @@ async def update_current_user(
     
     await db.flush()
     await db.refresh(current_user)
+    await db.commit()
+    await store_user(current_user)
+    
+    # Review listings show the reviewer's name and image
+    if update_data.keys() & {"full_name", "profile_image"}:
+        result = await db.execute(
+            select(Review.parking_spot_id).where(Review.reviewer_id == current_user.id).distinct()
+        )
+        await invalidate_review_caches(str(spot_id) for spot_id in result.scalars())
     
     return current_user
 
@@ -39,6 +52,8 @@ async def change_password(
     db: AsyncSession = Depends(get_db)
 ):
     """Change current user password."""
+    # Not part of the cached user snapshot
+    await db.refresh(current_user, ["hashed_password"])
     if not await verify_password_async(password_data.current_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -46,16 +61,30 @@ async def change_password(
         )
     
     current_user.hashed_password = await get_password_hash_async(password_data.new_password)
+    await db.commit()
+    await db.refresh(current_user)
+    await store_user(current_user)
+    await revoke_tokens(current_user)
+    await revoke_user_refresh_tokens(current_user.id)
     
     return {"message": "Password changed successfully"}
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(user_id: str, db: AsyncSession = Depends(get_db)):
     """Get user by ID (public profile)."""
-    result = await db.execute(select(User).where(User.id == user_id))
+    # Malformed and recently-missing IDs are answered without a DB query
+    user_uuid = parse_entity_id(user_id)
+    if user_uuid is None or await is_known_missing("user", str(user_uuid)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    result = await db.execute(select(User).where(User.id == user_uuid))
     user = result.scalar_one_or_none()
     
     if not user:
+        await remember_missing("user", str(user_uuid))
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
@@ -70,5 +99,10 @@ async def delete_current_user(
 ):
     """Delete current user account."""
     current_user.is_active = False
+    await db.commit()
+    await db.refresh(current_user)
+    await store_user(current_user)
+    await revoke_tokens(current_user)
+    await revoke_user_refresh_tokens(current_user.id)
     
     return {"message": "Account deactivated successfully"}
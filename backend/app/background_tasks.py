@@ -5,7 +5,10 @@ from datetime import datetime, timezone
 from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.db.session import AsyncSessionLocal
+from app.db.partitions import ensure_booking_partitions, archive_finished_bookings
+from app.outbox import emit
 from app.models.booking import Booking, BookingStatus
 from app.models.parking_spot import ParkingSpot
 from app.models.user import User  # Import User to resolve SQLAlchemy mapper relationships
@@ -14,24 +17,41 @@ from app.models.review import Review  # Import Review to resolve all relationshi
 logger = logging.getLogger(__name__)
 
 
+def expired_bookings_query(now: datetime):
+    """Live bookings past their end time (the auto-checkout sweep)."""
+    return select(Booking).where(
+        and_(
+            Booking.archived == False,
+            Booking.status.in_([BookingStatus.IN_PROGRESS, BookingStatus.CONFIRMED]),
+            Booking.end_time <= now
+        )
+    )
+
+
+def starting_bookings_query(now: datetime):
+    """Confirmed bookings whose window has started (the auto-start sweep)."""
+    return select(Booking).where(
+        and_(
+            Booking.archived == False,
+            Booking.status == BookingStatus.CONFIRMED,
+            Booking.start_time <= now,
+            Booking.end_time > now
+        )
+    )
+
+
 async def auto_checkout_expired_bookings():
     """Automatically checkout bookings that have passed their end time."""
     try:
         async with AsyncSessionLocal() as db:
             # Find bookings that are IN_PROGRESS or CONFIRMED but past their end time
             now = datetime.now(timezone.utc)
-            result = await db.execute(
-                select(Booking).where(
-                    and_(
-                        Booking.status.in_([BookingStatus.IN_PROGRESS, BookingStatus.CONFIRMED]),
-                        Booking.end_time <= now
-                    )
-                )
-            )
+            result = await db.execute(expired_bookings_query(now))
             expired_bookings = result.scalars().all()
             
             if expired_bookings:
                 logger.info(f"Found {len(expired_bookings)} expired bookings to auto-checkout")
+                touched_spot_ids = set()
                 
                 for booking in expired_bookings:
                     # Auto-checkout
@@ -45,9 +65,16 @@ async def auto_checkout_expired_bookings():
                     spot = spot_result.scalar_one_or_none()
                     if spot:
                         spot.total_bookings += 1
+                        touched_spot_ids.add(spot.id)
+                    if booking.payment_status == "paid":
+                        emit(db, "payout.create", booking_id=booking.id)
                     
                     logger.info(f"Auto-checkout booking {booking.id}")
                 
+                # The dispatcher writes the committed spots through in one batch
+                for spot_id in touched_spot_ids:
+                    emit(db, "spot.refresh", spot_id=spot_id)
+                
                 await db.commit()
                 logger.info(f"Successfully auto-checkout {len(expired_bookings)} bookings")
             
@@ -61,15 +88,7 @@ async def auto_start_bookings():
         async with AsyncSessionLocal() as db:
             # Find CONFIRMED bookings that have reached their start time
             now = datetime.now(timezone.utc)
-            result = await db.execute(
-                select(Booking).where(
-                    and_(
-                        Booking.status == BookingStatus.CONFIRMED,
-                        Booking.start_time <= now,
-                        Booking.end_time > now
-                    )
-                )
-            )
+            result = await db.execute(starting_bookings_query(now))
             starting_bookings = result.scalars().all()
             
             if starting_bookings:
@@ -107,3 +126,24 @@ async def background_tasks_runner():
             logger.error(f"Error in background tasks runner: {e}")
             # Wait a bit before retrying
             await asyncio.sleep(60)
+
+
+async def booking_maintenance_runner():
+    """Keep booking partitions created ahead and archive finished bookings."""
+    logger.info("Starting booking maintenance runner...")
+    
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                created = await ensure_booking_partitions(db)
+                archived = await archive_finished_bookings(db)
+            if created or archived:
+                logger.info(f"Booking maintenance: {created} partitions created, {archived} bookings archived")
+            
+            await asyncio.sleep(settings.BOOKING_MAINTENANCE_INTERVAL)
+            
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in booking maintenance runner: {e}")
+            await asyncio.sleep(settings.BOOKING_MAINTENANCE_INTERVAL)
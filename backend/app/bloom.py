@@ -0,0 +1,129 @@
+"""Per-worker bloom filter of existing parking spot IDs."""
+import asyncio
+import hashlib
+import logging
+import math
+import uuid as uuid_pkg
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.cache import cache, get_generation, bump_generations
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.parking_spot import ParkingSpot
+
+logger = logging.getLogger(__name__)
+
+# Target false-positive rate; a false positive just costs the normal DB lookup
+FALSE_POSITIVE_RATE = 0.01
+
+# Generation bumped whenever a spot is created, so workers know their filter is behind
+SPOT_IDS_GENERATION = "spot_ids"
+
+# Floor between rebuilds so a burst of new listings doesn't rebuild on every miss
+MIN_REBUILD_GAP = 10
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over UUIDs using double hashing."""
+
+    def __init__(self, expected_items: int, false_positive_rate: float = FALSE_POSITIVE_RATE):
+        expected_items = max(expected_items, 1024)
+        self.size = int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / expected_items * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: uuid_pkg.UUID):
+        digest = hashlib.blake2b(value.bytes, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, value: uuid_pkg.UUID):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value: uuid_pkg.UUID) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class SpotIdFilter:
+    """
+    Answers "does this spot ID definitely not exist?" without a DB query.
+
+    The filter is rebuilt from the parking_spots table periodically. Because
+    other workers may create spots after our build, a negative answer is only
+    trusted while the Redis spot_ids generation still matches the one seen at
+    build time. Code that inserts spots outside the API must bump it too
+    (announce_new_spots(), or `redis-cli DEL gen:spot_ids` after raw SQL),
+    otherwise those spots 404 until the next scheduled rebuild.
+    """
+
+    def __init__(self):
+        self.filter: Optional[BloomFilter] = None
+        self.generation: Optional[str] = None
+        self.rebuild_requested = asyncio.Event()
+
+    async def rebuild(self):
+        """Load all spot IDs into a fresh filter sized for the current row count."""
+        generation = await get_generation(SPOT_IDS_GENERATION)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(ParkingSpot.id))
+            spot_ids = result.scalars().all()
+        new_filter = BloomFilter(len(spot_ids) * 2)
+        for spot_id in spot_ids:
+            new_filter.add(spot_id)
+        self.filter, self.generation = new_filter, generation
+        logger.info(f"Spot ID bloom filter rebuilt with {len(spot_ids)} ids")
+
+    def add(self, spot_id: uuid_pkg.UUID):
+        if self.filter is not None:
+            self.filter.add(spot_id)
+
+    async def definitely_missing(self, spot_id: uuid_pkg.UUID) -> bool:
+        """True only when the spot is absent from an up-to-date filter."""
+        if self.filter is None or self.generation is None or spot_id in self.filter:
+            return False
+        if await get_generation(SPOT_IDS_GENERATION) != self.generation:
+            # Spots were created since our build; fall back to the DB and catch up
+            self.rebuild_requested.set()
+            return False
+        return True
+
+
+async def announce_new_spots():
+    """Mark every worker's filter stale after spots were inserted outside the API."""
+    connected = cache.redis_client is not None
+    if not connected:
+        await cache.connect()
+    try:
+        await bump_generations(SPOT_IDS_GENERATION)
+    finally:
+        if not connected and cache.redis_client is not None:
+            await cache.disconnect()
+
+
+# Global filter instance (one per worker process)
+spot_id_filter = SpotIdFilter()
+
+
+async def spot_id_filter_runner():
+    """Rebuild the spot ID filter on a schedule, or sooner when it falls behind."""
+    while True:
+        spot_id_filter.rebuild_requested.clear()
+        try:
+            await spot_id_filter.rebuild()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error rebuilding spot ID bloom filter: {e}")
+        await asyncio.sleep(MIN_REBUILD_GAP)
+        try:
+            await asyncio.wait_for(
+                spot_id_filter.rebuild_requested.wait(),
+                timeout=settings.SPOT_BLOOM_REBUILD_INTERVAL
+            )
+        except asyncio.TimeoutError:
+            pass
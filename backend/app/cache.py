@@ -1,22 +1,79 @@
 """Redis caching utilities for the application."""
 import json
 import hashlib
-from typing import Optional, Any, Callable
+import time
+import uuid
+from collections import Counter
+from typing import Optional, Any, Callable, Dict, Iterable, List
 from functools import wraps
 import redis.asyncio as redis
 from app.core.config import settings
+from app.schemas.parking_spot import serialize_spot_detail
+
+# Keys per MGET / DEL command when fanning out over large key sets
+BATCH_CHUNK_SIZE = 500
+
+# Generation tokens outlive the entries they version; expiry just forces one refetch
+GENERATION_TTL = 86400
+
+# Entry TTLs for the main cached resources
+SEARCH_CACHE_TTL = 300
+SPOT_CACHE_TTL = 600
+
+# Access stats are buffered per worker and flushed to Redis in one pipeline
+ACCESS_FLUSH_EVERY = 100        # hits
+ACCESS_FLUSH_INTERVAL = 10      # seconds
+ACCESS_STATS_MAX_MEMBERS = 1000 # per kind, lowest scores trimmed on decay
+
+# Set by invalidations large enough that the warmer should run early
+WARM_REQUEST_KEY = "warm:requested"
+
+# SETEX unless the cached JSON carries a newer updated_at, so out-of-order
+# write-throughs and slow cache-miss readers can't put an older version back
+SET_IF_NEWER_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current then
+    local ok, decoded = pcall(cjson.decode, current)
+    if ok and type(decoded) == 'table' and type(decoded['updated_at']) == 'string'
+        and decoded['updated_at'] > ARGV[2] then
+        return 0
+    end
+end
+redis.call('SETEX', KEYS[1], ARGV[3], ARGV[1])
+return 1
+"""
+
+class MonitoredConnectionPool(redis.BlockingConnectionPool):
+    """BlockingConnectionPool that reports every checkout, whatever command it serves."""
+    
+    def __init__(self, *args, on_checkout: Optional[Callable[[], None]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_checkout = on_checkout
+    
+    async def get_connection(self, command_name, *keys, **options):
+        connection = await super().get_connection(command_name, *keys, **options)
+        if self.on_checkout is not None:
+            self.on_checkout()
+        return connection
+
 
 class RedisCache:
     """Redis cache manager."""
     
     def __init__(self):
         self.redis_client: Optional[redis.Redis] = None
+        self.pool: Optional[redis.BlockingConnectionPool] = None
         self.enabled = True
+        self._pool_saturated = False
+        self._access_buffer: Counter = Counter()
+        self._access_flushed_at = time.monotonic()
     
     async def connect(self):
-        """Connect to Redis."""
+        """Connect to Redis using a sized connection pool shared by this worker."""
         try:
-            self.redis_client = redis.Redis(
+            # Blocking pool: when every connection is busy, callers wait up to
+            # REDIS_POOL_TIMEOUT for one to free up instead of opening more sockets
+            self.pool = MonitoredConnectionPool(
                 host=settings.REDIS_HOST,
                 port=settings.REDIS_PORT,
                 password=settings.REDIS_PASSWORD,
@@ -24,20 +81,56 @@ class RedisCache:
                 decode_responses=True,
                 socket_connect_timeout=5,
                 socket_timeout=5,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                timeout=settings.REDIS_POOL_TIMEOUT,
+                # Single-key commands, pipelines and direct client use all count
+                on_checkout=self._check_pool_saturation,
             )
+            self.redis_client = redis.Redis(connection_pool=self.pool)
             # Test connection
             await self.redis_client.ping()
-            print("✓ Redis connected successfully")
+            print(f"✓ Redis connected successfully (pool size {settings.REDIS_MAX_CONNECTIONS})")
         except Exception as e:
             print(f"⚠ Redis connection failed: {e}. Caching disabled.")
             self.enabled = False
             self.redis_client = None
+            self.pool = None
     
     async def disconnect(self):
         """Disconnect from Redis."""
         if self.redis_client:
             await self.redis_client.close()
-            print("✓ Redis disconnected")
+        if self.pool:
+            await self.pool.disconnect()
+        print("✓ Redis disconnected")
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Report usage of this worker's Redis connection pool."""
+        if not self.pool:
+            return {"enabled": False}
+        # redis-py has no public counters; these collections exist on the asyncio
+        # pools of 4.x and 5.x but are private, so a missing one reads as empty
+        max_connections = getattr(self.pool, "max_connections", 0)
+        in_use = len(getattr(self.pool, "_in_use_connections", ()) or ())
+        available = len(getattr(self.pool, "_available_connections", ()) or ())
+        return {
+            "enabled": self.enabled,
+            "max_connections": max_connections,
+            "created_connections": in_use + available,
+            "in_use_connections": in_use,
+            "saturation": round(in_use / max_connections, 2) if max_connections else 0.0,
+        }
+    
+    def _check_pool_saturation(self):
+        """Log once each time pool usage crosses the warning threshold."""
+        stats = self.pool_stats()
+        saturated = stats.get("saturation", 0.0) >= settings.REDIS_POOL_WARN_RATIO
+        if saturated and not self._pool_saturated:
+            print(
+                f"⚠ Redis pool saturation {stats['in_use_connections']}/"
+                f"{stats['max_connections']} connections in use"
+            )
+        self._pool_saturated = saturated
     
     async def get(self, key: str) -> Optional[str]:
         """Get value from cache."""
@@ -71,21 +164,138 @@ class RedisCache:
             print(f"Redis DELETE error: {e}")
             return False
     
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Get several values in one round trip (MGET); misses come back as None."""
+        if not keys:
+            return []
+        if not self.enabled or not self.redis_client:
+            return [None] * len(keys)
+        try:
+            if len(keys) <= BATCH_CHUNK_SIZE:
+                return await self.redis_client.mget(keys)
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for i in range(0, len(keys), BATCH_CHUNK_SIZE):
+                    pipe.mget(keys[i:i + BATCH_CHUNK_SIZE])
+                chunks = await pipe.execute()
+            return [value for chunk in chunks for value in chunk]
+        except Exception as e:
+            print(f"Redis MGET error: {e}")
+            return [None] * len(keys)
+    
+    async def set_many(self, mapping: Dict[str, str], ttl: int = 300) -> bool:
+        """Set several values with the same TTL in one pipelined round trip."""
+        if not mapping:
+            return True
+        if not self.enabled or not self.redis_client:
+            return False
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    pipe.setex(key, ttl, value)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Redis SET_MANY error: {e}")
+            return False
+    
+    async def set_many_if_newer(self, entries: Dict[str, tuple], ttl: int = 300) -> bool:
+        """
+        Set JSON values keyed by (value, updated_at) unless the cache holds newer ones.
+        
+        All entries go out in one pipelined round trip.
+        """
+        if not entries:
+            return True
+        if not self.enabled or not self.redis_client:
+            return False
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, (value, updated_at) in entries.items():
+                    pipe.eval(SET_IF_NEWER_SCRIPT, 1, key, value, updated_at or "", ttl)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Redis SET_IF_NEWER error: {e}")
+            return False
+    
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        """Delete several keys in one pipelined round trip. Returns number deleted."""
+        keys = list(keys)
+        if not keys:
+            return 0
+        if not self.enabled or not self.redis_client:
+            return 0
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for i in range(0, len(keys), BATCH_CHUNK_SIZE):
+                    pipe.delete(*keys[i:i + BATCH_CHUNK_SIZE])
+                results = await pipe.execute()
+            return sum(results)
+        except Exception as e:
+            print(f"Redis DELETE_MANY error: {e}")
+            return 0
+    
     async def delete_pattern(self, pattern: str) -> int:
         """Delete all keys matching pattern."""
         if not self.enabled or not self.redis_client:
             return 0
         try:
             keys = []
-            async for key in self.redis_client.scan_iter(match=pattern):
+            async for key in self.redis_client.scan_iter(match=pattern, count=BATCH_CHUNK_SIZE):
                 keys.append(key)
-            if keys:
-                return await self.redis_client.delete(*keys)
-            return 0
+            return await self.delete_many(keys)
         except Exception as e:
             print(f"Redis DELETE_PATTERN error: {e}")
             return 0
     
+    async def record_access(self, kind: str, member: str):
+        """
+        Count a read of a cacheable resource so the cache warmer knows what's hot.
+        
+        Hits are buffered in-process and flushed as ZINCRBYs on stats:{kind}
+        every ACCESS_FLUSH_EVERY hits or ACCESS_FLUSH_INTERVAL seconds.
+        """
+        if not self.enabled or not self.redis_client:
+            return
+        self._access_buffer[(kind, member)] += 1
+        if (
+            sum(self._access_buffer.values()) < ACCESS_FLUSH_EVERY
+            and time.monotonic() - self._access_flushed_at < ACCESS_FLUSH_INTERVAL
+        ):
+            return
+        buffered, self._access_buffer = self._access_buffer, Counter()
+        self._access_flushed_at = time.monotonic()
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for (stat_kind, stat_member), hits in buffered.items():
+                    pipe.zincrby(f"stats:{stat_kind}", hits, stat_member)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Redis access stats error: {e}")
+    
+    async def top_accessed(self, kind: str, limit: int) -> List[str]:
+        """Most frequently read members of a resource kind, hottest first."""
+        if not self.enabled or not self.redis_client or limit <= 0:
+            return []
+        try:
+            return await self.redis_client.zrevrange(f"stats:{kind}", 0, limit - 1)
+        except Exception as e:
+            print(f"Redis access stats error: {e}")
+            return []
+    
+    async def decay_access_stats(self, kind: str, factor: float = 0.5):
+        """Age access counts so yesterday's hot keys make way for today's."""
+        if not self.enabled or not self.redis_client:
+            return
+        key = f"stats:{kind}"
+        try:
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.zunionstore(key, {key: factor})
+                pipe.zremrangebyrank(key, 0, -(ACCESS_STATS_MAX_MEMBERS + 1))
+                await pipe.execute()
+        except Exception as e:
+            print(f"Redis access stats error: {e}")
+    
     def generate_cache_key(self, prefix: str, **kwargs) -> str:
         """Generate cache key from prefix and parameters."""
         # Sort kwargs for consistent keys
@@ -135,15 +345,208 @@ def cached(prefix: str, ttl: int = 300):
     return decorator
 
 
+async def get_generation(name: str, create: bool = True) -> Optional[str]:
+    """
+    Get the current generation token for a cached resource.
+    
+    Tokens are random rather than counters so that a Redis flush can never
+    hand out a token a client has already seen. Returns None when Redis is
+    unavailable, in which case callers should skip conditional responses.
+    With create=False a missing token is not minted (and None is returned),
+    for resources that may not exist.
+    """
+    if not cache.enabled or not cache.redis_client:
+        return None
+    key = f"gen:{name}"
+    try:
+        generation = await cache.redis_client.get(key)
+        if generation is None and create:
+            await cache.redis_client.set(key, uuid.uuid4().hex, ex=GENERATION_TTL, nx=True)
+            generation = await cache.redis_client.get(key)
+        return generation
+    except Exception as e:
+        print(f"Redis GENERATION error: {e}")
+        return None
+
+
+async def bump_generations(*names: str):
+    """Give each named resource a fresh generation token (changes its ETag)."""
+    if not names or not cache.enabled or not cache.redis_client:
+        return
+    try:
+        async with cache.redis_client.pipeline(transaction=False) as pipe:
+            for name in names:
+                pipe.set(f"gen:{name}", uuid.uuid4().hex, ex=GENERATION_TTL)
+            await pipe.execute()
+    except Exception as e:
+        print(f"Redis GENERATION bump error: {e}")
+
+
+def parse_entity_id(entity_id: str) -> Optional[uuid.UUID]:
+    """Parse a path ID; malformed IDs can't exist, so callers 404 without a query."""
+    try:
+        return uuid.UUID(entity_id)
+    except (ValueError, AttributeError):
+        return None
+
+
+def missing_key(kind: str, entity_id: str) -> str:
+    """Negative-cache key for an ID of the given kind."""
+    return f"missing:{kind}:{entity_id}"
+
+
+async def is_known_missing(kind: str, entity_id: str) -> bool:
+    """Check the negative cache for an ID recently found not to exist."""
+    return await cache.get(missing_key(kind, entity_id)) is not None
+
+
+async def remember_missing(kind: str, entity_id: str):
+    """Negative-cache an ID that was looked up and not found."""
+    await cache.set(missing_key(kind, entity_id), "1", ttl=settings.NEGATIVE_CACHE_TTL)
+
+
+def _spot_entries(spots: Iterable[Any]) -> Dict[str, tuple]:
+    """Spot detail cache entries as (JSON, updated_at), skipping spots that don't serialize."""
+    entries = {}
+    for spot in spots:
+        try:
+            payload = serialize_spot_detail(spot)
+        except Exception as e:
+            print(f"Cache serialization error: {e}")
+            continue
+        entries[f"spot:{payload['id']}"] = (json.dumps(payload), payload["updated_at"])
+    return entries
+
+
+async def store_spot_details(spots: Iterable[Any]) -> List[str]:
+    """Cache fresh spot details (never overwriting newer ones). Returns the spot IDs stored."""
+    entries = _spot_entries(spots)
+    await cache.set_many_if_newer(entries, ttl=SPOT_CACHE_TTL)
+    return [key.split(":", 1)[1] for key in entries]
+
+
+async def write_through_spots(spots: Iterable[Any], invalidate_search: bool = False):
+    """
+    Write committed spot changes straight into the cache.
+    
+    Call after commit with refreshed spots. Detail readers keep hitting the
+    cache instead of missing once per mutation; search pages embed a subset of
+    spot fields, so pass invalidate_search when one of those changed.
+    """
+    spots = list(spots)
+    spot_ids = [str(spot.id) for spot in spots]
+    stored = set(await store_spot_details(spots))
+    # Anything we couldn't serialize falls back to plain invalidation
+    await cache.delete_many(f"spot:{spot_id}" for spot_id in spot_ids if spot_id not in stored)
+    await bump_generations(*(f"spot:{spot_id}" for spot_id in spot_ids))
+    if invalidate_search:
+        await invalidate_search_cache()
+
+
 async def invalidate_spot_cache(spot_id: str):
     """Invalidate cache for a specific parking spot."""
-    await cache.delete(f"spot:{spot_id}")
-    # Also invalidate search results that might contain this spot
-    await cache.delete_pattern("search:*")
+    # Also invalidate search results that might contain this spot; the spot key
+    # rides along in the same pipeline as the search keys
+    if not cache.enabled or not cache.redis_client:
+        return
+    try:
+        keys = [f"spot:{spot_id}"]
+        async for key in cache.redis_client.scan_iter(match="search:*", count=BATCH_CHUNK_SIZE):
+            keys.append(key)
+        deleted = await cache.delete_many(keys)
+    except Exception as e:
+        print(f"Cache invalidation error: {e}")
+        deleted = 0
+    await bump_generations(f"spot:{spot_id}", "search")
+    await request_cache_warm_if_large(deleted)
+
+
+async def invalidate_spots(spot_ids: Iterable[str]):
+    """invalidate_spot_cache for several spots at once, with a single search sweep."""
+    spot_ids = list(spot_ids)
+    if not spot_ids:
+        return
+    await cache.delete_many(f"spot:{spot_id}" for spot_id in spot_ids)
+    await bump_generations(*(f"spot:{spot_id}" for spot_id in spot_ids))
+    await invalidate_search_cache()
+
+
+class CacheUnavailable(Exception):
+    """Redis is switched off or unreachable for a cache update that must not be skipped."""
+
+
+async def _apply_spot_changes(
+    entries: Dict[str, tuple], delete_keys: List[str], generations: List[str], sweep_search: bool
+):
+    """
+    Write, delete and re-version spot cache keys in one pipeline.
+    
+    Unlike the helpers above this never skips: it raises CacheUnavailable
+    when Redis is off and lets Redis errors through, for callers that retry.
+    """
+    if not cache.enabled or not cache.redis_client:
+        raise CacheUnavailable("Redis cache is not available")
+    client = cache.redis_client
+    delete_keys, generations = list(delete_keys), list(generations)
+    searches = 0
+    if sweep_search:
+        async for key in client.scan_iter(match="search:*", count=BATCH_CHUNK_SIZE):
+            delete_keys.append(key)
+            searches += 1
+        generations.append("search")
+    async with client.pipeline(transaction=False) as pipe:
+        for key, (value, updated_at) in entries.items():
+            pipe.eval(SET_IF_NEWER_SCRIPT, 1, key, value, updated_at or "", SPOT_CACHE_TTL)
+        for i in range(0, len(delete_keys), BATCH_CHUNK_SIZE):
+            pipe.delete(*delete_keys[i:i + BATCH_CHUNK_SIZE])
+        for name in generations:
+            pipe.set(f"gen:{name}", uuid.uuid4().hex, ex=GENERATION_TTL)
+        await pipe.execute()
+    await request_cache_warm_if_large(searches)
+
+
+async def write_through_spots_strict(spots: Iterable[Any], invalidate_search: bool = False):
+    """write_through_spots that raises instead of skipping when Redis is off or fails."""
+    spots = list(spots)
+    spot_ids = [str(spot.id) for spot in spots]
+    entries = _spot_entries(spots)
+    await _apply_spot_changes(
+        entries,
+        [f"spot:{spot_id}" for spot_id in spot_ids if f"spot:{spot_id}" not in entries],
+        [f"spot:{spot_id}" for spot_id in spot_ids],
+        sweep_search=invalidate_search
+    )
+
+
+async def invalidate_spots_strict(spot_ids: Iterable[str]):
+    """invalidate_spots that raises instead of skipping when Redis is off or fails."""
+    keys = [f"spot:{spot_id}" for spot_id in spot_ids]
+    if not keys:
+        return
+    await _apply_spot_changes({}, keys, keys, sweep_search=True)
 
 
 async def invalidate_search_cache():
     """Invalidate all search result caches."""
     deleted = await cache.delete_pattern("search:*")
+    await bump_generations("search")
+    await request_cache_warm_if_large(deleted)
     if deleted > 0:
         print(f"✓ Invalidated {deleted} search cache entries")
+
+
+async def request_cache_warm_if_large(deleted: int):
+    """Ask the cache warmer to run early after an invalidation dropped many keys."""
+    if deleted < settings.CACHE_WARM_INVALIDATION_THRESHOLD:
+        return
+    await cache.set(WARM_REQUEST_KEY, str(deleted), ttl=settings.CACHE_WARM_INTERVAL)
+
+
+async def invalidate_review_cache(spot_id: str):
+    """Invalidate cached review listings for a parking spot."""
+    await bump_generations(f"reviews:{spot_id}")
+
+
+async def invalidate_review_caches(spot_ids: Iterable[str]):
+    """Invalidate cached review listings for several parking spots."""
+    await bump_generations(*(f"reviews:{spot_id}" for spot_id in spot_ids))
@@ -0,0 +1,127 @@
+"""Cache warmer: precompute hot search pages and spot details into Redis."""
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+from sqlalchemy import select
+
+from app.cache import (
+    cache, store_spot_details, SEARCH_CACHE_TTL, GENERATION_TTL, WARM_REQUEST_KEY
+)
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.parking_spot import ParkingSpot, ParkingSpotType, VehicleSize
+from app.api.v1.endpoints.parking_spots import fetch_spot_listing
+
+logger = logging.getLogger(__name__)
+
+# How often the runner checks for warm requests and Redis flushes
+WARM_POLL_INTERVAL = 5
+
+# Present while Redis still holds warmed data; missing means a flush or cold start
+WARM_SENTINEL_KEY = "warm:sentinel"
+
+
+def _listing_kwargs(params: dict) -> dict:
+    """Turn recorded search parameters back into fetch_spot_listing arguments."""
+    kwargs = dict(params)
+    if kwargs.get("spot_type"):
+        kwargs["spot_type"] = ParkingSpotType(kwargs["spot_type"])
+    if kwargs.get("vehicle_size"):
+        kwargs["vehicle_size"] = VehicleSize(kwargs["vehicle_size"])
+    return kwargs
+
+
+async def warm_cache() -> dict:
+    """Populate missing search: and spot: entries for the hottest keys."""
+    searches = await cache.top_accessed("search", settings.CACHE_WARM_TOP_SEARCHES)
+    spot_ids = await cache.top_accessed("spot", settings.CACHE_WARM_TOP_SPOTS)
+
+    search_params = {}
+    for member in searches:
+        try:
+            params = json.loads(member)
+        except json.JSONDecodeError:
+            continue
+        search_params[cache.generate_cache_key("search", **params)] = params
+
+    # Stats may contain ids from stale deep links or scrapers; skip anything that isn't a UUID
+    spot_keys = {}
+    for spot_id in spot_ids:
+        try:
+            spot_keys[f"spot:{spot_id}"] = uuid.UUID(spot_id)
+        except ValueError:
+            continue
+
+    # Only rebuild entries that aren't cached already
+    keys = list(search_params) + list(spot_keys)
+    present = await cache.get_many(keys)
+    missing = {key for key, value in zip(keys, present) if value is None}
+
+    search_entries = {}
+    spots = []
+    async with AsyncSessionLocal() as db:
+        for key, params in search_params.items():
+            if key not in missing:
+                continue
+            listing = await fetch_spot_listing(db, **_listing_kwargs(params))
+            search_entries[key] = json.dumps(listing, default=str)
+
+        missing_spots = [spot_keys[key] for key in spot_keys if key in missing]
+        if missing_spots:
+            result = await db.execute(
+                select(ParkingSpot).where(ParkingSpot.id.in_(missing_spots))
+            )
+            spots = result.scalars().all()
+
+    await cache.set_many(search_entries, ttl=SEARCH_CACHE_TTL)
+    stored = await store_spot_details(spots)
+    await cache.set(WARM_SENTINEL_KEY, "1", ttl=GENERATION_TTL)
+
+    return {"searches": len(search_entries), "spots": len(stored)}
+
+
+async def _warm_requested() -> bool:
+    """Consume a pending warm request left by a large invalidation."""
+    if await cache.get(WARM_REQUEST_KEY):
+        await cache.delete(WARM_REQUEST_KEY)
+        return True
+    return False
+
+
+async def cache_warmer_runner():
+    """Warm the cache at startup, on a schedule, and after large invalidations or flushes."""
+    logger.info("Starting cache warmer...")
+    last_run = None
+
+    while True:
+        try:
+            if cache.enabled and cache.redis_client:
+                now = time.monotonic()
+                scheduled = last_run is None or now - last_run >= settings.CACHE_WARM_INTERVAL
+                requested = await _warm_requested()
+                flushed = await cache.get(WARM_SENTINEL_KEY) is None
+
+                if scheduled or requested or flushed:
+                    started = time.perf_counter()
+                    warmed = await warm_cache()
+                    last_run = now
+                    # Age the stats on the regular schedule only, so bursts of
+                    # invalidation-triggered runs don't wipe out the rankings
+                    if scheduled:
+                        await cache.decay_access_stats("search")
+                        await cache.decay_access_stats("spot")
+                    logger.info(
+                        f"Cache warmed {warmed['searches']} searches and {warmed['spots']} spots "
+                        f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+                    )
+
+            await asyncio.sleep(WARM_POLL_INTERVAL)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in cache warmer: {e}")
+            await asyncio.sleep(settings.CACHE_WARM_INTERVAL)
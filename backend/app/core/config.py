@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import Dict, List, Union
 from pydantic_settings import BaseSettings
 from pydantic import AnyHttpUrl, field_validator
 
@@ -13,12 +13,39 @@ class Settings(BaseSettings):
     DB_POOL_TIMEOUT: int = 30       # seconds to wait for a free connection before raising
     DB_POOL_RECYCLE: int = 1800     # recycle connections after 30 min (prevents stale TCP)
     DB_ECHO: bool = False           # set True locally to log SQL
+    DB_POOL_WAIT_WARN_MS: int = 100 # log when a checkout waits longer than this
+    DB_CONNECTION_BUDGET: int = 0   # total Postgres connections for all API workers (0 = use the pool settings as-is)
+    DB_BUDGET_RESERVED: int = 10    # part of the budget kept for the background worker, migrations and psql
+    DB_WORKERS: int = 0             # API workers sharing the budget (0 = $WEB_CONCURRENCY, else 1)
+    DB_FASTPATH_ENABLED: bool = False  # raw asyncpg queries for spot listing/detail (PostgreSQL only)
+    SQLITE_UUID_STORAGE: str = "text"  # text: CHAR(36) | blob: 16-byte BLOB (new SQLite databases only)
+    DB_BOOT_MODE: str = "verify"    # verify: check the alembic revision | create_all: dev only | skip
+    DB_STATEMENT_TIMEOUTS_ENABLED: bool = True  # per-route SET LOCAL statement_timeout from db_budget()
+    DB_QUERY_BUDGETS_ENABLED: bool = True  # per-route query-count budgets from db_budget() (logged when exceeded)
+    DB_PGBOUNCER: bool = False      # DATABASE_URL points at PgBouncer in transaction pooling mode
+    DATABASE_DIRECT_URL: str = ""   # direct Postgres URL for migrations when DATABASE_URL goes through PgBouncer
+    
+    # Read replica (optional; empty = all reads go to the primary)
+    DATABASE_REPLICA_URL: str = ""
+    DB_REPLICA_MAX_LAG: float = 2.0             # seconds of lag before reads fall back to the primary
+    DB_REPLICA_LAG_CHECK_INTERVAL: int = 5      # seconds between replica lag checks
+    DB_READ_YOUR_WRITES_SECONDS: int = 10       # how long a client reads from the primary after writing
+    
+    # Bookings partitioning / archival (PostgreSQL, after `alembic upgrade head`)
+    BOOKING_ARCHIVE_AFTER_DAYS: int = 30           # finished bookings older than this move to archive partitions
+    BOOKING_PARTITION_MONTHS_AHEAD: int = 12       # monthly partitions kept created ahead of today
+    BOOKING_MAINTENANCE_INTERVAL: int = 3600       # seconds between partition/archival runs
     
     # Security
     SECRET_KEY: str = "your-super-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    BCRYPT_ROUNDS: int = 12          # cost for new hashes; older hashes are upgraded on login
+    PASSWORD_HASH_WORKERS: int = 0   # bcrypt worker processes per API worker (0 = CPU count)
+    PASSWORD_HASH_MAX_WAIT_MS: int = 2000  # answer 429 when the hashing queue wait would exceed this
+    AUTH_TOKEN_CLAIMS: bool = False  # access tokens carry role/is_active/version so read routes skip the user lookup
+    JWT_MEMO_SIZE: int = 4096        # verified tokens each worker remembers until their exp (0 = off)
     
     # CORS
     BACKEND_CORS_ORIGINS: Union[List[str], str] = ["http://localhost:3000"]
@@ -36,6 +63,22 @@ class Settings(BaseSettings):
     STRIPE_SECRET_KEY: str = ""
     STRIPE_PUBLISHABLE_KEY: str = ""
     STRIPE_WEBHOOK_SECRET: str = ""
+    STRIPE_API_BASE: str = "https://api.stripe.com"  # point at fake_stripe.py for tests and load runs
+    STRIPE_API_VERSION: str = ""         # Stripe-Version header; empty = the account's default
+    STRIPE_TIMEOUT: float = 10.0         # seconds to wait for a response, per attempt
+    STRIPE_CONNECT_TIMEOUT: float = 3.0
+    STRIPE_MAX_RETRIES: int = 2          # extra attempts on network errors, 409/429/5xx
+    STRIPE_MAX_CONNECTIONS: int = 50     # pooled connections to Stripe per worker
+    STRIPE_BREAKER_THRESHOLD: int = 5    # consecutive failed calls that open the circuit
+    STRIPE_BREAKER_COOLDOWN: int = 30    # seconds calls fail fast before a probe is let through
+    WEBHOOK_BATCH_SIZE: int = 200        # inbox events applied per transaction
+    WEBHOOK_POLL_INTERVAL: float = 1.0   # seconds between inbox checks when nothing wakes the consumer
+    WEBHOOK_MAX_ATTEMPTS: int = 5        # failed applications before an event is left for inspection
+    WEBHOOK_RETENTION_DAYS: int = 30     # processed events are kept this long for audits
+    OUTBOX_BATCH_SIZE: int = 500         # outbox messages delivered per transaction
+    OUTBOX_POLL_INTERVAL: float = 0.5    # seconds between outbox checks when no commit wakes the dispatcher
+    OUTBOX_MAX_ATTEMPTS: int = 10        # failed deliveries before a DB effect is dead-lettered (cache effects retry)
+    OUTBOX_RETENTION_HOURS: int = 24     # delivered messages are kept this long
     SKIP_PAYMENT_PROCESSING: bool = True  # Auto-confirm bookings without payment (for testing)
     
     # Google OAuth
@@ -48,6 +91,44 @@ class Settings(BaseSettings):
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: str = ""
     REDIS_URL: str = "redis://localhost:6379"
+    REDIS_MAX_CONNECTIONS: int = 50     # per-worker pool size shared by all requests
+    REDIS_POOL_TIMEOUT: int = 2         # seconds to wait for a free pooled connection
+    REDIS_POOL_WARN_RATIO: float = 0.8  # log a warning once this fraction of the pool is in use
+    
+    # Cache warmer (run from run_background_tasks.py)
+    CACHE_WARM_ENABLED: bool = True
+    CACHE_WARM_INTERVAL: int = 240                 # seconds between scheduled warm runs
+    CACHE_WARM_TOP_SEARCHES: int = 50              # hottest search pages to precompute
+    CACHE_WARM_TOP_SPOTS: int = 200                # most viewed spot details to precompute
+    CACHE_WARM_INVALIDATION_THRESHOLD: int = 20    # keys dropped by one invalidation that trigger an early warm
+    
+    # Negative caching of unknown IDs (404s answered without a DB query)
+    NEGATIVE_CACHE_TTL: int = 60                   # seconds a "not found" is remembered
+    SPOT_BLOOM_ENABLED: bool = True                # per-worker bloom filter of existing spot IDs
+    SPOT_BLOOM_REBUILD_INTERVAL: int = 300         # seconds between filter rebuilds
+    
+    # Authenticated-user snapshot cache (get_current_user without a users query)
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_TTL: int = 300                      # seconds a snapshot lives in Redis
+    USER_CACHE_LOCAL_TTL: int = 5                  # seconds a worker serves its own copy; bounds cross-worker staleness
+    USER_CACHE_LOCAL_SIZE: int = 10000             # users kept in each worker's LRU
+    
+    # Rate limiting (token buckets in Redis; "<route>:ip" / "<route>:user" -> "count/period")
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_TRUST_PROXY: bool = False           # take the client IP from X-Forwarded-For (behind a trusted proxy only)
+    RATE_LIMITS: Dict[str, str] = {
+        "login:ip": "20/minute",
+        "login:user": "5/minute",                  # per email being tried
+        "register:ip": "5/minute",
+        "refresh:ip": "30/minute",
+        "forgot_password:ip": "5/minute",
+        "oauth:ip": "20/minute",
+        "search:ip": "120/minute",                 # map panning fires a search per move
+        "search:user": "120/minute",
+    }
+    
+    # HTTP caching (Cache-Control max-age for public read endpoints, in seconds)
+    HTTP_CACHE_MAX_AGE: int = 30
     
     # AWS S3 (for image uploads)
     AWS_ACCESS_KEY_ID: str = ""
@@ -0,0 +1,189 @@
+"""
+Google ID token verification without blocking the event loop.
+
+google-auth's verify_oauth2_token fetched Google's certificates with a
+synchronous HTTP call on every sign-in, from inside the async handler.
+Here the JWKS is fetched with httpx, kept for as long as Google's
+Cache-Control max-age allows, and refreshed ahead of expiry by
+google_jwks_runner(); tokens are verified locally against the cached keys.
+
+An expired key set keeps being used (for up to STALE_GRACE) while a fresh
+one is fetched in the background. A token signed with a key id we don't
+know yet triggers one refetch, at most every MIN_REFETCH_INTERVAL seconds,
+so made-up key ids can't be used to hammer Google.
+"""
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from jose import jwk, jwt, JWTError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+# Key set lifetime when the response has no usable Cache-Control
+DEFAULT_MAX_AGE = 3600
+
+# How long past max-age an old key set may still verify tokens while refreshes fail
+STALE_GRACE = 3600
+
+# Floor between refetches caused by unknown key ids
+MIN_REFETCH_INTERVAL = 30
+
+# Refresh when this fraction of max-age has passed
+REFRESH_AHEAD = 0.8
+
+FETCH_TIMEOUT = 5.0
+
+# Clock skew tolerated on exp/iat/nbf, in seconds
+LEEWAY = 10
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class InvalidGoogleToken(ValueError):
+    """The ID token is malformed, badly signed, expired or not meant for us."""
+
+
+def cache_max_age(cache_control: str) -> Optional[int]:
+    """max-age from a Cache-Control header, None if absent or no-store."""
+    if not cache_control or "no-store" in cache_control or "no-cache" in cache_control:
+        return None
+    match = _MAX_AGE_RE.search(cache_control)
+    return int(match.group(1)) if match else None
+
+
+class GoogleIdTokenVerifier:
+    """Verifies Google ID tokens against a cached copy of Google's JWKS."""
+
+    def __init__(
+        self,
+        certs_url: str = GOOGLE_CERTS_URL,
+        client_id: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        min_refetch_interval: float = MIN_REFETCH_INTERVAL,
+    ):
+        self.certs_url = certs_url
+        self._client_id = client_id
+        self._transport = transport
+        self.min_refetch_interval = min_refetch_interval
+        self._keys: Dict[str, Any] = {}
+        self._max_age = DEFAULT_MAX_AGE
+        self._fetched_at = 0.0
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+        self._background: Optional[asyncio.Task] = None
+        self.fetches = 0
+
+    @property
+    def client_id(self) -> str:
+        return self._client_id or settings.GOOGLE_CLIENT_ID
+
+    def refresh_due_in(self) -> float:
+        """Seconds until the key set should be refreshed (0 if it should be now)."""
+        if not self._keys:
+            return 0.0
+        due = self._fetched_at + self._max_age * REFRESH_AHEAD
+        return max(0.0, due - time.monotonic())
+
+    async def refresh(self):
+        """Fetch the JWKS and replace the cached keys."""
+        async with httpx.AsyncClient(transport=self._transport, timeout=FETCH_TIMEOUT) as client:
+            response = await client.get(self.certs_url)
+            response.raise_for_status()
+        keys = {}
+        for key in response.json().get("keys", []):
+            if key.get("kid") and key.get("kty") == "RSA":
+                # Build the key objects once, not on every verification
+                keys[key["kid"]] = jwk.construct(key, key.get("alg", "RS256"))
+        if not keys:
+            raise ValueError("Google JWKS response contained no RSA keys")
+
+        now = time.monotonic()
+        self._keys = keys
+        self._max_age = cache_max_age(response.headers.get("cache-control", "")) or DEFAULT_MAX_AGE
+        self._fetched_at = now
+        self._expires_at = now + self._max_age
+        self.fetches += 1
+
+    async def _refresh_throttled(self):
+        async with self._lock:
+            # Another caller may have refreshed while we waited for the lock
+            if self._keys and time.monotonic() - self._fetched_at < self.min_refetch_interval:
+                return
+            await self.refresh()
+
+    async def _refresh_quietly(self):
+        try:
+            await self._refresh_throttled()
+        except Exception as e:
+            logger.warning(f"Google JWKS refresh failed, still using cached keys: {e}")
+
+    def _refresh_in_background(self):
+        if self._background is None or self._background.done():
+            self._background = asyncio.create_task(self._refresh_quietly())
+
+    async def _signing_key(self, kid: Optional[str]):
+        now = time.monotonic()
+        if not self._keys or now >= self._expires_at + STALE_GRACE:
+            await self._refresh_throttled()
+        elif now >= self._expires_at:
+            self._refresh_in_background()
+
+        key = self._keys.get(kid)
+        if key is None:
+            # Possibly a key Google rotated in since our last fetch
+            await self._refresh_throttled()
+            key = self._keys.get(kid)
+        if key is None:
+            raise InvalidGoogleToken("Token signed with an unknown key")
+        return key
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Claims of a valid ID token for this app; InvalidGoogleToken otherwise."""
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError as e:
+            raise InvalidGoogleToken(f"Malformed token: {e}")
+        if header.get("alg") != "RS256":
+            raise InvalidGoogleToken("Unexpected signing algorithm")
+
+        key = await self._signing_key(header.get("kid"))
+        try:
+            return jwt.decode(
+                token,
+                key,
+                algorithms=["RS256"],
+                audience=self.client_id,
+                issuer=GOOGLE_ISSUERS,
+                # at_hash ties the token to an access token we never receive
+                options={"verify_at_hash": False, "leeway": LEEWAY},
+            )
+        except JWTError as e:
+            raise InvalidGoogleToken(str(e))
+
+
+google_verifier = GoogleIdTokenVerifier()
+
+
+async def google_jwks_runner():
+    """Keep Google's key set fetched ahead of expiry, so sign-ins never wait on it."""
+    if not settings.GOOGLE_CLIENT_ID:
+        return
+    while True:
+        try:
+            await google_verifier.refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching Google JWKS: {e}")
+            await asyncio.sleep(60)
+            continue
+        await asyncio.sleep(max(60.0, google_verifier.refresh_due_in()))
@@ -0,0 +1,154 @@
+"""
+Process-pool bcrypt hashing with admission control.
+
+bcrypt at cost 12 is ~200ms of CPU per call. Running it in the default
+thread pool competed with every other run_in_executor user and with the
+event loop for the GIL. Hashing and verification now run in a dedicated
+pool of worker processes (PASSWORD_HASH_WORKERS).
+
+Jobs waiting for a worker form this service's queue. Before a job is
+queued, the wait is estimated from the queue depth and the recent average
+bcrypt time. When that estimate exceeds PASSWORD_HASH_MAX_WAIT_MS the job is
+refused (PasswordHasherBusy, answered with 429) instead of piling up behind
+a login storm.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+import bcrypt
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Starting estimate for one bcrypt call until real timings come in
+INITIAL_HASH_SECONDS = 0.25
+
+# Weight of the newest sample in the moving average of bcrypt time
+EWMA_ALPHA = 0.1
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _timed(fn, *args):
+    # Runs in a worker process; the CPU time feeds the queue-wait estimate
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def hash_rounds(hashed_password: Optional[str]) -> Optional[int]:
+    """Cost factor of a bcrypt hash ("$2b$12$..." -> 12), None if it isn't one."""
+    try:
+        return int(hashed_password.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed_password: Optional[str]) -> bool:
+    """Whether a stored hash uses a different cost than BCRYPT_ROUNDS."""
+    rounds = hash_rounds(hashed_password)
+    return rounds is not None and rounds != settings.BCRYPT_ROUNDS
+
+
+class PasswordHasherBusy(Exception):
+    """The hashing queue is over its latency budget."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Password hashing queue is full, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """Dedicated process pool for bcrypt, with its own queue and metrics."""
+
+    def __init__(self):
+        self.workers = settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.pending = 0          # submitted and not finished (running + queued)
+        self.avg_seconds = INITIAL_HASH_SECONDS
+        self.avg_wait_seconds = 0.0
+        self.completed = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+
+    def start(self):
+        """Create the pool and spawn its workers, so the first login doesn't pay for it."""
+        if self._executor is not None:
+            return
+        # spawn rather than fork: the parent has an event loop and driver threads running
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        for _ in range(self.workers):
+            self._executor.submit(int)
+        logger.info(f"Password hashing pool started with {self.workers} workers")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.pending - self.workers)
+
+    def estimated_wait(self) -> float:
+        """Seconds a job submitted now would wait for a worker."""
+        return (self.pending // self.workers) * self.avg_seconds
+
+    def busy(self) -> bool:
+        return self.estimated_wait() * 1000 > settings.PASSWORD_HASH_MAX_WAIT_MS
+
+    async def _run(self, fn, *args):
+        if self.busy():
+            self.rejected += 1
+            raise PasswordHasherBusy(self.estimated_wait())
+        if self._executor is None:
+            self.start()
+
+        self.pending += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        submitted = time.perf_counter()
+        try:
+            result, seconds = await asyncio.wrap_future(self._executor.submit(_timed, fn, *args))
+        finally:
+            self.pending -= 1
+        waited = time.perf_counter() - submitted - seconds
+        self.avg_seconds += EWMA_ALPHA * (seconds - self.avg_seconds)
+        self.avg_wait_seconds += EWMA_ALPHA * (waited - self.avg_wait_seconds)
+        self.completed += 1
+        return result
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password, settings.BCRYPT_ROUNDS)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": min(self.pending, self.workers),
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "estimated_wait_ms": round(self.estimated_wait() * 1000, 1),
+            "avg_hash_ms": round(self.avg_seconds * 1000, 1),
+            "avg_wait_ms": round(self.avg_wait_seconds * 1000, 1),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher()
@@ -1,13 +1,13 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Union
-import asyncio
-from functools import partial
-from jose import jwt, JWTError
+import math
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
 from app.core.config import settings
+from app.core.passwords import password_hasher, PasswordHasherBusy
+from app.core.tokens import token_codec
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
@@ -17,46 +17,73 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     """Hash a password."""
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(12)).decode("utf-8")
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(settings.BCRYPT_ROUNDS)).decode("utf-8")
 
-# Semaphore caps concurrent bcrypt ops — prevents thread pool saturation
-# under heavy login load (bcrypt ~200ms CPU each, default pool = cpu_count+4)
-_BCRYPT_SEM = asyncio.Semaphore(20)
+def _hasher_busy(exc: PasswordHasherBusy) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts in progress, please retry shortly",
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    )
 
 async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
-    """Non-blocking bcrypt verify — runs in a thread pool so the event loop stays free."""
-    async with _BCRYPT_SEM:
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, verify_password, plain_password, hashed_password)
+    """Non-blocking bcrypt verify in the password hashing process pool (429 when it's backed up)."""
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except PasswordHasherBusy as exc:
+        raise _hasher_busy(exc)
 
 async def get_password_hash_async(password: str) -> str:
-    """Non-blocking bcrypt hash — runs in a thread pool so the event loop stays free."""
-    async with _BCRYPT_SEM:
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, get_password_hash, password)
+    """Non-blocking bcrypt hash in the password hashing process pool (429 when it's backed up)."""
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy as exc:
+        raise _hasher_busy(exc)
 
-def create_access_token(subject: Union[str, int], expires_delta: Optional[timedelta] = None) -> str:
-    """Create a new access token."""
+def create_access_token(
+    subject: Union[str, int],
+    expires_delta: Optional[timedelta] = None,
+    claims: Optional[dict] = None
+) -> str:
+    """Create a new access token, optionally carrying extra claims."""
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode = {"exp": expire, "sub": str(subject), "type": "access"}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    to_encode = {**(claims or {}), "exp": expire, "sub": str(subject), "type": "access"}
+    return token_codec.encode(to_encode)
+
+def user_version(user) -> int:
+    """Version of a user's state for token claims: updated_at in milliseconds."""
+    return int(user.updated_at.timestamp() * 1000) if user.updated_at else 0
+
+def create_user_access_token(user) -> str:
+    """
+    Access token for a loaded user.
+    
+    With AUTH_TOKEN_CLAIMS the token also carries the user's role, is_active
+    and version, so routes can authorize from the token alone.
+    """
+    claims = None
+    if settings.AUTH_TOKEN_CLAIMS:
+        claims = {
+            "role": getattr(user.role, "value", user.role),
+            "active": bool(user.is_active),
+            "ver": user_version(user),
+        }
+    return create_access_token(str(user.id), claims=claims)
 
-def create_refresh_token(subject: Union[str, int]) -> str:
-    """Create a new refresh token."""
-    expire = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode = {"exp": expire, "sub": str(subject), "type": "refresh"}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+def create_refresh_token(subject: Union[str, int], claims: Optional[dict] = None) -> str:
+    """Create a new refresh token, optionally carrying extra claims (family and token id)."""
+    now = datetime.now(timezone.utc)
+    expire = now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    to_encode = {
+        **(claims or {}), "exp": expire, "iat": int(now.timestamp()),
+        "sub": str(subject), "type": "refresh"
+    }
+    return token_codec.encode(to_encode)
 
 def decode_token(token: str) -> Optional[dict]:
-    """Decode and validate a JWT token."""
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
-    except JWTError:
-        return None
+    """Decode and validate a JWT token (memoized per worker until it expires)."""
+    return token_codec.decode(token)
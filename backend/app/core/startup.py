@@ -0,0 +1,40 @@
+"""Per-worker startup timing, printed once the worker is ready to serve."""
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+# Module import time; close enough to when the worker started loading the app
+PROCESS_STARTED = time.perf_counter()
+
+
+class StartupReport:
+    """Collects how long each lifespan phase took in this worker."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.ready_ms: float = 0.0
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = (time.perf_counter() - started) * 1000
+
+    def ready(self) -> str:
+        """Mark the worker ready and return a one-line summary."""
+        self.ready_ms = (time.perf_counter() - PROCESS_STARTED) * 1000
+        phases = ", ".join(f"{name} {ms:.0f}ms" for name, ms in self.phases.items())
+        return f"Worker {os.getpid()} ready in {self.ready_ms:.0f}ms ({phases})"
+
+    def as_dict(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "ready_ms": round(self.ready_ms, 1),
+            "phases_ms": {name: round(ms, 1) for name, ms in self.phases.items()},
+        }
+
+
+startup_report = StartupReport()
@@ -0,0 +1,307 @@
+"""
+Async Stripe client: pooled connections, timeouts, retries, circuit breaking.
+
+The stripe library's resource calls (stripe.PaymentIntent.create, ...) are
+synchronous; inside an async handler each one stalled the worker's event
+loop for the whole Stripe round trip. StripeGateway calls Stripe's REST API
+with one pooled httpx.AsyncClient per worker instead.
+
+  • every attempt has a connect and a read timeout (STRIPE_*_TIMEOUT)
+  • network errors, timeouts, 409/429/5xx (or Stripe-Should-Retry) are
+    retried up to STRIPE_MAX_RETRIES times with jittered backoff; POSTs carry
+    an Idempotency-Key that stays the same across retries, so a retried
+    create never happens twice
+  • after STRIPE_BREAKER_THRESHOLD consecutive failed calls the circuit opens
+    and calls fail immediately (StripeUnavailable) for
+    STRIPE_BREAKER_COOLDOWN seconds; then one probe call decides whether it
+    closes again
+
+STRIPE_API_BASE can point at the fake server in fake_stripe.py for tests and
+load runs. Webhook signature checks don't talk to Stripe and still use the
+stripe library.
+"""
+import asyncio
+import logging
+import random
+import time
+import urllib.parse
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Backoff before retry n is uniform in [0, min(MAX, BASE * 2**n)]
+RETRY_BACKOFF_BASE = 0.25
+RETRY_BACKOFF_MAX = 2.0
+
+RETRYABLE_STATUS = (409, 429)
+
+
+class StripeError(Exception):
+    """Stripe refused the request (card declined, invalid parameters, ...)."""
+
+    def __init__(self, message: str, status: Optional[int] = None, code: Optional[str] = None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.code = code
+
+
+class StripeUnavailable(StripeError):
+    """Stripe couldn't be reached, kept failing, or the circuit is open."""
+
+    def __init__(self, message: str, retry_after: float = 0.0, status: Optional[int] = None):
+        super().__init__(message, status=status)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open (one probe) -> closed."""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        now = time.monotonic()
+        # A probe that never reported back (e.g. cancelled) doesn't block the next one
+        if state == "half_open" and (self._probe_started is None or now - self._probe_started >= self.cooldown):
+            self._probe_started = now
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probe_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        # Failures of calls already in flight when the circuit opened don't extend it
+        if self._probe_started is not None or (self.opened_at is None and self.failures >= self.threshold):
+            self.times_opened += 1
+            logger.warning(f"Stripe circuit opened after {self.failures} consecutive failures")
+            self.opened_at = time.monotonic()
+            self._probe_started = None
+
+
+def _path_id(object_id: str) -> str:
+    """Quote a caller-supplied object ID so it stays one path segment."""
+    # quote() leaves dots alone, and a bare ".." segment would be resolved
+    return urllib.parse.quote(str(object_id), safe="").replace(".", "%2E")
+
+
+def encode_params(params: Optional[Dict[str, Any]], prefix: str = "") -> List[Tuple[str, str]]:
+    """Stripe's form encoding: {"metadata": {"a": 1}} -> [("metadata[a]", "1")]."""
+    pairs: List[Tuple[str, str]] = []
+    for key, value in (params or {}).items():
+        name = f"{prefix}[{key}]" if prefix else str(key)
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            pairs.extend(encode_params(value, name))
+        elif isinstance(value, (list, tuple)):
+            for index, item in enumerate(value):
+                if isinstance(item, dict):
+                    pairs.extend(encode_params(item, f"{name}[{index}]"))
+                else:
+                    pairs.extend(encode_params({index: item}, name))
+        elif isinstance(value, bool):
+            pairs.append((name, "true" if value else "false"))
+        else:
+            pairs.append((name, str(value)))
+    return pairs
+
+
+def _should_retry(response: httpx.Response) -> bool:
+    header = response.headers.get("stripe-should-retry")
+    if header is not None:
+        return header == "true"
+    return response.status_code in RETRYABLE_STATUS or response.status_code >= 500
+
+
+def _error_from(response: httpx.Response) -> StripeError:
+    try:
+        error = response.json().get("error", {})
+    except ValueError:
+        error = {}
+    message = error.get("message") or f"Stripe returned HTTP {response.status_code}"
+    return StripeError(message, status=response.status_code, code=error.get("code"))
+
+
+class StripeGateway:
+    """Stripe API calls used by the payments routes, on a shared async connection pool."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        api_base: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        max_retries: Optional[int] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self._api_key = api_key
+        self._api_base = api_base
+        self._transport = transport
+        self.max_retries = settings.STRIPE_MAX_RETRIES if max_retries is None else max_retries
+        self.breaker = breaker or CircuitBreaker(
+            settings.STRIPE_BREAKER_THRESHOLD, settings.STRIPE_BREAKER_COOLDOWN
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.avg_latency_ms = 0.0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            headers = {"Authorization": f"Bearer {self._api_key or settings.STRIPE_SECRET_KEY}"}
+            if settings.STRIPE_API_VERSION:
+                headers["Stripe-Version"] = settings.STRIPE_API_VERSION
+            self._client = httpx.AsyncClient(
+                base_url=self._api_base or settings.STRIPE_API_BASE,
+                headers=headers,
+                transport=self._transport,
+                timeout=httpx.Timeout(settings.STRIPE_TIMEOUT, connect=settings.STRIPE_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=settings.STRIPE_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.STRIPE_MAX_CONNECTIONS,
+                ),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(RETRY_BACKOFF_MAX, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt))
+
+    async def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """One logical Stripe call (with retries). Returns the decoded JSON object."""
+        if not self.breaker.allow():
+            self.short_circuited += 1
+            raise StripeUnavailable(
+                "Payment provider is temporarily unavailable", retry_after=self.breaker.retry_after()
+            )
+
+        client = self._get_client()
+        encoded = encode_params(params)
+        body = None
+        headers = None
+        if method == "POST":
+            # httpx sends a list passed as data= as a sync byte stream, which
+            # AsyncClient refuses; encode the form body ourselves instead
+            body = urllib.parse.urlencode(encoded)
+            headers = {
+                "Content-Type": "application/x-www-form-urlencoded",
+                "Idempotency-Key": str(uuid.uuid4()),
+            }
+        failure: StripeError = StripeUnavailable("Stripe request failed")
+        retry_after = None
+        started = time.perf_counter()
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+            self.requests += 1
+            try:
+                if method == "GET":
+                    response = await client.get(path, params=encoded)
+                else:
+                    response = await client.post(path, content=body, headers=headers)
+            except httpx.TimeoutException as e:
+                failure = StripeUnavailable(f"Stripe request timed out: {type(e).__name__}")
+                continue
+            except httpx.TransportError as e:
+                failure = StripeUnavailable(f"Could not reach Stripe: {e}")
+                continue
+
+            if response.status_code < 400:
+                self.breaker.record_success()
+                self.avg_latency_ms += 0.1 * ((time.perf_counter() - started) * 1000 - self.avg_latency_ms)
+                return response.json()
+            error = _error_from(response)
+            if not _should_retry(response):
+                # Stripe answered; a declined card says nothing about its health
+                self.breaker.record_success()
+                raise error
+            retry_after = response.headers.get("retry-after")
+            failure = error if response.status_code < 500 else StripeUnavailable(
+                error.message, status=response.status_code
+            )
+
+        self.failures += 1
+        self.breaker.record_failure()
+        logger.warning(f"Stripe {method} {path} failed after {self.max_retries + 1} attempts: {failure.message}")
+        if isinstance(failure, StripeUnavailable):
+            failure.retry_after = self.breaker.retry_after()
+        raise failure
+
+    # Resources used by the payments routes
+
+    async def create_customer(self, **params) -> Dict[str, Any]:
+        return await self.request("POST", "/v1/customers", params)
+
+    async def create_payment_intent(self, **params) -> Dict[str, Any]:
+        return await self.request("POST", "/v1/payment_intents", params)
+
+    async def retrieve_payment_intent(self, intent_id: str) -> Dict[str, Any]:
+        return await self.request("GET", f"/v1/payment_intents/{_path_id(intent_id)}")
+
+    async def retrieve_payment_method(self, method_id: str) -> Dict[str, Any]:
+        return await self.request("GET", f"/v1/payment_methods/{_path_id(method_id)}")
+
+    async def create_refund(self, **params) -> Dict[str, Any]:
+        return await self.request("POST", "/v1/refunds", params)
+
+    async def create_account(self, **params) -> Dict[str, Any]:
+        return await self.request("POST", "/v1/accounts", params)
+
+    async def create_account_link(self, **params) -> Dict[str, Any]:
+        return await self.request("POST", "/v1/account_links", params)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "times_opened": self.breaker.times_opened,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failed_calls": self.failures,
+            "short_circuited": self.short_circuited,
+            "avg_latency_ms": round(self.avg_latency_ms, 1),
+        }
+
+
+stripe_gateway = StripeGateway()
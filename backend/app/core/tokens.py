@@ -0,0 +1,160 @@
+"""
+HMAC JWT signing and verification without per-call setup.
+
+python-jose parses the header, looks up the algorithm and rebuilds the HMAC
+key on every encode/decode. For our own HS256/384/512 tokens the header is
+fixed and the key never changes, so TokenCodec keys an HMAC object once and
+copies it per token, and accepts only the exact header segments it can have
+produced.
+
+Clients send the same access token on many calls in a row, so verified
+tokens are memoized (JWT_MEMO_SIZE per worker, LRU) with their payloads
+until their exp; a repeat presentation costs a dict lookup. Only the
+signature and exp are checked here; revocation checks stay with the callers.
+
+Any other ALGORITHM (e.g. RS256) goes through python-jose as before.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from jose import jwt, JWTError
+
+from app.core.config import settings
+
+HMAC_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+# Registered claims that may be given as datetimes, encoded as NumericDate
+TIME_CLAIMS = ("exp", "iat", "nbf")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _numeric(value: Any) -> Any:
+    return int(value.timestamp()) if isinstance(value, datetime) else value
+
+
+class TokenCodec:
+    """Signs and verifies JWTs with a fixed secret and algorithm."""
+
+    def __init__(self, secret: str, algorithm: str, memo_size: int):
+        self.algorithm = algorithm
+        self._secret = secret
+        digest = HMAC_DIGESTS.get(algorithm)
+        self._mac = hmac.new(secret.encode("utf-8"), digestmod=digest) if digest else None
+        header = json.dumps({"alg": algorithm, "typ": "JWT"}, separators=(",", ":"), sort_keys=True)
+        self._header = _b64encode(header.encode("utf-8"))
+        # Header segments we accept as-is; any other header is parsed once and checked
+        self._headers: Dict[str, bool] = {self._header: True}
+        # token -> (payload, time it stops being valid)
+        self._memo: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self.memo_size = memo_size
+        self.hits = 0
+        self.misses = 0
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        if self._mac is None:
+            return jwt.encode(claims, self._secret, algorithm=self.algorithm)
+        payload = {key: _numeric(value) if key in TIME_CLAIMS else value for key, value in claims.items()}
+        signing_input = f"{self._header}.{_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8'))}"
+        return f"{signing_input}.{_b64encode(self._sign(signing_input.encode('ascii')))}"
+
+    def _header_ok(self, segment: str) -> bool:
+        ok = self._headers.get(segment)
+        if ok is None:
+            try:
+                header = json.loads(_b64decode(segment))
+                ok = isinstance(header, dict) and header.get("alg") == self.algorithm
+            except (ValueError, binascii.Error):
+                ok = False
+            if len(self._headers) < 64:
+                self._headers[segment] = ok
+        return ok
+
+    def _verify(self, token: str) -> Optional[Dict[str, Any]]:
+        try:
+            signing_input, _, signature = token.rpartition(".")
+            header, _, payload = signing_input.partition(".")
+            if not header or not payload or not self._header_ok(header):
+                return None
+            if not hmac.compare_digest(self._sign(signing_input.encode("ascii")), _b64decode(signature)):
+                return None
+            claims = json.loads(_b64decode(payload))
+        except (ValueError, binascii.Error, UnicodeError):
+            return None
+        return claims if isinstance(claims, dict) else None
+
+    def decode(self, token: str) -> Optional[Dict[str, Any]]:
+        """Payload of a validly signed, unexpired token; None otherwise."""
+        if self._mac is None:
+            try:
+                return jwt.decode(token, self._secret, algorithms=[self.algorithm])
+            except JWTError:
+                return None
+
+        now = time.time()
+        cached = self._memo.get(token)
+        if cached is not None:
+            claims, valid_until = cached
+            if now < valid_until:
+                self._memo.move_to_end(token)
+                self.hits += 1
+                return dict(claims)
+            del self._memo[token]
+            return None
+
+        self.misses += 1
+        claims = self._verify(token)
+        if claims is None:
+            return None
+        exp = claims.get("exp")
+        if exp is not None:
+            if not isinstance(exp, (int, float)) or isinstance(exp, bool):
+                return None
+            # Same rule as python-jose: valid through the exp second
+            if int(now) > exp:
+                return None
+        nbf = claims.get("nbf")
+        if isinstance(nbf, (int, float)) and nbf > now:
+            return None
+
+        # Tokens without exp are not memoized: nothing would bound their entry
+        if exp is not None and self.memo_size > 0:
+            self._memo[token] = (claims, exp + 1)
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return dict(claims)
+
+    def clear(self):
+        self._memo.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "algorithm": self.algorithm,
+            "precompiled": self._mac is not None,
+            "memo_size": len(self._memo),
+            "memo_hits": self.hits,
+            "memo_misses": self.misses,
+            "memo_hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+token_codec = TokenCodec(settings.SECRET_KEY, settings.ALGORITHM, settings.JWT_MEMO_SIZE)
@@ -0,0 +1,134 @@
+"""
+Per-route statement timeouts and query budgets.
+
+Routes declare their budget in place of get_db / get_db_read:
+
+    db: AsyncSession = Depends(db_budget(timeout_ms=1000, max_queries=5, read_only=True))
+
+Every transaction the session opens starts with SET LOCAL statement_timeout
+(PostgreSQL), so a runaway query is cancelled instead of holding a pool
+connection for the whole DB_POOL_TIMEOUT. Statements executed while the
+request runs are counted; going over max_queries and hitting the timeout are
+both logged with the route and the SQL. Raw driver queries (app/db/fastpath.py)
+run in the same transaction, so the timeout covers them too; they report
+themselves through count_raw_query and report_raw_error.
+
+The two halves are switched separately: DB_STATEMENT_TIMEOUTS_ENABLED for the
+timeouts, DB_QUERY_BUDGETS_ENABLED for the query-count checks.
+"""
+import logging
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, engine, read_engine, read_session_factory
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL SQLSTATE for query_canceled (statement_timeout)
+QUERY_CANCELED = "57014"
+
+
+class QueryBudget:
+    """Limits for one request, plus what it has used so far."""
+
+    def __init__(self, route: str, timeout_ms: int, max_queries: Optional[int]):
+        self.route = route
+        self.timeout_ms = timeout_ms
+        self.max_queries = max_queries
+        self.queries = 0
+        self.exceeded = False
+
+
+_current_budget: ContextVar[Optional[QueryBudget]] = ContextVar("query_budget", default=None)
+
+
+def count_raw_query(statement: str):
+    """Count a statement run on the driver connection, bypassing SQLAlchemy's events."""
+    budget = _current_budget.get()
+    if budget is None or statement.startswith("SET LOCAL statement_timeout"):
+        return
+    budget.queries += 1
+    if budget.max_queries is not None and budget.queries > budget.max_queries and not budget.exceeded:
+        # Logged once per request, with the statement that went over
+        budget.exceeded = True
+        logger.warning(
+            f"Query budget exceeded on {budget.route}: more than {budget.max_queries} queries; "
+            f"query #{budget.queries}: {statement}"
+        )
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    count_raw_query(statement)
+
+
+def report_raw_error(statement: str, error: Exception):
+    """Log a statement timeout raised by a driver-level query."""
+    budget = _current_budget.get()
+    if budget is None:
+        return
+    sqlstate = getattr(error, "sqlstate", None) or getattr(error, "pgcode", None)
+    if sqlstate == QUERY_CANCELED or "statement timeout" in str(error):
+        logger.warning(
+            f"Statement timeout ({budget.timeout_ms}ms) on {budget.route}: {statement}"
+        )
+
+
+def _report_timeout(context):
+    report_raw_error(context.statement, context.original_exception)
+
+
+for _engine in filter(None, (engine, read_engine)):
+    event.listen(_engine.sync_engine, "before_cursor_execute", _count_query)
+    event.listen(_engine.sync_engine, "handle_error", _report_timeout)
+
+
+def _route_label(request: Request) -> str:
+    route = request.scope.get("route")
+    return f"{request.method} {getattr(route, 'path', request.url.path)}"
+
+
+def _apply_timeout(session, timeout_ms: int):
+    """SET LOCAL statement_timeout at the start of each transaction the session opens."""
+
+    @event.listens_for(session.sync_session, "after_begin")
+    def set_statement_timeout(sync_session, transaction, connection):
+        if connection.dialect.name == "postgresql":
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+def db_budget(timeout_ms: int, max_queries: Optional[int] = None, read_only: bool = False):
+    """
+    Dependency factory: a session like get_db (or get_db_read with read_only)
+    whose transactions time out after timeout_ms and whose request is expected
+    to run at most max_queries statements.
+    """
+    async def dependency(request: Request):
+        factory = read_session_factory(request) if read_only else AsyncSessionLocal
+        budget = None
+        if settings.DB_STATEMENT_TIMEOUTS_ENABLED or settings.DB_QUERY_BUDGETS_ENABLED:
+            budget = QueryBudget(
+                _route_label(request), timeout_ms,
+                max_queries if settings.DB_QUERY_BUDGETS_ENABLED else None
+            )
+        _current_budget.set(budget)
+        try:
+            async with factory() as session:
+                if settings.DB_STATEMENT_TIMEOUTS_ENABLED:
+                    _apply_timeout(session, timeout_ms)
+                try:
+                    yield session
+                    if read_only:
+                        await session.rollback()
+                    else:
+                        await session.commit()
+                except Exception:
+                    await session.rollback()
+                    raise
+        finally:
+            _current_budget.set(None)
+
+    return dependency
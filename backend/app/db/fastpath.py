@@ -0,0 +1,172 @@
+"""
+Raw asyncpg fast path for the hottest read queries.
+
+Runs spot listing and spot detail lookups straight on the asyncpg connection
+underneath the SQLAlchemy session (same pool, same transaction, same replica
+routing), skipping the ORM identity map, attribute instrumentation and the
+per-value GUID conversions. asyncpg prepares and caches each statement per
+connection, so the SQL below is fixed text with nullable parameters rather
+than a query assembled per request.
+
+The queries run inside the session's transaction, so a route's db_budget
+statement_timeout (SET LOCAL at transaction start) applies to them as well;
+they are counted against its query budget through app/db/budget.py.
+
+Enabled with DB_FASTPATH_ENABLED on PostgreSQL + asyncpg only; everything
+else keeps using the ORM queries.
+"""
+import json
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.budget import count_raw_query, report_raw_error
+from app.models.parking_spot import ParkingSpotType, VehicleSize
+
+# Page first, then drop spots with overlapping bookings: the same semantics
+# as the ORM path, which filters availability on the fetched page
+SPOT_LISTING_SQL = """
+    SELECT s.id, s.title, s.address, s.city, s.prefecture, s.latitude, s.longitude,
+           s.hourly_rate, s.spot_type::text AS spot_type, s.is_available,
+           s.average_rating, s.total_reviews, s.images
+    FROM (
+        SELECT * FROM parking_spots
+        WHERE is_active = true AND is_available = true
+          AND ($1::text IS NULL OR lower(title) LIKE $1 OR lower(address) LIKE $1
+               OR lower(city) LIKE $1 OR lower(zip_code) LIKE $1)
+          AND ($2::text IS NULL OR lower(city) LIKE $2)
+          AND ($3::text IS NULL OR spot_type::text = $3)
+          AND ($4::text IS NULL OR vehicle_size::text = $4)
+          AND ($5::int IS NULL OR hourly_rate <= $5)
+          AND ($6::bool IS NULL OR has_ev_charging = $6)
+          AND ($7::bool IS NULL OR is_covered = $7)
+        OFFSET $8 LIMIT $9
+    ) s
+    WHERE $10::timestamptz IS NULL OR NOT EXISTS (
+        SELECT 1 FROM bookings b
+        WHERE b.parking_spot_id = s.id
+          AND b.archived = false
+          AND b.status::text IN ('PENDING', 'CONFIRMED', 'IN_PROGRESS')
+          AND b.start_time < $11::timestamptz
+          AND b.end_time > $10::timestamptz
+    )
+"""
+
+SPOT_DETAIL_SQL = """
+    SELECT id, owner_id, title, description, spot_type::text AS spot_type,
+           vehicle_size::text AS vehicle_size, address, city, prefecture, zip_code,
+           country, latitude, longitude, hourly_rate, daily_rate, monthly_rate,
+           is_covered, has_ev_charging, has_security, has_lighting,
+           is_handicap_accessible, images, is_active, is_available, operating_hours,
+           access_instructions, total_bookings, average_rating, total_reviews,
+           created_at, updated_at
+    FROM parking_spots
+    WHERE id = $1
+"""
+
+
+def fastpath_available(db: AsyncSession) -> bool:
+    """Whether the fast path is switched on and this session talks to asyncpg."""
+    if not settings.DB_FASTPATH_ENABLED or db.bind is None:
+        return False
+    dialect = db.bind.dialect
+    return dialect.name == "postgresql" and dialect.driver == "asyncpg"
+
+
+async def _driver_connection(db: AsyncSession):
+    """The asyncpg connection behind the session's current transaction."""
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    return raw.driver_connection
+
+
+async def _run(fetch, statement: str, *args):
+    """Run a driver query, accounting for it in the request's query budget."""
+    count_raw_query(statement)
+    try:
+        return await fetch(statement, *args)
+    except Exception as e:
+        report_raw_error(statement, e)
+        raise
+
+
+def _json_value(value):
+    # SQLAlchemy registers a JSON codec on its connections; decode if one isn't present
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def _enum_value(enum_cls, name: Optional[str]):
+    # SQLAlchemy stores Python enums by member name
+    return enum_cls[name] if name else None
+
+
+async def fetch_spot_listing_rows(
+    db: AsyncSession,
+    *,
+    q: Optional[str],
+    city: Optional[str],
+    spot_type: Optional[ParkingSpotType],
+    vehicle_size: Optional[VehicleSize],
+    max_hourly_rate: Optional[int],
+    has_ev_charging: Optional[bool],
+    is_covered: Optional[bool],
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    offset: int,
+    limit: int
+) -> List[Dict[str, Any]]:
+    """Spot listing rows in the ParkingSpotListResponse shape (without distance)."""
+    conn = await _driver_connection(db)
+    check_window = start_time is not None and end_time is not None
+    records = await _run(
+        conn.fetch,
+        SPOT_LISTING_SQL,
+        f"%{q.lower()}%" if q else None,
+        f"%{city.lower()}%" if city else None,
+        spot_type.name if spot_type else None,
+        vehicle_size.name if vehicle_size else None,
+        max_hourly_rate,
+        has_ev_charging,
+        is_covered,
+        offset,
+        limit,
+        start_time if check_window else None,
+        end_time if check_window else None,
+    )
+    return [
+        {
+            "id": str(r["id"]),
+            "title": r["title"],
+            "address": r["address"],
+            "city": r["city"],
+            "prefecture": r["prefecture"],
+            "latitude": r["latitude"],
+            "longitude": r["longitude"],
+            "hourly_rate": r["hourly_rate"],
+            "spot_type": _enum_value(ParkingSpotType, r["spot_type"]),
+            "is_available": r["is_available"],
+            "average_rating": r["average_rating"],
+            "total_reviews": r["total_reviews"],
+            "images": _json_value(r["images"]) or [],
+            "distance_km": None,
+        }
+        for r in records
+    ]
+
+
+async def fetch_spot_detail(db: AsyncSession, spot_id) -> Optional[Dict[str, Any]]:
+    """One spot in the ParkingSpotResponse shape, or None if it doesn't exist."""
+    conn = await _driver_connection(db)
+    record = await _run(conn.fetchrow, SPOT_DETAIL_SQL, spot_id)
+    if record is None:
+        return None
+    spot = dict(record)
+    spot["id"] = str(spot["id"])
+    spot["owner_id"] = str(spot["owner_id"])
+    spot["spot_type"] = _enum_value(ParkingSpotType, spot["spot_type"])
+    spot["vehicle_size"] = _enum_value(VehicleSize, spot["vehicle_size"])
+    spot["images"] = _json_value(spot["images"]) or []
+    spot["operating_hours"] = _json_value(spot["operating_hours"])
+    return spot
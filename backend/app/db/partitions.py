@@ -0,0 +1,80 @@
+"""
+Bookings partition maintenance and archival.
+
+On PostgreSQL (after alembic revision 0003) bookings is split into live and
+archive partitions, each by start_time month. This keeps month partitions
+created ahead of time and moves finished bookings to the archive side.
+On other databases archival only flips the `archived` flag.
+
+Booking ids stay unique across partitions through booking_ids (revision
+0007), which the triggers on bookings keep in step as rows move.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.booking import Booking, BookingStatus
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = [BookingStatus.COMPLETED, BookingStatus.CANCELLED, BookingStatus.REFUNDED]
+
+# Rows moved per UPDATE, so archival never holds long locks or writes a huge WAL burst
+ARCHIVE_BATCH_SIZE = 5000
+
+
+async def bookings_partitioned(db: AsyncSession) -> bool:
+    """Whether the bookings table has been converted to partitions."""
+    if db.bind.dialect.name != "postgresql":
+        return False
+    result = await db.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'bookings'::regclass)"
+    ))
+    return bool(result.scalar())
+
+
+async def ensure_booking_partitions(db: AsyncSession) -> int:
+    """Create any missing month partitions from this month to BOOKING_PARTITION_MONTHS_AHEAD."""
+    if not await bookings_partitioned(db):
+        return 0
+    today = datetime.now(timezone.utc).date()
+    result = await db.execute(
+        text("SELECT ensure_booking_partitions(:from_month, :to_month)"),
+        {
+            "from_month": today.replace(day=1),
+            "to_month": today + timedelta(days=31 * settings.BOOKING_PARTITION_MONTHS_AHEAD),
+        }
+    )
+    created = result.scalar() or 0
+    await db.commit()
+    return created
+
+
+async def archive_finished_bookings(db: AsyncSession) -> int:
+    """Move bookings that finished more than BOOKING_ARCHIVE_AFTER_DAYS ago to the archive."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.BOOKING_ARCHIVE_AFTER_DAYS)
+    archived = 0
+    while True:
+        batch = (
+            select(Booking.id)
+            .where(
+                Booking.archived == False,
+                Booking.status.in_(FINISHED_STATUSES),
+                Booking.end_time < cutoff
+            )
+            .limit(ARCHIVE_BATCH_SIZE)
+        )
+        # Flipping the partition key moves the row into the archive partition
+        result = await db.execute(
+            update(Booking)
+            .where(Booking.archived == False, Booking.id.in_(batch))
+            .values(archived=True)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        archived += result.rowcount
+        if result.rowcount < ARCHIVE_BATCH_SIZE:
+            return archived
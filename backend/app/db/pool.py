@@ -0,0 +1,171 @@
+"""
+Instrumented connection pool and static, budget-based pool sizing.
+
+Each engine's pool records checkout wait time, how many callers are queued
+for a connection, overflow usage, timeouts and how long connections are held.
+The numbers are per worker and reported under `db_pool` in /health.
+"""
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Tuple
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Recent checkout waits kept for percentiles
+WAIT_SAMPLES = 1000
+
+# Minimum seconds between "slow checkout" warnings, so saturation doesn't flood the log
+WARN_INTERVAL = 10
+
+
+def _percentile(samples, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class PoolMetrics:
+    """Counters and timings for one pool."""
+
+    def __init__(self):
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.invalidations = 0
+        self.max_overflow_seen = 0
+        self.waits_ms = deque(maxlen=WAIT_SAMPLES)
+        self.held_ms_total = 0.0
+        self.checkins = 0
+        self._last_warning = 0.0
+
+    def record_wait(self, wait_ms: float, pool: "InstrumentedPool"):
+        self.waits_ms.append(wait_ms)
+        self.max_overflow_seen = max(self.max_overflow_seen, pool.overflow())
+        now = time.monotonic()
+        if wait_ms >= settings.DB_POOL_WAIT_WARN_MS and now - self._last_warning >= WARN_INTERVAL:
+            self._last_warning = now
+            logger.warning(
+                f"DB pool checkout waited {wait_ms:.0f}ms "
+                f"({pool.checkedout()} checked out, {self.waiting} waiting, overflow {pool.overflow()})"
+            )
+
+
+def _instrument(pool: "InstrumentedPool", metrics: PoolMetrics):
+    """Attach the pool event listeners that feed `metrics`."""
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.checkouts += 1
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            metrics.checkins += 1
+            metrics.held_ms_total += (time.perf_counter() - checked_out_at) * 1000
+
+    @event.listens_for(pool, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations += 1
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that times checkouts and tracks the wait queue."""
+
+    def __init__(self, *args, **kwargs):
+        # recreate() (engine.dispose) passes the old pool's listeners along in _dispatch
+        inherited = "_dispatch" in kwargs
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+        if not inherited:
+            _instrument(self, self.metrics)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        # There is no pool event for "checkout requested", so the wait is timed here
+        self.metrics.waiting += 1
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            logger.error(
+                f"DB pool checkout timed out after {settings.DB_POOL_TIMEOUT}s "
+                f"({self.checkedout()} checked out, {self.metrics.waiting - 1} others waiting)"
+            )
+            raise
+        finally:
+            self.metrics.waiting -= 1
+            self.metrics.record_wait((time.perf_counter() - started) * 1000, self)
+
+    def stats(self) -> Dict[str, Any]:
+        metrics = self.metrics
+        waits = list(metrics.waits_ms)
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow_seen": max(metrics.max_overflow_seen, 0),
+            "waiting": metrics.waiting,
+            "checkouts": metrics.checkouts,
+            "timeouts": metrics.timeouts,
+            "invalidations": metrics.invalidations,
+            "checkout_wait_ms": {
+                "avg": round(sum(waits) / len(waits), 2) if waits else 0.0,
+                "p95": round(_percentile(waits, 0.95), 2),
+                "max": round(max(waits), 2) if waits else 0.0,
+            },
+            "avg_held_ms": round(metrics.held_ms_total / metrics.checkins, 2) if metrics.checkins else 0.0,
+        }
+
+
+def worker_count() -> int:
+    """API worker processes sharing the connection budget."""
+    return settings.DB_WORKERS or int(os.getenv("WEB_CONCURRENCY", "1"))
+
+
+def pool_sizing() -> Tuple[int, int]:
+    """
+    (pool_size, max_overflow) for one worker's engine.
+
+    With DB_CONNECTION_BUDGET set, the budget (minus DB_BUDGET_RESERVED for
+    the background worker, migrations and admin sessions) is split evenly
+    across workers: two thirds kept open, the rest as overflow. The
+    configured DB_POOL_SIZE / DB_MAX_OVERFLOW act as upper bounds. Without a
+    budget they are used as-is.
+
+    The split is deliberately static, computed once per engine: nothing
+    resizes a pool from the wait and timeout metrics at runtime. A worker
+    can't take connections from another without cross-process coordination,
+    and SQLAlchemy has no public way to resize a live QueuePool; the metrics
+    in /health are what to tune DB_CONNECTION_BUDGET and DB_WORKERS by.
+    """
+    if not settings.DB_CONNECTION_BUDGET:
+        return settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+
+    available = settings.DB_CONNECTION_BUDGET - settings.DB_BUDGET_RESERVED
+    per_worker = max(2, available // worker_count())
+    pool_size = min(settings.DB_POOL_SIZE, max(1, per_worker * 2 // 3))
+    max_overflow = min(settings.DB_MAX_OVERFLOW, per_worker - pool_size)
+    return pool_size, max_overflow
+
+
+def pool_stats(engine) -> Dict[str, Any]:
+    """Stats for an async engine's pool ({} if it isn't instrumented)."""
+    pool = engine.sync_engine.pool
+    return pool.stats() if isinstance(pool, InstrumentedPool) else {}
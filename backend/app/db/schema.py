@@ -0,0 +1,76 @@
+"""
+Database schema checks at boot.
+
+Migrations run once per deploy (`python init_db.py`, i.e. `alembic upgrade
+head`); API workers only confirm the database is at the revision this code
+expects, which costs a single one-row query instead of create_all's catalog
+scans in every worker.
+"""
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+class SchemaOutOfDate(RuntimeError):
+    """The database isn't migrated to the revision the code expects."""
+
+
+def alembic_config():
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    return config
+
+
+def head_revision() -> str:
+    """Latest revision in alembic/versions (read from disk, no DB access)."""
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def run_migrations(revision: str = "head"):
+    """Upgrade the database. Runs its own event loop, so call it outside one."""
+    from alembic import command
+
+    command.upgrade(alembic_config(), revision)
+
+
+async def current_revision(engine: AsyncEngine) -> Optional[str]:
+    """Revision recorded in alembic_version, or None for an unmigrated database."""
+    try:
+        async with engine.connect() as conn:
+            return (await conn.execute(text("SELECT version_num FROM alembic_version"))).scalar()
+    except DBAPIError:
+        return None
+
+
+async def verify_schema(engine: AsyncEngine) -> str:
+    """Raise SchemaOutOfDate unless the database is at the head revision."""
+    expected = head_revision()
+    found = await current_revision(engine)
+    if found != expected:
+        raise SchemaOutOfDate(
+            f"Database schema is at revision {found or 'none'}, code expects {expected}. "
+            f"Run `python init_db.py` before starting the API."
+        )
+    return found
+
+
+async def prepare_schema(engine: AsyncEngine):
+    """Apply DB_BOOT_MODE: verify the revision, create tables (dev only), or skip."""
+    if settings.DB_BOOT_MODE == "verify":
+        await verify_schema(engine)
+    elif settings.DB_BOOT_MODE == "create_all":
+        from app.db.base import Base
+
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
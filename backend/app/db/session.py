@@ -1,15 +1,63 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+import asyncio
+import logging
+import time
+import uuid
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
 from app.core.config import settings
+from app.db.pool import InstrumentedPool, pool_sizing
+
+logger = logging.getLogger(__name__)
+
+def _prepared_statement_name() -> str:
+    # Unique per statement, so names never collide on a server connection that
+    # PgBouncer previously handed to another client
+    return f"__asyncpg_{uuid.uuid4()}__"
+
+
+def _pgbouncer_connect_args(url: str) -> dict:
+    """
+    asyncpg settings for PgBouncer in transaction pooling mode.
+
+    Consecutive transactions from one client connection can land on different
+    server connections, so nothing may rely on per-connection server state:
+    asyncpg's and SQLAlchemy's prepared statement caches are disabled and
+    statements get unique names. Application code must likewise only use
+    transaction-scoped settings (SET LOCAL, never plain SET), no session
+    advisory locks and no LISTEN/NOTIFY.
+    """
+    if not settings.DB_PGBOUNCER or not url.startswith("postgresql+asyncpg"):
+        return {}
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": _prepared_statement_name,
+    }
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DB_ECHO,
-    future=True,
-    pool_size=settings.DB_POOL_SIZE,
-    max_overflow=settings.DB_MAX_OVERFLOW,
-    pool_timeout=settings.DB_POOL_TIMEOUT,
-    pool_recycle=settings.DB_POOL_RECYCLE,
-    pool_pre_ping=True,   # cheaply test a connection before using it (catches dropped TCP)
+
+def _create_engine(url: str) -> AsyncEngine:
+    pool_size, max_overflow = pool_sizing()
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        future=True,
+        poolclass=InstrumentedPool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,   # cheaply test a connection before using it (catches dropped TCP)
+        connect_args=_pgbouncer_connect_args(url),
+    )
+
+engine = _create_engine(settings.DATABASE_URL)
+
+# Optional read replica; read-only endpoints use it through get_db_read
+read_engine: Optional[AsyncEngine] = (
+    _create_engine(settings.DATABASE_REPLICA_URL) if settings.DATABASE_REPLICA_URL else None
 )
 
 AsyncSessionLocal = async_sessionmaker(
@@ -20,6 +68,75 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False
 )
 
+AsyncSessionReadLocal = async_sessionmaker(
+    read_engine or engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False
+)
+
+# Read-your-writes: after a successful mutation the client is pinned to the
+# primary until this timestamp, via cookie or (for cookieless clients) header
+STICKY_COOKIE = "db_primary_until"
+STICKY_HEADER = "X-DB-Primary-Until"
+
+# Postgres replica lag in seconds; 0 when fully replayed (an idle primary
+# would otherwise make pg_last_xact_replay_timestamp look ever more stale)
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class ReplicaState:
+    """Last observed replica health, refreshed by replica_lag_monitor."""
+
+    def __init__(self):
+        self.lag_seconds: Optional[float] = None
+        self.healthy = read_engine is not None
+
+    @property
+    def usable(self) -> bool:
+        return (
+            read_engine is not None
+            and self.healthy
+            and (self.lag_seconds or 0) <= settings.DB_REPLICA_MAX_LAG
+        )
+
+
+replica_state = ReplicaState()
+
+
+def sticky_until() -> int:
+    """Timestamp handed to clients after a mutation to pin their reads to the primary."""
+    return int(time.time()) + settings.DB_READ_YOUR_WRITES_SECONDS
+
+
+def _pinned_to_primary(request: Request) -> bool:
+    value = request.cookies.get(STICKY_COOKIE) or request.headers.get(STICKY_HEADER)
+    if not value:
+        return False
+    try:
+        return float(value) > time.time()
+    except ValueError:
+        return False
+
+
+def read_session_factory(request: Request) -> async_sessionmaker:
+    """Replica sessions unless the replica is unusable or the client is pinned to the primary."""
+    use_replica = replica_state.usable and not _pinned_to_primary(request)
+    return AsyncSessionReadLocal if use_replica else AsyncSessionLocal
+
+
+def served_by_replica(session: AsyncSession) -> bool:
+    """Whether the session reads from the replica, which may not have the latest writes yet."""
+    return read_engine is not None and session.bind is read_engine
+
+
 async def get_db():
     """Dependency for getting database session."""
     async with AsyncSessionLocal() as session:
@@ -31,3 +148,45 @@ async def get_db():
             raise
         finally:
             await session.close()
+
+
+async def get_db_read(request: Request):
+    """
+    Dependency for read-only endpoints.
+
+    Uses the replica unless there is none, it is unhealthy or lagging beyond
+    DB_REPLICA_MAX_LAG, or the client recently wrote and is pinned to the primary.
+    """
+    async with read_session_factory(request)() as session:
+        try:
+            yield session
+        finally:
+            await session.rollback()
+            await session.close()
+
+
+async def check_replica_lag():
+    """Measure replica lag once and record it in replica_state."""
+    if read_engine is None:
+        return
+    try:
+        if read_engine.dialect.name != "postgresql":
+            # File-copy replicas (e.g. two SQLite files in tests) have no lag to measure
+            lag = 0.0
+        else:
+            async with read_engine.connect() as conn:
+                lag = float((await conn.execute(text(REPLICA_LAG_SQL))).scalar() or 0)
+        replica_state.lag_seconds = lag
+        replica_state.healthy = True
+        if lag > settings.DB_REPLICA_MAX_LAG:
+            logger.warning(f"Replica lag {lag:.1f}s exceeds {settings.DB_REPLICA_MAX_LAG}s; reading from primary")
+    except Exception as e:
+        replica_state.healthy = False
+        logger.error(f"Replica health check failed, reading from primary: {e}")
+
+
+async def replica_lag_monitor():
+    """Poll replica lag so get_db_read can fall back to the primary."""
+    while True:
+        await check_replica_lag()
+        await asyncio.sleep(settings.DB_REPLICA_LAG_CHECK_INTERVAL)
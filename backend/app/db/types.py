@@ -1,12 +1,23 @@
 """Custom database types for cross-database compatibility."""
 import uuid as uuid_pkg
-from sqlalchemy import String, TypeDecorator
+from sqlalchemy import String, LargeBinary, TypeDecorator
+
+from app.core.config import settings
+
+def _sqlite_blob(dialect) -> bool:
+    return dialect.name == 'sqlite' and settings.SQLITE_UUID_STORAGE == 'blob'
 
 class GUID(TypeDecorator):
     """Platform-independent GUID type.
-    
+
     Uses PostgreSQL's UUID type when available, otherwise uses
-    CHAR(36), storing as stringified hex values.
+    CHAR(36), storing as stringified hex values, or a 16-byte BLOB on
+    SQLite with SQLITE_UUID_STORAGE=blob.
+
+    bind_processor/result_processor are specialized per dialect, so rows are
+    converted without the generic per-value TypeDecorator hooks: on
+    PostgreSQL the driver already speaks uuid.UUID and nothing runs in
+    Python at all.
     """
     impl = String
     cache_ok = True
@@ -15,25 +26,65 @@ class GUID(TypeDecorator):
         if dialect.name == 'postgresql':
             from sqlalchemy.dialects.postgresql import UUID as PG_UUID
             return dialect.type_descriptor(PG_UUID(as_uuid=True))
+        elif _sqlite_blob(dialect):
+            return dialect.type_descriptor(LargeBinary(16))
         else:
             return dialect.type_descriptor(String(36))
 
+    def bind_processor(self, dialect):
+        if dialect.name == 'postgresql':
+            # The driver accepts uuid.UUID and UUID strings natively
+            return self.load_dialect_impl(dialect).bind_processor(dialect)
+        if _sqlite_blob(dialect):
+            def process(value):
+                if value is None:
+                    return None
+                if not isinstance(value, uuid_pkg.UUID):
+                    value = uuid_pkg.UUID(value)
+                return value.bytes
+            return process
+
+        def process(value):
+            if value is None:
+                return None
+            if isinstance(value, uuid_pkg.UUID):
+                return str(value)
+            return str(uuid_pkg.UUID(value))
+        return process
+
+    def result_processor(self, dialect, coltype):
+        if dialect.name == 'postgresql':
+            return self.load_dialect_impl(dialect).result_processor(dialect, coltype)
+        if _sqlite_blob(dialect):
+            UUID = uuid_pkg.UUID
+            def process(value):
+                return None if value is None else UUID(bytes=value)
+            return process
+
+        UUID = uuid_pkg.UUID
+        def process(value):
+            if value is None or isinstance(value, UUID):
+                return value
+            return UUID(value)
+        return process
+
+    # Generic hooks, still used for literal rendering (e.g. compile(literal_binds=True))
     def process_bind_param(self, value, dialect):
         if value is None:
             return value
         elif dialect.name == 'postgresql':
             return value
         else:
-            if isinstance(value, uuid_pkg.UUID):
-                return str(value)
-            else:
-                return str(uuid_pkg.UUID(value))
+            if not isinstance(value, uuid_pkg.UUID):
+                value = uuid_pkg.UUID(value)
+            return value.bytes if _sqlite_blob(dialect) else str(value)
 
     def process_result_value(self, value, dialect):
         if value is None:
             return value
+        elif isinstance(value, uuid_pkg.UUID):
+            return value
+        elif isinstance(value, (bytes, memoryview)):
+            return uuid_pkg.UUID(bytes=bytes(value))
         else:
-            if isinstance(value, uuid_pkg.UUID):
-                return value
-            else:
-                return uuid_pkg.UUID(value)
+            return uuid_pkg.UUID(value)
@@ -1,54 +1,110 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import asyncio
 import os
 
 from app.core.config import settings
+from app.core.startup import startup_report
 from app.api.v1.router import api_router
-from app.db.session import engine
-from app.db.base import Base
-from app.background_tasks import background_tasks_runner
+from app.db.session import (
+    engine, read_engine, replica_lag_monitor, sticky_until, STICKY_COOKIE, STICKY_HEADER
+)
+from app.db.schema import prepare_schema
+from app.db.pool import pool_stats
+from app.background_tasks import background_tasks_runner, booking_maintenance_runner
+from app.cache_warmer import cache_warmer_runner
+from app.webhooks import webhook_inbox_runner, webhook_consumer
+from app.outbox import outbox_dispatcher_runner, outbox_dispatcher
+from app.bloom import spot_id_filter_runner
 from app.cache import cache
+from app.user_cache import local_users
+from app.core.passwords import password_hasher
+from app.core.tokens import token_codec
+from app.core.google_tokens import google_jwks_runner
+from app.core.stripe_gateway import stripe_gateway
+from app.rate_limit import STATE_ATTR as RATE_LIMIT_STATE
 
-# Global task reference
+# Global task references
 background_task = None
+cache_warmer_task = None
+booking_maintenance_task = None
+spot_filter_task = None
+replica_monitor_task = None
+google_jwks_task = None
+webhook_inbox_task = None
+outbox_task = None
 
 # Check if background tasks should run (disabled in multi-worker mode)
 ENABLE_BACKGROUND_TASKS = os.getenv("ENABLE_BACKGROUND_TASKS", "true").lower() == "true"
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global background_task
+    global background_task, cache_warmer_task, booking_maintenance_task, spot_filter_task, replica_monitor_task
+    global google_jwks_task, webhook_inbox_task, outbox_task
     
-    # Startup: Create database tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Startup: check the schema revision (migrations run once via init_db.py)
+    with startup_report.phase("schema"):
+        await prepare_schema(engine)
     
     # Connect to Redis
-    await cache.connect()
+    with startup_report.phase("redis"):
+        await cache.connect()
+    
+    # bcrypt runs in its own worker processes; spawn them before the first login
+    with startup_report.phase("password_hasher"):
+        password_hasher.start()
+    
+    # Google's signing keys are fetched ahead of time so sign-ins never wait on them
+    if settings.GOOGLE_CLIENT_ID:
+        google_jwks_task = asyncio.create_task(google_jwks_runner())
+    
+    # Track replica lag so read-only endpoints can fall back to the primary
+    if read_engine is not None:
+        replica_monitor_task = asyncio.create_task(replica_lag_monitor())
+    
+    # Each worker keeps its own bloom filter of spot IDs for fast 404s
+    if settings.SPOT_BLOOM_ENABLED:
+        spot_filter_task = asyncio.create_task(spot_id_filter_runner())
     
     # Start background tasks only if enabled (disabled in multi-worker production)
     if ENABLE_BACKGROUND_TASKS:
         print("🔄 Starting background tasks in this worker")
         background_task = asyncio.create_task(background_tasks_runner())
+        booking_maintenance_task = asyncio.create_task(booking_maintenance_runner())
+        webhook_inbox_task = asyncio.create_task(webhook_inbox_runner())
+        outbox_task = asyncio.create_task(outbox_dispatcher_runner())
+        if settings.CACHE_WARM_ENABLED:
+            cache_warmer_task = asyncio.create_task(cache_warmer_runner())
     else:
         print("⏭️  Background tasks disabled (run separately with run_background_tasks.py)")
     
+    print(f"✅ {startup_report.ready()}")
+    
     yield
     
     # Shutdown: Cancel background tasks and cleanup
-    if background_task:
-        background_task.cancel()
-        try:
-            await background_task
-        except asyncio.CancelledError:
-            pass
+    for task in (
+        background_task, cache_warmer_task, booking_maintenance_task, spot_filter_task,
+        replica_monitor_task, google_jwks_task, webhook_inbox_task, outbox_task
+    ):
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
     
     # Disconnect Redis
     await cache.disconnect()
     
+    password_hasher.shutdown()
+    
+    await stripe_gateway.close()
+    
     await engine.dispose()
+    if read_engine is not None:
+        await read_engine.dispose()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -67,6 +123,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Read-your-writes: pin clients to the primary for a short while after they mutate
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+    if (
+        read_engine is not None
+        and request.method not in ("GET", "HEAD", "OPTIONS")
+        and response.status_code < 400
+    ):
+        until = sticky_until()
+        response.set_cookie(
+            STICKY_COOKIE, str(until),
+            max_age=settings.DB_READ_YOUR_WRITES_SECONDS, httponly=True, samesite="lax"
+        )
+        response.headers[STICKY_HEADER] = str(until)
+    return response
+
+# RateLimit-* headers for requests that passed a rate-limited route's check
+@app.middleware("http")
+async def rate_limit_headers(request: Request, call_next):
+    response = await call_next(request)
+    headers = getattr(request.state, RATE_LIMIT_STATE, None)
+    if headers:
+        response.headers.update(headers)
+    return response
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -80,4 +162,18 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "redis_pool": cache.pool_stats(),
+        "db_pool": {
+            "primary": pool_stats(engine),
+            "replica": pool_stats(read_engine) if read_engine is not None else None,
+        },
+        "user_cache": local_users.stats(),
+        "password_hasher": password_hasher.stats(),
+        "token_codec": token_codec.stats(),
+        "stripe": stripe_gateway.stats(),
+        "webhook_inbox": webhook_consumer.stats(),
+        "outbox": outbox_dispatcher.stats(),
+        "startup": startup_report.as_dict(),
+    }
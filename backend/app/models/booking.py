@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Integer, ForeignKey, Enum, DateTime, Text
+from sqlalchemy import Column, String, Integer, Boolean, ForeignKey, Enum, DateTime, Text, Index, text, false
 from app.db.types import GUID
 from sqlalchemy.orm import relationship
 import enum
@@ -14,8 +14,43 @@ class BookingStatus(str, enum.Enum):
     CANCELLED = "cancelled"
     REFUNDED = "refunded"
 
+# Statuses that hold a spot; matches the no_overlapping_bookings constraint.
+# Enum columns store member names, hence the upper-case literals.
+ACTIVE_STATUS_SQL = "status IN ('PENDING', 'CONFIRMED', 'IN_PROGRESS')"
+
 class Booking(Base, TimestampMixin):
+    # On PostgreSQL the table is partitioned by alembic revision 0003: LIST on
+    # `archived`, then RANGE on `start_time` by month. Hot queries filter on
+    # archived == False so they only touch the live partitions. Id uniqueness
+    # and the FKs from reviews/payments/payouts go through booking_ids (0007).
     __tablename__ = "bookings"
+    __table_args__ = (
+        # Conflict checks on create and the availability filter on spot listings
+        Index(
+            "ix_bookings_spot_active_window", "parking_spot_id", "start_time", "end_time",
+            postgresql_where=text(ACTIVE_STATUS_SQL), sqlite_where=text(ACTIVE_STATUS_SQL)
+        ),
+        # "My bookings" and owner bookings, newest first
+        Index("ix_bookings_user_created", "user_id", "created_at"),
+        Index("ix_bookings_spot_created", "parking_spot_id", "created_at"),
+        # Background auto-checkout and auto-start sweeps
+        Index(
+            "ix_bookings_status_end_time", "status", "end_time",
+            postgresql_where=text("status IN ('CONFIRMED', 'IN_PROGRESS')"),
+            sqlite_where=text("status IN ('CONFIRMED', 'IN_PROGRESS')")
+        ),
+        Index(
+            "ix_bookings_confirmed_start_time", "start_time",
+            postgresql_where=text("status = 'CONFIRMED'"),
+            sqlite_where=text("status = 'CONFIRMED'")
+        ),
+        # Payment confirmation looks bookings up by intent
+        Index(
+            "ix_bookings_payment_intent_id", "payment_intent_id",
+            postgresql_where=text("payment_intent_id IS NOT NULL"),
+            sqlite_where=text("payment_intent_id IS NOT NULL")
+        ),
+    )
     
     id = Column(GUID, primary_key=True, default=uuid.uuid4)
     user_id = Column(GUID, ForeignKey("users.id"), nullable=False)
@@ -28,6 +63,9 @@ class Booking(Base, TimestampMixin):
     # Status
     status = Column(Enum(BookingStatus), default=BookingStatus.PENDING)
     
+    # Finished bookings are moved to the archive partitions after BOOKING_ARCHIVE_AFTER_DAYS
+    archived = Column(Boolean, nullable=False, default=False, server_default=false())
+    
     # Pricing
     total_amount = Column(Integer, nullable=False)  # in cents
     service_fee = Column(Integer, default=0)        # in cents
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Text, Index, text, func
+
+from app.db.base import Base
+
+class OutboxMessage(Base):
+    """
+    A side effect of a state change, written in the same transaction as the change.
+    
+    app/outbox.py delivers pending messages in batches after the transaction
+    commits, so an effect is never lost to a crash between commit and delivery.
+    """
+    __tablename__ = "outbox"
+    __table_args__ = (
+        # The dispatcher's queue: undelivered, not given up on, oldest first
+        Index(
+            "ix_outbox_pending", "id",
+            postgresql_where=text("dispatched_at IS NULL AND dead_lettered_at IS NULL"),
+            sqlite_where=text("dispatched_at IS NULL AND dead_lettered_at IS NULL")
+        ),
+    )
+    
+    # Delivery order; INTEGER on SQLite so it autoincrements
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    kind = Column(String(50), nullable=False)    # e.g. "spot.invalidate", "payout.create"
+    payload = Column(Text, nullable=False)       # JSON arguments for the kind's handler
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # pushed back on failure
+    dispatched_at = Column(DateTime(timezone=True), nullable=True)
+    dead_lettered_at = Column(DateTime(timezone=True), nullable=True)  # set after OUTBOX_MAX_ATTEMPTS failures
+    attempts = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    last_error = Column(Text, nullable=True)
+    
+    def __repr__(self):
+        return f"<OutboxMessage {self.id} {self.kind}>"
@@ -25,7 +25,7 @@ class ParkingSpot(Base, TimestampMixin):
     __tablename__ = "parking_spots"
     
     id = Column(GUID, primary_key=True, default=uuid.uuid4)
-    owner_id = Column(GUID, ForeignKey("users.id"), nullable=False)
+    owner_id = Column(GUID, ForeignKey("users.id"), nullable=False, index=True)
     
     # Basic info
     title = Column(String(255), nullable=False)
@@ -88,7 +88,7 @@ class AvailabilitySlot(Base, TimestampMixin):
     __tablename__ = "availability_slots"
     
     id = Column(GUID, primary_key=True, default=uuid.uuid4)
-    parking_spot_id = Column(GUID, ForeignKey("parking_spots.id"), nullable=False)
+    parking_spot_id = Column(GUID, ForeignKey("parking_spots.id"), nullable=False, index=True)
     
     # Day of week (0=Monday, 6=Sunday) or specific date
     day_of_week = Column(Integer, nullable=True)  # For recurring availability
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Integer, ForeignKey, Enum, DateTime, Text
+from sqlalchemy import Column, String, Integer, ForeignKey, Enum, DateTime, Text, Index, text, func
 from app.db.types import GUID
 import enum
 
@@ -21,6 +21,10 @@ class PayoutStatus(str, enum.Enum):
 
 class Payment(Base, TimestampMixin):
     __tablename__ = "payments"
+    __table_args__ = (
+        # Payment history, newest first (stripe_payment_intent_id is covered by its unique index)
+        Index("ix_payments_user_created", "user_id", "created_at"),
+    )
     
     id = Column(GUID, primary_key=True, default=uuid.uuid4)
     booking_id = Column(GUID, ForeignKey("bookings.id"), nullable=False)
@@ -54,6 +58,12 @@ class Payment(Base, TimestampMixin):
 class Payout(Base, TimestampMixin):
     """Payouts to parking spot owners."""
     __tablename__ = "payouts"
+    __table_args__ = (
+        # Payout summary sums by status (and processed_at for this month)
+        Index("ix_payouts_owner_status", "owner_id", "status", "processed_at"),
+        # Payout history, newest first
+        Index("ix_payouts_owner_created", "owner_id", "created_at"),
+    )
     
     id = Column(GUID, primary_key=True, default=uuid.uuid4)
     owner_id = Column(GUID, ForeignKey("users.id"), nullable=False)
@@ -76,3 +86,35 @@ class Payout(Base, TimestampMixin):
     
     def __repr__(self):
         return f"<Payout {self.id} - {self.amount} cents>"
+
+
+class StripeEvent(Base):
+    """
+    Inbox of Stripe webhook events.
+    
+    The webhook only inserts here (the event id is the primary key, so Stripe's
+    redeliveries are dropped); app/webhooks.py applies pending events in batches.
+    """
+    __tablename__ = "stripe_events"
+    __table_args__ = (
+        # The consumer's queue: unprocessed events, oldest first
+        Index(
+            "ix_stripe_events_pending", "received_at",
+            postgresql_where=text("processed_at IS NULL"),
+            sqlite_where=text("processed_at IS NULL")
+        ),
+    )
+    
+    id = Column(String(255), primary_key=True)   # Stripe's event id (evt_...)
+    type = Column(String(100), nullable=False)
+    object_id = Column(String(255), nullable=True)  # id of data.object, e.g. the payment intent
+    payload = Column(Text, nullable=False)       # data.object as JSON
+    stripe_created = Column(Integer, nullable=False)  # Stripe's timestamp; events apply in this order
+    
+    received_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    last_error = Column(Text, nullable=True)
+    
+    def __repr__(self):
+        return f"<StripeEvent {self.id} {self.type}>"
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Integer, ForeignKey, Text, Float
+from sqlalchemy import Column, String, Integer, ForeignKey, Text, Float, Index
 from app.db.types import GUID
 from sqlalchemy.orm import relationship
 
@@ -7,6 +7,12 @@ from app.db.base import Base, TimestampMixin
 
 class Review(Base, TimestampMixin):
     __tablename__ = "reviews"
+    __table_args__ = (
+        # Spot review pages (newest first) and the rating summary
+        Index("ix_reviews_spot_created", "parking_spot_id", "created_at"),
+        # One-review-per-booking check on create
+        Index("ix_reviews_booking_id", "booking_id"),
+    )
     
     id = Column(GUID, primary_key=True, default=uuid.uuid4)
     booking_id = Column(GUID, ForeignKey("bookings.id"), nullable=False)
@@ -0,0 +1,333 @@
+"""
+Transactional outbox for side effects of booking and payment changes.
+
+Handlers used to run cache invalidation after their commit, inline: the
+request waited on the Redis fan-out, and a crash (or a forgotten call, as in
+update_booking_status) between commit and invalidation lost it. Now they
+record the effect with emit() in the same transaction as the state change:
+
+    emit(db, "spot.invalidate", spot_id=str(booking.parking_spot_id))
+
+The message commits or rolls back with the change. outbox_dispatcher_runner()
+delivers pending messages in batches, oldest first, grouping them by kind so
+fifty invalidations of the same spot become one. Delivery is at least once:
+messages are marked delivered in the dispatcher's transaction after their
+handler ran, so a handler must be safe to repeat, and must raise rather than
+skip its effect so the messages are retried (the cache handlers use the
+strict cache helpers, which fail while Redis is off or erroring). A process
+whose Redis connection failed at startup doesn't claim the cache kinds at
+all, leaving them to dispatchers that can deliver them.
+
+Each kind runs in its own savepoint of that transaction: effects that write
+to the database commit with the delivery mark, so they happen exactly once,
+and a failed one rolls back only its own kind. payout.create is such an
+effect, and new behaviour rather than a moved one: completing a paid booking
+now queues the owner's PENDING payout.
+
+A failing kind is retried with backoff without holding up the other kinds
+in the batch. After OUTBOX_MAX_ATTEMPTS failures a database effect is
+dead-lettered: it leaves the pending index and is purged after
+OUTBOX_RETENTION_HOURS, its last_error kept until then for inspection. Cache
+effects are never dead-lettered, so a Redis outage delays invalidations
+instead of losing them. Once GENERATION_TTL has passed every key one could
+touch has expired by itself, so undelivered cache messages that old (e.g. in
+a deployment without Redis) are purged as moot.
+
+The committing worker wakes its own dispatcher immediately; a dispatcher in
+another process (run_background_tasks.py) picks messages up within
+OUTBOX_POLL_INTERVAL.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+
+from sqlalchemy import and_, case, delete, event, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.cache import GENERATION_TTL, cache, invalidate_spots_strict, write_through_spots_strict
+from app.models.outbox import OutboxMessage
+from app.models.booking import Booking, BookingStatus
+from app.models.parking_spot import ParkingSpot
+from app.models.payment import Payout, PayoutStatus
+from app.models.user import User  # noqa: F401  (resolves the Booking/ParkingSpot mappers)
+from app.models.review import Review  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+# Session.info flag: this transaction wrote outbox messages
+PENDING_FLAG = "outbox_pending"
+
+# Longest delay between retries of a failing message, in seconds
+MAX_BACKOFF = 300
+
+# How often delivered messages past OUTBOX_RETENTION_HOURS are deleted
+PURGE_INTERVAL = 3600
+
+Handler = Callable[[AsyncSession, List[Dict[str, Any]]], Awaitable[None]]
+_handlers: Dict[str, Handler] = {}
+
+# Kinds whose effect is on the Redis cache rather than the database
+CACHE_KINDS = set()
+
+_wakeup = asyncio.Event()
+
+
+def handler(kind: str, uses_cache: bool = False):
+    """Register the function delivering all pending messages of `kind` in a batch."""
+    def register(fn: Handler) -> Handler:
+        _handlers[kind] = fn
+        if uses_cache:
+            CACHE_KINDS.add(kind)
+        return fn
+    return register
+
+
+def emit(db: AsyncSession, kind: str, **payload):
+    """Record a side effect in the session's current transaction."""
+    if kind not in _handlers:
+        raise ValueError(f"No outbox handler for {kind!r}")
+    now = datetime.now(timezone.utc)
+    db.add(OutboxMessage(
+        kind=kind, payload=json.dumps(payload, default=str), created_at=now, available_at=now
+    ))
+    db.info[PENDING_FLAG] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_dispatcher(session):
+    if session.info.pop(PENDING_FLAG, False):
+        _wakeup.set()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_pending(session):
+    session.info.pop(PENDING_FLAG, None)
+
+
+# ── Handlers ──────────────────────────────────────────────────────────────────
+
+@handler("spot.invalidate", uses_cache=True)
+async def _invalidate_spots(db: AsyncSession, payloads: List[Dict[str, Any]]):
+    """Availability changed: drop the spots' cached details and search results."""
+    await invalidate_spots_strict({payload["spot_id"] for payload in payloads})
+
+
+@handler("spot.refresh", uses_cache=True)
+async def _refresh_spots(db: AsyncSession, payloads: List[Dict[str, Any]]):
+    """Spot stats changed: write the spots' current details through to the cache."""
+    spot_ids = {uuid.UUID(payload["spot_id"]) for payload in payloads}
+    result = await db.execute(select(ParkingSpot).where(ParkingSpot.id.in_(spot_ids)))
+    invalidate_search = any(payload.get("search") for payload in payloads)
+    await write_through_spots_strict(result.scalars().all(), invalidate_search=invalidate_search)
+
+
+@handler("payout.create")
+async def _create_payouts(db: AsyncSession, payloads: List[Dict[str, Any]]):
+    """A paid booking completed: queue the owner's payout (once per booking)."""
+    booking_ids = {uuid.UUID(payload["booking_id"]) for payload in payloads}
+    existing = set((await db.execute(
+        select(Payout.booking_id).where(Payout.booking_id.in_(booking_ids))
+    )).scalars())
+    result = await db.execute(
+        select(Booking, ParkingSpot.owner_id)
+        .join(ParkingSpot, ParkingSpot.id == Booking.parking_spot_id)
+        .where(
+            Booking.id.in_(booking_ids - existing),
+            Booking.status == BookingStatus.COMPLETED,
+            Booking.payment_status == "paid"
+        )
+    )
+    db.add_all([
+        Payout(
+            owner_id=owner_id,
+            booking_id=booking.id,
+            amount=booking.owner_payout,
+            status=PayoutStatus.PENDING
+        )
+        for booking, owner_id in result.all()
+    ])
+
+
+# ── Dispatcher ────────────────────────────────────────────────────────────────
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(MAX_BACKOFF, 2 ** attempts))
+
+
+class OutboxDispatcher:
+    """Delivers pending outbox messages in batches."""
+
+    def __init__(self):
+        self.delivered = 0
+        self.batches = 0
+        self.failed = 0
+        self.dead_lettered = 0
+        self.last_batch_size = 0
+        self.last_batch_ms = 0.0
+        self._last_purge = 0.0
+
+    async def dispatch_batch(self) -> int:
+        """Deliver one batch of pending messages. Returns how many were claimed."""
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        query = select(OutboxMessage).where(
+            OutboxMessage.dispatched_at.is_(None),
+            OutboxMessage.dead_lettered_at.is_(None),
+            OutboxMessage.available_at <= now
+        )
+        if not cache.enabled:
+            # No Redis here (it was unreachable at startup): leave the cache
+            # kinds to the dispatchers of workers that have it
+            query = query.where(OutboxMessage.kind.notin_(CACHE_KINDS))
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                query
+                .order_by(OutboxMessage.id)
+                .limit(settings.OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            messages = result.scalars().all()
+            if not messages:
+                return 0
+            message_ids = [message.id for message in messages]
+
+            by_kind = defaultdict(list)
+            for message in messages:
+                by_kind[message.kind].append(message)
+
+            delivered = 0
+            for kind, group in by_kind.items():
+                try:
+                    fn = _handlers.get(kind)
+                    if fn is None:
+                        raise LookupError(f"No outbox handler for {kind!r}")
+                    payloads = [json.loads(message.payload) for message in group]
+                    # Released (and flushed) on success; rolled back on failure,
+                    # leaving the session usable for the other kinds
+                    async with db.begin_nested():
+                        await fn(db, payloads)
+                except Exception as e:
+                    logger.error(f"Outbox {kind} delivery failed for {len(group)} messages: {e}")
+                    self.failed += len(group)
+                    for message in group:
+                        message.attempts += 1
+                        message.last_error = str(e)[:1000]
+                        message.available_at = now + _backoff(message.attempts)
+                        if kind not in CACHE_KINDS and message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                            message.dead_lettered_at = now
+                            self.dead_lettered += 1
+                            logger.error(f"Outbox message {message.id} ({kind}) dead-lettered after {message.attempts} attempts")
+                    continue
+                for message in group:
+                    message.dispatched_at = now
+                    message.attempts += 1
+                delivered += len(group)
+
+            try:
+                await db.commit()
+            except Exception as e:
+                # e.g. the connection dropped: nothing in the batch counts as delivered
+                await db.rollback()
+                logger.error(f"Outbox batch commit failed: {e}")
+                self.failed += len(message_ids)
+                await db.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(message_ids))
+                    .values(
+                        attempts=OutboxMessage.attempts + 1,
+                        last_error=str(e)[:1000],
+                        available_at=now + _backoff(1),
+                        dead_lettered_at=case(
+                            (and_(
+                                OutboxMessage.kind.notin_(CACHE_KINDS),
+                                OutboxMessage.attempts + 1 >= settings.OUTBOX_MAX_ATTEMPTS
+                            ), now),
+                            else_=None
+                        )
+                    )
+                )
+                await db.commit()
+                delivered = 0
+
+        self.delivered += delivered
+        self.batches += 1
+        self.last_batch_size = len(message_ids)
+        self.last_batch_ms = (time.perf_counter() - started) * 1000
+        return len(message_ids)
+
+    async def purge_delivered(self) -> int:
+        """
+        Delete messages delivered or dead-lettered more than OUTBOX_RETENTION_HOURS
+        ago, and cache messages left undelivered past GENERATION_TTL.
+        """
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(OutboxMessage).where(or_(
+                    OutboxMessage.dispatched_at < cutoff,
+                    OutboxMessage.dead_lettered_at < cutoff,
+                    and_(
+                        OutboxMessage.dispatched_at.is_(None),
+                        OutboxMessage.kind.in_(CACHE_KINDS),
+                        OutboxMessage.created_at < now - timedelta(seconds=GENERATION_TTL)
+                    )
+                ))
+            )
+            await db.commit()
+        self._last_purge = time.monotonic()
+        return result.rowcount
+
+    def purge_due(self) -> bool:
+        return time.monotonic() - self._last_purge >= PURGE_INTERVAL
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "delivered": self.delivered,
+            "batches": self.batches,
+            "failed": self.failed,
+            "dead_lettered": self.dead_lettered,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_ms": round(self.last_batch_ms, 1),
+        }
+
+
+outbox_dispatcher = OutboxDispatcher()
+
+
+async def outbox_dispatcher_runner():
+    """Deliver outbox messages continuously."""
+    logger.info("Starting outbox dispatcher...")
+
+    while True:
+        try:
+            # Cleared before the batch, so a commit meanwhile isn't missed
+            _wakeup.clear()
+            claimed = await outbox_dispatcher.dispatch_batch()
+            if claimed >= settings.OUTBOX_BATCH_SIZE:
+                # Backlog: go straight on to the next batch
+                continue
+
+            if outbox_dispatcher.purge_due():
+                purged = await outbox_dispatcher.purge_delivered()
+                if purged:
+                    logger.info(f"Purged {purged} finished outbox messages")
+
+            try:
+                await asyncio.wait_for(_wakeup.wait(), settings.OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in outbox dispatcher: {e}")
+            await asyncio.sleep(settings.OUTBOX_POLL_INTERVAL)
@@ -0,0 +1,202 @@
+"""
+Token-bucket rate limiting backed by Redis.
+
+Routes opt in with a dependency declared on the route decorator, so it is
+resolved before the handler's own dependencies and before any DB query or
+bcrypt work:
+
+    @router.post("/login", dependencies=[Depends(rate_limit("login"))])
+
+Each route has buckets per client IP and, where the caller can be
+identified, per user ("<route>:ip", "<route>:user" in RATE_LIMITS). All of
+a request's buckets are updated in one pipelined round trip by an atomic Lua
+script. A worker that was just told a bucket is empty refuses further
+requests for it locally until the retry time, without asking Redis again.
+
+Responses carry RateLimit-Limit / RateLimit-Remaining / RateLimit-Reset for
+the tightest bucket; refusals are 429 with Retry-After. Without Redis, limits
+are not enforced.
+"""
+import hashlib
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from app.cache import cache
+from app.core.config import settings
+from app.core.security import decode_token
+
+# Request attribute the headers middleware reads
+STATE_ATTR = "rate_limit_headers"
+
+# Most keys a worker remembers as locally blocked; expired ones are dropped first
+LOCAL_BLOCK_MAX_KEYS = 10000
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Refill KEYS[1] for the time since it was last touched, then take ARGV[3]
+# tokens if there are enough. Time comes from the Redis server so workers
+# with skewed clocks agree. Returns {allowed, remaining, retry_after_ms, reset_ms}.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local per_ms = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * per_ms)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = math.ceil((cost - tokens) / per_ms)
+end
+local reset = math.ceil((capacity - tokens) / per_ms)
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], reset + 1000)
+return {allowed, math.floor(tokens), retry_after, reset}
+"""
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """"10/minute" or "10/60" -> (capacity 10, period 60 seconds)."""
+    count, _, period = rate.partition("/")
+    period = period.strip()
+    seconds = PERIODS.get(period.rstrip("s")) if not period.isdigit() else int(period)
+    if not seconds:
+        raise ValueError(f"Bad rate limit {rate!r}, expected e.g. '10/minute' or '10/60'")
+    return int(count), float(seconds)
+
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _token_subject(request: Request) -> Optional[str]:
+    # Signature check only, no DB: enough to tell users apart
+    header = request.headers.get("authorization", "")
+    if not header.lower().startswith("bearer "):
+        return None
+    payload = decode_token(header[7:])
+    return payload.get("sub") if payload else None
+
+
+async def _login_identity(request: Request) -> Optional[str]:
+    # The account being tried, so a credential-stuffing run is limited per target too
+    try:
+        body = await request.json()
+    except Exception:
+        return None
+    email = body.get("email") if isinstance(body, dict) else None
+    if not isinstance(email, str):
+        return None
+    # Hashed so addresses don't end up in Redis key names
+    return hashlib.sha1(email.strip().lower().encode()).hexdigest()[:16]
+
+
+class LocalBlocks:
+    """Per-worker memory of buckets Redis reported empty, until they refill."""
+
+    def __init__(self):
+        self._until: Dict[str, float] = {}
+
+    def retry_after(self, key: str) -> float:
+        until = self._until.get(key)
+        if until is None:
+            return 0.0
+        remaining = until - time.monotonic()
+        if remaining <= 0:
+            del self._until[key]
+            return 0.0
+        return remaining
+
+    def block(self, key: str, seconds: float):
+        if len(self._until) >= LOCAL_BLOCK_MAX_KEYS:
+            now = time.monotonic()
+            self._until = {k: v for k, v in self._until.items() if v > now}
+            if len(self._until) >= LOCAL_BLOCK_MAX_KEYS:
+                self._until.clear()
+        self._until[key] = time.monotonic() + seconds
+
+
+local_blocks = LocalBlocks()
+
+
+def _headers(limit: int, remaining: int, reset_seconds: float) -> Dict[str, str]:
+    return {
+        "RateLimit-Limit": str(limit),
+        "RateLimit-Remaining": str(max(0, remaining)),
+        "RateLimit-Reset": str(max(0, math.ceil(reset_seconds))),
+    }
+
+
+def _too_many(limit: int, retry_after: float) -> HTTPException:
+    headers = _headers(limit, 0, retry_after)
+    headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Rate limit exceeded, please slow down",
+        headers=headers
+    )
+
+
+async def _identities(route: str, request: Request) -> List[Tuple[str, str]]:
+    """(scope, identity) pairs this request is counted under."""
+    identities = [("ip", client_ip(request))]
+    if f"{route}:user" in settings.RATE_LIMITS:
+        user = await _login_identity(request) if route == "login" else _token_subject(request)
+        if user:
+            identities.append(("user", user))
+    return identities
+
+
+def rate_limit(route: str, cost: int = 1):
+    """Dependency enforcing the RATE_LIMITS buckets configured for `route`."""
+
+    async def dependency(request: Request):
+        if not settings.RATE_LIMIT_ENABLED or not cache.enabled or not cache.redis_client:
+            return
+        buckets = []
+        for scope, identity in await _identities(route, request):
+            rate = settings.RATE_LIMITS.get(f"{route}:{scope}")
+            if rate:
+                capacity, period = parse_rate(rate)
+                buckets.append((f"rl:{route}:{scope}:{identity}", capacity, period))
+        if not buckets:
+            return
+
+        # Buckets this worker already knows are empty: refuse without a round trip
+        for key, capacity, _ in buckets:
+            retry_after = local_blocks.retry_after(key)
+            if retry_after:
+                raise _too_many(capacity, retry_after)
+
+        try:
+            async with cache.redis_client.pipeline(transaction=False) as pipe:
+                for key, capacity, period in buckets:
+                    pipe.eval(TOKEN_BUCKET_SCRIPT, 1, key, capacity, capacity / (period * 1000), cost)
+                results = await pipe.execute()
+        except Exception as e:
+            print(f"Redis rate limit error: {e}")
+            return
+
+        tightest = None
+        for (key, capacity, _), (allowed, remaining, retry_after_ms, reset_ms) in zip(buckets, results):
+            if not allowed:
+                local_blocks.block(key, retry_after_ms / 1000)
+                raise _too_many(capacity, retry_after_ms / 1000)
+            if tightest is None or remaining / capacity < tightest[1] / tightest[0]:
+                tightest = (capacity, remaining, reset_ms / 1000)
+        setattr(request.state, STATE_ATTR, _headers(*tightest))
+
+    return dependency
@@ -0,0 +1,177 @@
+"""
+Refresh-token families in Redis: rotation, reuse detection, revocation.
+
+Each login starts a family. The refresh token carries the family id (fam)
+and its own id (jti); Redis keeps only the family's current jti. Every
+/auth/refresh rotates: the presented jti must be the current one and is
+replaced by a new one, atomically in a Lua script, so validating a refresh
+costs one Redis round trip. The user for the new access token comes from
+the user cache, so a refresh normally runs no database query at all.
+
+Presenting a jti that was already rotated away means the token was copied;
+the whole family is deleted and both holders have to log in again.
+
+Revoking everything a user holds is one SET: families created before the
+user's revocation time are rejected (and deleted) at their next refresh.
+The revocation key only has to outlive REFRESH_TOKEN_EXPIRE_DAYS, because
+a family that isn't refreshed within that time expires by itself.
+
+Tokens without a family (issued while Redis was down, or before families
+existed) are stateless. They are still checked against the user's revocation
+time, using the token's iat (derived from exp for tokens that predate it),
+before a refresh moves them into a new family. Family tokens are never
+accepted without Redis: /auth/refresh answers 503 until the store is back.
+"""
+import uuid
+
+from app.cache import cache
+from app.core.config import settings
+from app.core.security import create_refresh_token
+
+# Atomically create a family with its first jti, stamped with the server time
+CREATE_FAMILY_SCRIPT = """
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+redis.call('HSET', KEYS[1], 'current', ARGV[1], 'created', now)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return now
+"""
+
+# Check the presented jti against the family and rotate it.
+# KEYS: family, user revocation; ARGV: presented jti, new jti, ttl
+ROTATE_SCRIPT = """
+local family = redis.call('HMGET', KEYS[1], 'current', 'created')
+if not family[1] then
+    return 'missing'
+end
+local revoked = redis.call('GET', KEYS[2])
+if revoked and tonumber(family[2]) <= tonumber(revoked) then
+    redis.call('DEL', KEYS[1])
+    return 'revoked'
+end
+if family[1] ~= ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 'reused'
+end
+redis.call('HSET', KEYS[1], 'current', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 'ok'
+"""
+
+# Record "now" (server time) as the user's revocation point
+REVOKE_USER_SCRIPT = """
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+redis.call('SET', KEYS[1], now, 'EX', ARGV[1])
+return now
+"""
+
+
+class RefreshTokenRejected(Exception):
+    """The refresh token's family is missing, revoked, or the token was reused."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Refresh token rejected: {reason}")
+        self.reason = reason
+
+
+class RefreshStoreUnavailable(Exception):
+    """Redis could not be asked about the refresh token."""
+
+
+def family_key(family_id: str) -> str:
+    return f"rt:fam:{family_id}"
+
+
+def user_revocation_key(user_id) -> str:
+    return f"rt:revoked:{user_id}"
+
+
+def _ttl() -> int:
+    return settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400
+
+
+def store_available() -> bool:
+    return bool(cache.enabled and cache.redis_client)
+
+
+def _issued_at_ms(payload: dict) -> int:
+    if "iat" in payload:
+        return int(payload["iat"]) * 1000
+    # Tokens from before iat was added: exp is issue time + the refresh lifetime
+    return (int(payload["exp"]) - _ttl()) * 1000
+
+
+async def issue_refresh_token(user_id) -> str:
+    """Refresh token starting a new family (a plain stateless token without Redis)."""
+    if not store_available():
+        return create_refresh_token(str(user_id))
+    family_id, jti = uuid.uuid4().hex, uuid.uuid4().hex
+    try:
+        await cache.redis_client.eval(CREATE_FAMILY_SCRIPT, 1, family_key(family_id), jti, _ttl())
+    except Exception as e:
+        print(f"Redis refresh token error: {e}")
+        return create_refresh_token(str(user_id))
+    return create_refresh_token(str(user_id), claims={"fam": family_id, "jti": jti})
+
+
+async def rotate_refresh_token(payload: dict) -> str:
+    """
+    Validate a decoded refresh token against its family and return its successor.
+
+    Raises RefreshTokenRejected when the family is gone, was revoked, or the
+    token had already been used (which also ends the family), and
+    RefreshStoreUnavailable when Redis can't be reached.
+    """
+    if not store_available():
+        raise RefreshStoreUnavailable()
+    family_id, jti = payload["fam"], payload.get("jti")
+    new_jti = uuid.uuid4().hex
+    try:
+        result = await cache.redis_client.eval(
+            ROTATE_SCRIPT, 2,
+            family_key(family_id), user_revocation_key(payload["sub"]),
+            jti or "", new_jti, _ttl()
+        )
+    except Exception as e:
+        print(f"Redis refresh token error: {e}")
+        raise RefreshStoreUnavailable() from e
+    if result != "ok":
+        if result == "reused":
+            print(f"⚠ Refresh token reuse detected for user {payload['sub']}, family revoked")
+        raise RefreshTokenRejected(result)
+    return create_refresh_token(payload["sub"], claims={"fam": family_id, "jti": new_jti})
+
+
+async def check_unfamilied_token(payload: dict):
+    """
+    Reject a decoded refresh token without a family if the user's refresh
+    tokens were revoked after it was issued. Without Redis there is nothing
+    to check against, as before families existed.
+    """
+    if not store_available():
+        return
+    try:
+        revoked = await cache.redis_client.get(user_revocation_key(payload["sub"]))
+    except Exception as e:
+        print(f"Redis refresh token error: {e}")
+        raise RefreshStoreUnavailable() from e
+    # Revocation is stamped in ms, iat in whole seconds: a tie counts as revoked
+    if revoked is not None and _issued_at_ms(payload) <= int(revoked):
+        raise RefreshTokenRejected("revoked")
+
+
+async def revoke_family(payload: dict):
+    """End the family a decoded refresh token belongs to (logout)."""
+    if payload.get("fam") and store_available():
+        await cache.delete(family_key(payload["fam"]))
+
+
+async def revoke_user_refresh_tokens(user_id):
+    """Reject every refresh token the user holds, in one operation."""
+    if not store_available():
+        return
+    try:
+        await cache.redis_client.eval(REVOKE_USER_SCRIPT, 1, user_revocation_key(user_id), _ttl())
+    except Exception as e:
+        print(f"Redis refresh token error: {e}")
@@ -69,6 +69,10 @@ class ParkingSpotResponse(ParkingSpotBase):
     class Config:
         from_attributes = True
 
+def serialize_spot_detail(spot) -> Dict[str, Any]:
+    """JSON-ready spot detail; the one shape stored under the spot:{id} cache key."""
+    return ParkingSpotResponse.model_validate(spot).model_dump(mode="json")
+
 class ParkingSpotListResponse(BaseModel):
     id: UUID
     title: str
@@ -0,0 +1,196 @@
+"""
+Snapshot cache of authenticated users.
+
+get_current_user used to SELECT the user on every authenticated request.
+Snapshots of the user's columns are kept in a small per-worker LRU for a few
+seconds, backed by Redis for USER_CACHE_TTL, and turned back into a
+session-bound User with merge(load=False), so handlers can still modify
+current_user and commit.
+
+Each snapshot carries the row's updated_at as its version. Handlers that
+change a user call store_user() after commit; an older snapshot (e.g. from a
+slow cache-miss reader) never replaces a newer one. Other workers see the
+change once their local entry expires (USER_CACHE_LOCAL_TTL).
+
+hashed_password is left out of snapshots; code that needs it refreshes that
+attribute explicitly.
+
+Claims-mode access tokens (AUTH_TOKEN_CLAIMS) carry the user's version too.
+revoke_tokens() records the version older tokens must not fall below, and
+sensitive routes check it with tokens_revoked().
+"""
+import json
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.cache import cache
+from app.core.config import settings
+from app.core.security import user_version
+from app.models.user import User, UserRole
+
+# Kept out of Redis; loaded on demand by the few handlers that need it
+EXCLUDED_COLUMNS = {"hashed_password"}
+
+SNAPSHOT_COLUMNS = [c.key for c in User.__table__.columns if c.key not in EXCLUDED_COLUMNS]
+
+
+def user_key(user_id) -> str:
+    return f"user:{user_id}"
+
+
+def revocation_key(user_id) -> str:
+    return f"auth:minver:{user_id}"
+
+
+def snapshot(user: User) -> Dict[str, Any]:
+    """JSON-safe column values of a loaded user."""
+    data = {}
+    for key in SNAPSHOT_COLUMNS:
+        value = getattr(user, key)
+        if isinstance(value, uuid.UUID):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, UserRole):
+            value = value.value
+        data[key] = value
+    return data
+
+
+def _column_values(data: Dict[str, Any]) -> Dict[str, Any]:
+    values = dict(data)
+    values["id"] = uuid.UUID(values["id"])
+    values["role"] = UserRole(values["role"])
+    for key in ("created_at", "updated_at"):
+        if values.get(key):
+            values[key] = datetime.fromisoformat(values[key])
+    return values
+
+
+class LocalUserCache:
+    """Per-worker LRU of user snapshots with a short TTL."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return data
+
+    def put(self, user_id: str, data: Dict[str, Any]):
+        current = self._entries.get(user_id)
+        if current is not None and (current[1].get("updated_at") or "") > (data.get("updated_at") or ""):
+            return
+        self._entries[user_id] = (time.monotonic() + self.ttl, data)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.USER_CACHE_ENABLED,
+            "entries": len(self._entries),
+            "local_hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+        }
+
+
+local_users = LocalUserCache(settings.USER_CACHE_LOCAL_SIZE, settings.USER_CACHE_LOCAL_TTL)
+
+
+async def _attach(db: AsyncSession, data: Dict[str, Any]) -> User:
+    """Session-bound User built from a snapshot, without a query."""
+    user = User(**_column_values(data))
+    # Mark the attributes as loaded (no pending changes), which merge(load=False) requires
+    make_transient_to_detached(user)
+    return await db.merge(user, load=False)
+
+
+async def load_user(db: AsyncSession, user_id: uuid.UUID) -> Optional[User]:
+    """The user with this id: from the local LRU, then Redis, then the database."""
+    if not settings.USER_CACHE_ENABLED:
+        result = await db.execute(select(User).where(User.id == user_id))
+        return result.scalar_one_or_none()
+
+    key = str(user_id)
+    data = local_users.get(key)
+    if data is not None:
+        local_users.hits += 1
+        return await _attach(db, data)
+
+    raw = await cache.get(user_key(key))
+    if raw:
+        try:
+            data = json.loads(raw)
+        except json.JSONDecodeError:
+            data = None
+        if data is not None:
+            local_users.redis_hits += 1
+            local_users.put(key, data)
+            return await _attach(db, data)
+
+    local_users.misses += 1
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
+    if user is not None:
+        await store_user(user)
+    return user
+
+
+async def store_user(user: User):
+    """
+    Write a user's committed state into the cache.
+
+    Call after commit (and refresh, so updated_at is current) whenever a
+    user's columns change.
+    """
+    if not settings.USER_CACHE_ENABLED:
+        return
+    data = snapshot(user)
+    key = str(user.id)
+    local_users.put(key, data)
+    await cache.set_many_if_newer(
+        {user_key(key): (json.dumps(data), data["updated_at"])},
+        ttl=settings.USER_CACHE_TTL,
+    )
+
+
+
+async def revoke_tokens(user: User):
+    """
+    Reject claims-mode access tokens issued before the user's current version.
+
+    Call after a security-relevant change (password change, deactivation) has
+    been committed and refreshed. The entry only has to outlive the tokens.
+    """
+    await cache.set(
+        revocation_key(user.id),
+        str(user_version(user)),
+        ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    )
+
+
+async def tokens_revoked(user_id, version: int) -> bool:
+    """Whether a token carrying this user version has been revoked."""
+    floor = await cache.get(revocation_key(user_id))
+    return floor is not None and int(version) < int(floor)
@@ -0,0 +1,243 @@
+"""
+Stripe webhook inbox: acknowledge fast, apply in batches.
+
+The webhook endpoint verifies the signature, inserts the event into
+stripe_events and answers. The event id is the primary key, so Stripe's
+redeliveries (and retry storms) cost one conflicting insert each and never
+apply twice.
+
+webhook_inbox_runner() drains the inbox: it claims up to WEBHOOK_BATCH_SIZE
+pending events (FOR UPDATE SKIP LOCKED, so several consumers can run), loads
+the payments and bookings they refer to in two queries, applies the events in
+Stripe's order and marks them processed in the same transaction, together
+with outbox messages invalidating the affected spots (app/outbox.py). A batch
+that fails is retried event by event, so one bad event doesn't hold up the
+rest; an event is given up on after WEBHOOK_MAX_ATTEMPTS.
+
+A worker that stores an event wakes its own consumer right away; a consumer
+running elsewhere (run_background_tasks.py) picks events up within
+WEBHOOK_POLL_INTERVAL.
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.outbox import emit
+from app.models.booking import Booking, BookingStatus
+from app.models.payment import Payment, PaymentStatus, StripeEvent
+from app.models.user import User  # noqa: F401  (resolves the Booking/Payment mappers)
+from app.models.review import Review  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+# Events the consumer acts on; anything else is acknowledged and dropped
+HANDLED_EVENTS = ("payment_intent.succeeded", "payment_intent.payment_failed")
+
+# How often processed events past WEBHOOK_RETENTION_DAYS are deleted
+PURGE_INTERVAL = 3600
+
+_wakeup = asyncio.Event()
+
+
+def _insert(db: AsyncSession):
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(StripeEvent)
+
+
+async def enqueue_event(db: AsyncSession, event: Dict[str, Any]) -> bool:
+    """Store a verified event unless it is already in the inbox. Returns whether it was new."""
+    obj = event.get("data", {}).get("object", {})
+    statement = _insert(db).values(
+        id=event["id"],
+        type=event["type"],
+        object_id=obj.get("id"),
+        payload=json.dumps(obj),
+        stripe_created=int(event.get("created") or 0),
+        received_at=datetime.now(timezone.utc),
+    ).on_conflict_do_nothing(index_elements=["id"])
+    result = await db.execute(statement)
+    await db.commit()
+    _wakeup.set()
+    return result.rowcount == 1
+
+
+def _apply_intent_event(event: StripeEvent, payment, booking) -> bool:
+    """Apply one payment intent event. Returns whether the booking changed."""
+    intent = json.loads(event.payload)
+    if event.type == "payment_intent.succeeded":
+        if payment and payment.status in (PaymentStatus.PENDING, PaymentStatus.PROCESSING, PaymentStatus.FAILED):
+            payment.status = PaymentStatus.SUCCEEDED
+            payment.stripe_charge_id = intent.get("latest_charge") or payment.stripe_charge_id
+        if booking and booking.status == BookingStatus.PENDING:
+            booking.status = BookingStatus.CONFIRMED
+            booking.payment_status = "paid"
+            return True
+    elif event.type == "payment_intent.payment_failed":
+        # A failure reported after the success (events can arrive out of order) changes nothing
+        if payment and payment.status in (PaymentStatus.PENDING, PaymentStatus.PROCESSING):
+            payment.status = PaymentStatus.FAILED
+        if booking and booking.status == BookingStatus.PENDING:
+            booking.payment_status = "failed"
+    return False
+
+
+async def _apply(db: AsyncSession, events: List[StripeEvent]):
+    """Apply events to payments and bookings, queueing invalidation of the spots that changed."""
+    intent_ids = {event.object_id for event in events if event.object_id}
+    payments, bookings = {}, {}
+    if intent_ids:
+        result = await db.execute(select(Payment).where(Payment.stripe_payment_intent_id.in_(intent_ids)))
+        payments = {p.stripe_payment_intent_id: p for p in result.scalars()}
+        result = await db.execute(
+            select(Booking).where(Booking.archived == False, Booking.payment_intent_id.in_(intent_ids))
+        )
+        bookings = {b.payment_intent_id: b for b in result.scalars()}
+
+    spot_ids = set()
+    now = datetime.now(timezone.utc)
+    for event in events:
+        booking = bookings.get(event.object_id)
+        if _apply_intent_event(event, payments.get(event.object_id), booking):
+            spot_ids.add(booking.parking_spot_id)
+        event.processed_at = now
+        event.attempts += 1
+    for spot_id in spot_ids:
+        emit(db, "spot.invalidate", spot_id=spot_id)
+
+
+class WebhookConsumer:
+    """Applies pending inbox events in batches."""
+
+    def __init__(self):
+        self.processed = 0
+        self.batches = 0
+        self.failed_events = 0
+        self.last_batch_size = 0
+        self.last_batch_ms = 0.0
+        self._last_purge = 0.0
+
+    async def _record_failure(self, db: AsyncSession, event_ids: Iterable[str], error: Exception):
+        await db.execute(
+            update(StripeEvent)
+            .where(StripeEvent.id.in_(list(event_ids)))
+            .values(attempts=StripeEvent.attempts + 1, last_error=str(error)[:1000])
+        )
+        await db.commit()
+
+    async def _apply_one_by_one(self, db: AsyncSession, event_ids: List[str]):
+        for event_id in event_ids:
+            event = await db.get(StripeEvent, event_id, with_for_update={"skip_locked": True})
+            if event is None or event.processed_at is not None:
+                continue
+            try:
+                await _apply(db, [event])
+                await db.commit()
+                self.processed += 1
+            except Exception as e:
+                await db.rollback()
+                self.failed_events += 1
+                logger.error(f"Stripe event {event_id} failed: {e}")
+                await self._record_failure(db, [event_id], e)
+
+    async def process_batch(self) -> int:
+        """Apply one batch of pending events. Returns how many were claimed."""
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(StripeEvent)
+                .where(
+                    StripeEvent.processed_at.is_(None),
+                    StripeEvent.attempts < settings.WEBHOOK_MAX_ATTEMPTS
+                )
+                .order_by(StripeEvent.received_at)
+                .limit(settings.WEBHOOK_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            events = sorted(result.scalars().all(), key=lambda e: (e.stripe_created, e.received_at))
+            if not events:
+                return 0
+            event_ids = [event.id for event in events]
+
+            try:
+                await _apply(db, events)
+                await db.commit()
+                self.processed += len(events)
+            except Exception as e:
+                await db.rollback()
+                logger.warning(f"Stripe event batch failed ({e}), retrying events one by one")
+                await self._apply_one_by_one(db, event_ids)
+
+        self.batches += 1
+        self.last_batch_size = len(event_ids)
+        self.last_batch_ms = (time.perf_counter() - started) * 1000
+        return len(event_ids)
+
+    async def purge_processed(self) -> int:
+        """Delete processed events older than WEBHOOK_RETENTION_DAYS."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=settings.WEBHOOK_RETENTION_DAYS)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(StripeEvent).where(
+                    StripeEvent.processed_at.is_not(None),
+                    StripeEvent.processed_at < cutoff
+                )
+            )
+            await db.commit()
+        self._last_purge = time.monotonic()
+        return result.rowcount
+
+    def purge_due(self) -> bool:
+        return time.monotonic() - self._last_purge >= PURGE_INTERVAL
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "processed": self.processed,
+            "batches": self.batches,
+            "failed_events": self.failed_events,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_ms": round(self.last_batch_ms, 1),
+        }
+
+
+webhook_consumer = WebhookConsumer()
+
+
+async def webhook_inbox_runner():
+    """Drain the webhook inbox continuously."""
+    logger.info("Starting webhook inbox consumer...")
+
+    while True:
+        try:
+            # Cleared before the batch, so an event stored meanwhile isn't missed
+            _wakeup.clear()
+            claimed = await webhook_consumer.process_batch()
+            if claimed >= settings.WEBHOOK_BATCH_SIZE:
+                # Backlog: go straight on to the next batch
+                continue
+
+            if webhook_consumer.purge_due():
+                purged = await webhook_consumer.purge_processed()
+                if purged:
+                    logger.info(f"Purged {purged} processed Stripe events")
+
+            try:
+                await asyncio.wait_for(_wakeup.wait(), settings.WEBHOOK_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in webhook inbox consumer: {e}")
+            await asyncio.sleep(settings.WEBHOOK_POLL_INTERVAL)
@@ -0,0 +1,151 @@
+"""
+Benchmark auth dependency latency
+─────────────────────────────────
+Times an authenticated no-op route in-process (httpx against a small ASGI
+app) with each way of resolving the caller:
+
+  • subject token, users table lookup     (USER_CACHE_ENABLED=false)
+  • subject token, user snapshot cache    (get_current_user)
+  • claims token, claims only             (get_token_claims, AUTH_TOKEN_CLAIMS)
+  • claims token, owner route             (get_owner_claims: role + revocation check)
+  • claims token, sensitive route         (get_current_user + revocation check)
+
+An unauthenticated route gives the baseline; the dependency cost is the
+difference. Needs the database (migrated) and Redis from .env.
+
+Usage:
+  python benchmark_auth.py [requests]
+"""
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import delete, event
+
+from app.api.deps import AuthClaims, get_current_user, get_owner_claims, get_token_claims
+from app.cache import cache
+from app.core.config import settings
+from app.core.security import create_user_access_token
+from app.db.session import AsyncSessionLocal, engine
+from app.models.user import User, UserRole
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+WARMUP = 50
+
+B="\033[1m"; G="\033[32m"; X="\033[0m"
+
+bench = FastAPI()
+
+
+@bench.get("/anonymous")
+async def anonymous():
+    return {"ok": True}
+
+
+@bench.get("/user")
+async def with_user(current_user: User = Depends(get_current_user)):
+    return {"id": str(current_user.id)}
+
+
+@bench.get("/claims")
+async def with_claims(current_user: AuthClaims = Depends(get_token_claims)):
+    return {"id": str(current_user.id)}
+
+
+@bench.get("/owner")
+async def with_owner(current_user: AuthClaims = Depends(get_owner_claims)):
+    return {"id": str(current_user.id)}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+async def create_user() -> User:
+    async with AsyncSessionLocal() as db:
+        user = User(
+            email=f"bench-auth-{uuid.uuid4().hex[:8]}@example.com",
+            full_name="Auth Benchmark",
+            role=UserRole.OWNER,
+            is_active=True,
+        )
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+        return user
+
+
+async def run(client, path, token, counter):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    for _ in range(WARMUP):
+        (await client.get(path, headers=headers)).raise_for_status()
+    counter.count = 0
+    timings = []
+    for _ in range(REQUESTS):
+        started = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        timings.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+    timings.sort()
+    return {
+        "mean": statistics.fmean(timings),
+        "p50": timings[len(timings) // 2],
+        "p95": timings[int(len(timings) * 0.95)],
+        "queries": counter.count / REQUESTS,
+    }
+
+
+def report(label, result, baseline=None):
+    overhead = f"  +{result['mean'] - baseline['mean']:.3f}ms" if baseline else ""
+    print(
+        f"  {label:<38} mean {result['mean']:7.3f}ms  p50 {result['p50']:7.3f}ms  "
+        f"p95 {result['p95']:7.3f}ms  {result['queries']:.2f} queries/req{overhead}"
+    )
+
+
+async def main():
+    await cache.connect()
+    user = await create_user()
+    counter = QueryCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+
+    transport = httpx.ASGITransport(app=bench)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print(f"\n{B}Auth dependency latency, {REQUESTS:,} sequential requests{X}")
+            baseline = await run(client, "/anonymous", None, counter)
+            report("no auth (baseline)", baseline)
+
+            settings.AUTH_TOKEN_CLAIMS = False
+            subject_token = create_user_access_token(user)
+            settings.USER_CACHE_ENABLED = False
+            report("subject token, users table", await run(client, "/user", subject_token, counter), baseline)
+            settings.USER_CACHE_ENABLED = True
+            report("subject token, user cache", await run(client, "/user", subject_token, counter), baseline)
+
+            settings.AUTH_TOKEN_CLAIMS = True
+            claims_token = create_user_access_token(user)
+            report("claims token, claims only", await run(client, "/claims", claims_token, counter), baseline)
+            report("claims token, owner route", await run(client, "/owner", claims_token, counter), baseline)
+            report("claims token, sensitive route", await run(client, "/user", claims_token, counter), baseline)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", counter)
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(User).where(User.id == user.id))
+            await db.commit()
+        await cache.delete(f"user:{user.id}")
+        await cache.disconnect()
+        await engine.dispose()
+    print(f"\n{G}Done{X}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+Benchmark the raw asyncpg fast path against the ORM path
+─────────────────────────────────────────────────────────
+Runs the spot listing query (100-row pages) and the spot detail lookup
+through both implementations against the configured PostgreSQL database
+and reports rows/sec for each.
+
+Usage:
+  python benchmark_fastpath.py [iterations]
+"""
+import asyncio
+import sys
+import time
+
+from sqlalchemy import select
+
+from app.db.session import AsyncSessionLocal, engine
+from app.db.fastpath import fetch_spot_listing_rows, fetch_spot_detail
+from app.models.parking_spot import ParkingSpot
+from app.models.user import User  # Import User to resolve SQLAlchemy mapper relationships
+from app.models.review import Review  # Import Review to resolve all relationships
+from app.api.v1.endpoints.parking_spots import _fetch_spot_rows_orm
+
+PAGE_SIZE = 100
+LISTING_FILTERS = dict(
+    q=None, city=None, spot_type=None, vehicle_size=None, max_hourly_rate=None,
+    has_ev_charging=None, is_covered=None, start_time=None, end_time=None,
+    offset=0, limit=PAGE_SIZE
+)
+
+B="\033[1m"; G="\033[32m"; X="\033[0m"
+
+
+async def _time_it(label, iterations, run):
+    rows = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        rows += await run()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<22} {rows:>8} rows  {elapsed * 1000:>8.1f}ms  {rows / elapsed:>10.0f} rows/s")
+    return rows / elapsed
+
+
+async def main(iterations: int):
+    async with AsyncSessionLocal() as db:
+        if engine.dialect.name != "postgresql" or engine.dialect.driver != "asyncpg":
+            print("The fast path needs PostgreSQL + asyncpg (check DATABASE_URL)")
+            return
+
+        spot_ids = (await db.execute(select(ParkingSpot.id).limit(PAGE_SIZE))).scalars().all()
+        if not spot_ids:
+            print("No parking spots found - seed the database first (populate_db.py)")
+            return
+
+        async def orm_listing():
+            db.expunge_all()  # don't let the identity map from a previous run hide ORM cost
+            return len(await _fetch_spot_rows_orm(db, **LISTING_FILTERS))
+
+        async def raw_listing():
+            return len(await fetch_spot_listing_rows(db, **LISTING_FILTERS))
+
+        async def orm_detail():
+            db.expunge_all()
+            for spot_id in spot_ids:
+                (await db.execute(select(ParkingSpot).where(ParkingSpot.id == spot_id))).scalar_one()
+            return len(spot_ids)
+
+        async def raw_detail():
+            for spot_id in spot_ids:
+                await fetch_spot_detail(db, spot_id)
+            return len(spot_ids)
+
+        # Warm up connection, statement caches and compiled SQL
+        for run in (orm_listing, raw_listing, orm_detail, raw_detail):
+            await run()
+
+        print(f"{B}Spot listing ({PAGE_SIZE}-row pages, {iterations} iterations){X}")
+        orm = await _time_it("ORM", iterations, orm_listing)
+        raw = await _time_it("asyncpg fast path", iterations, raw_listing)
+        print(f"  {G}speedup x{raw / orm:.2f}{X}\n")
+
+        print(f"{B}Spot detail ({len(spot_ids)} lookups, {iterations} iterations){X}")
+        orm = await _time_it("ORM", iterations, orm_detail)
+        raw = await _time_it("asyncpg fast path", iterations, raw_detail)
+        print(f"  {G}speedup x{raw / orm:.2f}{X}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
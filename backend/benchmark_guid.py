@@ -0,0 +1,101 @@
+"""
+Benchmark GUID result-row conversion
+────────────────────────────────────
+Compares the previous GUID TypeDecorator (generic per-value hooks) with the
+dialect-specialized one at 100k rows:
+
+  • PostgreSQL (asyncpg dialect): result processing applied to 100k
+    uuid.UUID values as the driver returns them; no server needed
+  • SQLite: SELECT of 100k ids through SQLAlchemy, CHAR(36) text storage vs
+    the 16-byte BLOB option (SQLITE_UUID_STORAGE=blob)
+
+Usage:
+  python benchmark_guid.py [rows]
+"""
+import sys
+import time
+import uuid as uuid_pkg
+
+from sqlalchemy import Column, MetaData, String, Table, TypeDecorator, create_engine, select
+from sqlalchemy.dialects.postgresql.asyncpg import PGDialect_asyncpg
+
+from app.core.config import settings
+from app.db.types import GUID
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+B="\033[1m"; G="\033[32m"; X="\033[0m"
+
+
+class LegacyGUID(TypeDecorator):
+    """GUID as it was before the dialect-specialized processors."""
+    impl = String
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+            return dialect.type_descriptor(PG_UUID(as_uuid=True))
+        return dialect.type_descriptor(String(36))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == 'postgresql':
+            return value
+        return str(value) if isinstance(value, uuid_pkg.UUID) else str(uuid_pkg.UUID(value))
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, uuid_pkg.UUID):
+            return value
+        return uuid_pkg.UUID(value)
+
+
+def _report(label, seconds):
+    print(f"  {label:<34} {seconds * 1000:>8.1f}ms  {ROWS / seconds:>12,.0f} rows/s")
+
+
+def bench_postgres_processors(values):
+    dialect = PGDialect_asyncpg()
+    for label, type_ in (("legacy TypeDecorator", LegacyGUID()), ("specialized GUID", GUID())):
+        processor = type_.dialect_impl(dialect).result_processor(dialect, None)
+        started = time.perf_counter()
+        if processor is not None:
+            for value in values:
+                processor(value)
+        else:
+            for value in values:
+                pass
+        _report(label + (" (no processor)" if processor is None else ""), time.perf_counter() - started)
+
+
+def bench_sqlite(values, type_, storage):
+    settings.SQLITE_UUID_STORAGE = storage
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    table = Table("ids", metadata, Column("id", type_, primary_key=True))
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [{"id": v} for v in values])
+        started = time.perf_counter()
+        rows = conn.execute(select(table.c.id)).scalars().all()
+        elapsed = time.perf_counter() - started
+    assert len(rows) == len(values) and isinstance(rows[0], uuid_pkg.UUID)
+    engine.dispose()
+    return elapsed
+
+
+def main():
+    values = [uuid_pkg.uuid4() for _ in range(ROWS)]
+    print(f"\n{B}GUID result conversion, {ROWS:,} rows{X}")
+
+    print(f"\n{B}PostgreSQL (asyncpg) result processors{X}")
+    bench_postgres_processors(values)
+
+    print(f"\n{B}SQLite SELECT{X}")
+    _report("legacy TypeDecorator, CHAR(36)", bench_sqlite(values, LegacyGUID(), "text"))
+    _report("specialized GUID, CHAR(36)", bench_sqlite(values, GUID(), "text"))
+    _report("specialized GUID, 16-byte BLOB", bench_sqlite(values, GUID(), "blob"))
+    print(f"\n{G}Done{X}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark the Stripe webhook inbox
+──────────────────────────────────
+Replays a retry storm against the webhook endpoint in-process (httpx against
+the payments router): EVENTS distinct signed events, each delivered
+DELIVERIES times, CONCURRENCY at a time. Reports the acknowledgement latency
+and rate, then drains the inbox with the batch consumer and reports how fast
+events are applied.
+
+Needs the database (migrated to head). Redis is optional.
+
+Usage:
+  python benchmark_webhooks.py [events] [deliveries] [concurrency]
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import delete, func, select
+
+from app.api.v1.endpoints import payments
+from app.cache import cache
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, engine
+from app.models.payment import StripeEvent
+from app.webhooks import webhook_consumer
+
+EVENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+DELIVERIES = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+CONCURRENCY = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+SECRET = "whsec_benchmark"
+PREFIX = "evt_bench_"
+
+B="\033[1m"; G="\033[32m"; X="\033[0m"
+
+bench = FastAPI()
+bench.include_router(payments.router, prefix="/payments")
+
+
+def signed(event: dict):
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(SECRET.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return payload, {"stripe-signature": f"t={timestamp},v1={signature}", "content-type": "application/json"}
+
+
+def make_event(index: int) -> dict:
+    return {
+        "id": f"{PREFIX}{uuid.uuid4().hex[:16]}",
+        "type": "payment_intent.succeeded" if index % 10 else "payment_intent.payment_failed",
+        "created": int(time.time()),
+        "data": {"object": {"id": f"pi_bench_{index}", "object": "payment_intent", "latest_charge": f"ch_bench_{index}"}},
+    }
+
+
+async def deliver_all(client, deliveries):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    timings = []
+
+    async def deliver(payload, headers):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/payments/webhook", content=payload, headers=headers)
+            timings.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(deliver(payload, headers) for payload, headers in deliveries))
+    return timings, time.perf_counter() - started
+
+
+async def main():
+    settings.STRIPE_WEBHOOK_SECRET = SECRET
+    await cache.connect()
+
+    events = [make_event(i) for i in range(EVENTS)]
+    # Each event delivered DELIVERIES times, redeliveries interleaved like a retry storm
+    deliveries = [signed(event) for _ in range(DELIVERIES) for event in events]
+
+    try:
+        transport = httpx.ASGITransport(app=bench)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print(f"\n{B}Webhook acknowledgement: {len(deliveries):,} deliveries of {EVENTS:,} events, {CONCURRENCY} concurrent{X}")
+            timings, elapsed = await deliver_all(client, deliveries)
+            timings.sort()
+            print(f"  mean {statistics.fmean(timings):.2f}ms  p50 {timings[len(timings) // 2]:.2f}ms  "
+                  f"p95 {timings[int(len(timings) * 0.95)]:.2f}ms  p99 {timings[int(len(timings) * 0.99)]:.2f}ms")
+            print(f"  {len(deliveries) / elapsed:,.0f} deliveries/s")
+
+        async with AsyncSessionLocal() as db:
+            stored = (await db.execute(
+                select(func.count()).select_from(StripeEvent).where(StripeEvent.id.like(f"{PREFIX}%"))
+            )).scalar()
+        print(f"  {stored:,} events stored (duplicates dropped: {len(deliveries) - stored:,})")
+
+        print(f"\n{B}Batch consumer (WEBHOOK_BATCH_SIZE={settings.WEBHOOK_BATCH_SIZE}){X}")
+        started = time.perf_counter()
+        applied = 0
+        while True:
+            claimed = await webhook_consumer.process_batch()
+            if not claimed:
+                break
+            applied += claimed
+        elapsed = time.perf_counter() - started
+        print(f"  {applied:,} events applied in {elapsed:.2f}s, {applied / elapsed if elapsed else 0:,.0f} events/s")
+        print(f"  {webhook_consumer.stats()}")
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(StripeEvent).where(StripeEvent.id.like(f"{PREFIX}%")))
+            await db.commit()
+        await cache.disconnect()
+        await engine.dispose()
+    print(f"\n{G}Done{X}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+"""
+Query plan check for the hot queries
+────────────────────────────────────
+Runs EXPLAIN for each hot query against the configured PostgreSQL database
+(seeded with populate_db.py / seed_zakynthos.sql and migrated with
+`alembic upgrade head`) and fails if any of them would read one of the big
+tables with a sequential scan. The statements are the ones the endpoints and
+background sweeps execute, built by the same functions, so the check can't
+drift from the code.
+
+A freshly seeded database is small enough that the planner may pick a seq
+scan even with a perfect index, so sequential scans are disabled for the
+check: if the plan still contains one, no index can serve the query.
+
+Usage:
+  python check_query_plans.py        # exit code 1 if any query seq-scans
+"""
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, text
+
+from app.db.session import engine
+from app.models.booking import BookingStatus
+from app.models.payment import Payout, PayoutStatus
+from app.api.v1.endpoints import bookings, parking_spots, payments, reviews
+from app import background_tasks
+
+# Tables that grow with usage; small lookup tables may be scanned freely
+CHECKED_TABLES = {"bookings", "reviews", "payments", "payouts", "parking_spots", "availability_slots"}
+
+
+def hot_queries(p: dict) -> dict:
+    """The statements the endpoints and background sweeps actually run, built by their own code."""
+    return {
+        "booking conflict check (POST /bookings)":
+            bookings.conflicting_bookings_query(p["spot_id"], p["start"], p["end"]),
+        "my bookings (GET /bookings)":
+            bookings.user_bookings_query(p["user_id"]),
+        "my bookings by status (GET /bookings?status_filter=)":
+            bookings.user_bookings_query(p["user_id"], BookingStatus.CONFIRMED),
+        "owner spot ids (GET /bookings/owner)":
+            bookings.owner_spot_ids_query(p["owner_id"]),
+        "owner bookings (GET /bookings/owner)":
+            bookings.spot_bookings_query([p["spot_id"]]),
+        "auto-checkout sweep":
+            background_tasks.expired_bookings_query(p["now"]),
+        "auto-start sweep":
+            background_tasks.starting_bookings_query(p["now"]),
+        "booking by payment intent (POST /payments/confirm)":
+            payments.booking_by_intent_query(p["intent_id"]),
+        "payment by intent (POST /payments/confirm)":
+            payments.payment_by_intent_query(p["intent_id"]),
+        "my payments (GET /payments/my-payments)":
+            payments.user_payments_query(p["user_id"]),
+        "my payouts (GET /payments/owner/payouts)":
+            payments.owner_payouts_query(p["owner_id"]),
+        "payout summary (GET /payments/owner/summary)":
+            payments.payout_aggregate_query(
+                func.sum(Payout.amount), p["owner_id"], PayoutStatus.PAID, since=p["month_start"]
+            ),
+        "spot reviews (GET /reviews/spot/{id})":
+            reviews.spot_reviews_query(p["spot_id"], 0, 20),
+        "spot rating (POST /reviews)":
+            reviews.spot_rating_query(p["spot_id"]),
+        "review for booking (POST /reviews)":
+            reviews.booking_review_query(p["booking_id"]),
+        "my spots (GET /parking-spots/my-spots)":
+            parking_spots.owner_spots_query(p["owner_id"]),
+        "availability slots (GET /parking-spots/{id}/availability)":
+            parking_spots.availability_slots_query(p["spot_id"]),
+    }
+
+B="\033[1m"; G="\033[32m"; R="\033[31m"; X="\033[0m"
+
+
+def _checked(relation: str) -> bool:
+    # Partitions of bookings are named bookings_2026_10, bookings_archive_2026_10, ...
+    return any(relation == table or relation.startswith(f"{table}_") for table in CHECKED_TABLES)
+
+
+def _seq_scans(plan: dict):
+    """Yield the relations a plan tree reads with a sequential scan."""
+    if plan.get("Node Type") == "Seq Scan" and _checked(plan.get("Relation Name", "")):
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from _seq_scans(child)
+
+
+async def _sample_params(conn) -> dict:
+    """Pick real ids from the seeded data so the plans use realistic values."""
+    spot = (await conn.execute(text("SELECT id, owner_id FROM parking_spots LIMIT 1"))).first()
+    booking = (await conn.execute(text("SELECT id, user_id FROM bookings LIMIT 1"))).first()
+    if spot is None or booking is None:
+        raise SystemExit("Seed the database first (populate_db.py or seed_zakynthos.sql)")
+    now = datetime.now(timezone.utc)
+    return {
+        "spot_id": spot.id,
+        "owner_id": spot.owner_id,
+        "user_id": booking.user_id,
+        "booking_id": booking.id,
+        "intent_id": "pi_check_query_plans",
+        "now": now,
+        "start": now,
+        "end": now + timedelta(hours=2),
+        "month_start": now.replace(day=1, hour=0, minute=0, second=0, microsecond=0),
+    }
+
+
+async def main() -> int:
+    if engine.dialect.name != "postgresql":
+        print("check_query_plans.py needs a PostgreSQL DATABASE_URL")
+        return 1
+
+    failures = 0
+    async with engine.connect() as conn:
+        params = await _sample_params(conn)
+        await conn.execute(text("SET LOCAL enable_seqscan = off"))
+
+        print(f"\n{B}Hot query plans{X}")
+        for label, statement in hot_queries(params).items():
+            # Parameters are rendered inline so EXPLAIN sees the values the plan is for
+            sql = statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+            raw = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+            plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+            scanned = sorted(set(_seq_scans(plan)))
+            if scanned:
+                failures += 1
+                print(f"  {R}✗{X} {label:<58} seq scan on {', '.join(scanned)}")
+            else:
+                print(f"  {G}✓{X} {label}")
+
+        await conn.rollback()
+
+    await engine.dispose()
+    print()
+    if failures:
+        print(f"{R}{failures} hot queries fall back to a sequential scan{X}")
+        return 1
+    print(f"{G}All hot queries are index-backed{X}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,252 @@
+"""
+Local fake Stripe API
+─────────────────────
+An in-memory stand-in for the parts of Stripe's REST API the payments routes
+use, for tests and load runs without touching Stripe:
+
+  • customers, payment intents (create / retrieve / confirm), payment
+    methods, refunds, Connect accounts and account links
+  • Idempotency-Key replays return the original response
+  • fault injection: added latency, a random error rate, or the next N
+    requests failing with 500 or hanging
+
+Point the API at it with STRIPE_API_BASE=http://127.0.0.1:12111 (any
+STRIPE_SECRET_KEY works). Faults can be changed while it runs:
+
+  curl -X POST localhost:12111/_fake/config -H 'content-type: application/json' \\
+       -d '{"fail_next": 5}'
+  curl localhost:12111/_fake/stats
+
+Usage:
+  python fake_stripe.py [--port 12111] [--latency-ms 0] [--error-rate 0] [--auto-confirm]
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+DEFAULT_PORT = 12111
+
+# How long a "hang" lasts: longer than any sane client timeout
+HANG_SECONDS = 60
+
+
+class Faults:
+    def __init__(self, latency_ms: float = 0, error_rate: float = 0, auto_confirm: bool = False):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.auto_confirm = auto_confirm
+        self.fail_next = 0
+        self.hang_next = 0
+
+
+def _unflatten(pairs) -> Dict[str, Any]:
+    """Stripe form encoding back to nested dicts: metadata[user_id]=1 -> {"metadata": {"user_id": "1"}}."""
+    result: Dict[str, Any] = {}
+    for key, value in pairs:
+        parts = key.replace("]", "").split("[")
+        node = result
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = {"true": True, "false": False}.get(value, value)
+    return result
+
+
+def _error(status: int, message: str, error_type: str = "invalid_request_error", code: Optional[str] = None):
+    body = {"error": {"type": error_type, "message": message}}
+    if code:
+        body["error"]["code"] = code
+    return JSONResponse(body, status_code=status)
+
+
+def _missing(kind: str, object_id: str):
+    return _error(404, f"No such {kind}: '{object_id}'", code="resource_missing")
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+def create_app(faults: Optional[Faults] = None) -> FastAPI:
+    faults = faults or Faults()
+    app = FastAPI(title="Fake Stripe")
+    objects: Dict[str, Dict[str, Dict[str, Any]]] = {
+        "customer": {}, "payment_intent": {}, "refund": {}, "account": {},
+    }
+    replays: Dict[str, Response] = {}
+    stats = {"requests": 0, "injected_failures": 0, "injected_hangs": 0, "idempotent_replays": 0}
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        if request.url.path.startswith("/_fake"):
+            return await call_next(request)
+        stats["requests"] += 1
+        if faults.latency_ms:
+            await asyncio.sleep(faults.latency_ms / 1000)
+        if faults.hang_next > 0:
+            faults.hang_next -= 1
+            stats["injected_hangs"] += 1
+            await asyncio.sleep(HANG_SECONDS)
+        if faults.fail_next > 0 or random.random() < faults.error_rate:
+            faults.fail_next = max(0, faults.fail_next - 1)
+            stats["injected_failures"] += 1
+            return _error(500, "Injected failure", error_type="api_error")
+
+        key = request.headers.get("idempotency-key")
+        if key and key in replays:
+            stats["idempotent_replays"] += 1
+            return replays[key]
+        response = await call_next(request)
+        if key and request.method == "POST":
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            response = Response(body, status_code=response.status_code, media_type="application/json")
+            replays[key] = response
+        return response
+
+    async def form(request: Request) -> Dict[str, Any]:
+        return _unflatten(parse_qsl((await request.body()).decode(), keep_blank_values=True))
+
+    @app.post("/_fake/config")
+    async def configure(request: Request):
+        for key, value in (await request.json()).items():
+            if hasattr(faults, key):
+                setattr(faults, key, value)
+        return vars(faults)
+
+    @app.get("/_fake/stats")
+    async def fake_stats():
+        return {**stats, **{f"{kind}s": len(items) for kind, items in objects.items()}, "faults": vars(faults)}
+
+    @app.post("/v1/customers")
+    async def create_customer(request: Request):
+        params = await form(request)
+        customer = {
+            "id": _new_id("cus"), "object": "customer", "created": int(time.time()),
+            "email": params.get("email"), "name": params.get("name"),
+            "metadata": params.get("metadata", {}),
+        }
+        objects["customer"][customer["id"]] = customer
+        return customer
+
+    def _succeed(intent: Dict[str, Any], payment_method: Optional[str] = None):
+        intent["status"] = "succeeded"
+        intent["payment_method"] = payment_method or intent.get("payment_method") or "pm_card_visa"
+        intent["latest_charge"] = _new_id("ch")
+        intent["amount_received"] = intent["amount"]
+
+    @app.post("/v1/payment_intents")
+    async def create_payment_intent(request: Request):
+        params = await form(request)
+        try:
+            amount = int(params["amount"])
+        except (KeyError, ValueError):
+            return _error(400, "Missing required param: amount.")
+        customer = params.get("customer")
+        if customer and customer not in objects["customer"]:
+            return _missing("customer", customer)
+        intent_id = _new_id("pi")
+        intent = {
+            "id": intent_id, "object": "payment_intent", "created": int(time.time()),
+            "amount": amount, "amount_received": 0, "currency": params.get("currency", "usd"),
+            "customer": customer, "metadata": params.get("metadata", {}),
+            "client_secret": f"{intent_id}_secret_{uuid.uuid4().hex[:16]}",
+            "status": "requires_payment_method", "payment_method": None, "latest_charge": None,
+            "refunded": 0,
+        }
+        if faults.auto_confirm:
+            _succeed(intent)
+        objects["payment_intent"][intent_id] = intent
+        return intent
+
+    @app.get("/v1/payment_intents/{intent_id}")
+    async def retrieve_payment_intent(intent_id: str):
+        intent = objects["payment_intent"].get(intent_id)
+        return intent if intent else _missing("payment_intent", intent_id)
+
+    @app.post("/v1/payment_intents/{intent_id}/confirm")
+    async def confirm_payment_intent(intent_id: str, request: Request):
+        intent = objects["payment_intent"].get(intent_id)
+        if not intent:
+            return _missing("payment_intent", intent_id)
+        payment_method = (await form(request)).get("payment_method")
+        if payment_method == "pm_card_chargeDeclined":
+            intent["status"] = "requires_payment_method"
+            return _error(402, "Your card was declined.", error_type="card_error", code="card_declined")
+        _succeed(intent, payment_method)
+        return intent
+
+    @app.get("/v1/payment_methods/{method_id}")
+    async def retrieve_payment_method(method_id: str):
+        return {
+            "id": method_id, "object": "payment_method", "type": "card",
+            "card": {"brand": "visa", "last4": "4242", "exp_month": 12, "exp_year": 2030},
+        }
+
+    @app.post("/v1/refunds")
+    async def create_refund(request: Request):
+        params = await form(request)
+        intent = objects["payment_intent"].get(params.get("payment_intent", ""))
+        if not intent:
+            return _missing("payment_intent", params.get("payment_intent", ""))
+        if intent["status"] != "succeeded":
+            return _error(400, "This PaymentIntent does not have a successful charge to refund.")
+        remaining = intent["amount"] - intent["refunded"]
+        amount = int(params.get("amount", remaining))
+        if amount > remaining:
+            return _error(400, f"Refund amount ({amount}) is greater than unrefunded amount ({remaining}).")
+        intent["refunded"] += amount
+        refund = {
+            "id": _new_id("re"), "object": "refund", "amount": amount, "status": "succeeded",
+            "payment_intent": intent["id"], "reason": params.get("reason"),
+        }
+        objects["refund"][refund["id"]] = refund
+        return refund
+
+    @app.post("/v1/accounts")
+    async def create_account(request: Request):
+        params = await form(request)
+        account = {
+            "id": _new_id("acct"), "object": "account", "type": params.get("type", "express"),
+            "country": params.get("country"), "email": params.get("email"),
+            "metadata": params.get("metadata", {}),
+        }
+        objects["account"][account["id"]] = account
+        return account
+
+    @app.post("/v1/account_links")
+    async def create_account_link(request: Request):
+        params = await form(request)
+        if params.get("account") not in objects["account"]:
+            return _missing("account", params.get("account", ""))
+        return {
+            "object": "account_link", "created": int(time.time()),
+            "expires_at": int(time.time()) + 300,
+            "url": f"https://connect.stripe.test/setup/e/{params['account']}/{uuid.uuid4().hex[:12]}",
+        }
+
+    return app
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run an in-memory fake of the Stripe API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=0, help="added to every request")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests answered with 500")
+    parser.add_argument("--auto-confirm", action="store_true", help="payment intents are created already succeeded")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    args = parse_args()
+    faults = Faults(args.latency_ms, args.error_rate, args.auto_confirm)
+    print(f"Fake Stripe on http://{args.host}:{args.port} (set STRIPE_API_BASE to use it)")
+    uvicorn.run(create_app(faults), host=args.host, port=args.port, log_level="warning")
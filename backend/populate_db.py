@@ -9,6 +9,7 @@ from app.models.booking import Booking, BookingStatus
 from app.models.payment import Payment, PaymentStatus
 from app.models.review import Review
 from app.core.security import get_password_hash
+from app.bloom import announce_new_spots
 
 async def populate_database():
     """Add sample data to database."""
@@ -487,6 +488,9 @@ async def populate_database():
         await session.commit()
         print(f"   ✓ Created 3 reviews")
         
+        # Running API workers' spot ID filters don't know these spots yet
+        await announce_new_spots()
+        
         print("\n" + "="*50)
         print("✅ Database population complete!")
         print("="*50)
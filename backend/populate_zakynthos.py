@@ -10,6 +10,7 @@ from app.models.booking import Booking  # Import all models to avoid circular is
 from app.models.payment import Payment
 from app.models.review import Review
 from app.core.security import get_password_hash
+from app.bloom import announce_new_spots
 
 async def populate_zakynthos():
     """Add Zakynthos parking spots to database."""
@@ -473,6 +474,9 @@ async def populate_zakynthos():
         
         print(f"\n   ✓ All {len(spots)} parking spots created successfully")
         
+        # Running API workers' spot ID filters don't know these spots yet
+        await announce_new_spots()
+        
         print("\n✅ Database populated successfully!")
         print(f"\n📍 Locations added:")
         print("   • Zakynthos Town (Πόλη Ζακύνθου)")
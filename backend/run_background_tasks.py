@@ -4,8 +4,12 @@ import signal
 import sys
 
 from app.db.session import AsyncSessionLocal
-from app.background_tasks import background_tasks_runner
+from app.background_tasks import background_tasks_runner, booking_maintenance_runner
+from app.cache_warmer import cache_warmer_runner
+from app.webhooks import webhook_inbox_runner
+from app.outbox import outbox_dispatcher_runner
 from app.cache import cache
+from app.core.config import settings
 
 # Global flag for graceful shutdown
 shutdown_event = asyncio.Event()
@@ -24,24 +28,38 @@ async def main():
     print("🔄 Starting background tasks worker...")
     print("   - Auto-checkout expired bookings")
     print("   - Auto-start confirmed bookings")
+    print("   - Booking partition maintenance and archival")
+    print("   - Stripe webhook inbox consumer")
+    print("   - Outbox dispatcher (cache invalidation, payouts)")
+    if settings.CACHE_WARM_ENABLED:
+        print("   - Cache warmer (hot searches and spots)")
     
     # Connect to Redis
     await cache.connect()
     
     try:
         # Run background tasks until shutdown signal
-        task = asyncio.create_task(background_tasks_runner())
+        tasks = [
+            asyncio.create_task(background_tasks_runner()),
+            asyncio.create_task(booking_maintenance_runner()),
+            asyncio.create_task(webhook_inbox_runner()),
+            asyncio.create_task(outbox_dispatcher_runner()),
+        ]
+        if settings.CACHE_WARM_ENABLED:
+            tasks.append(asyncio.create_task(cache_warmer_runner()))
         
         # Wait for shutdown signal
         await shutdown_event.wait()
         
-        # Cancel background task
+        # Cancel background tasks
         print("   Canceling background tasks...")
-        task.cancel()
-        try:
-            await task
-        except asyncio.CancelledError:
-            pass
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
         
     finally:
         # Disconnect Redis
@@ -1,6 +1,8 @@
 -- ============================================================
 -- Zakynthos seed data
 -- Owner password: Test1234
+-- After loading, run `redis-cli DEL gen:spot_ids` so running API workers
+-- rebuild their spot ID filters instead of 404ing the new spots
 -- ============================================================
 
 -- Owner user
@@ -10,6 +10,7 @@ source venv/bin/activate
 
 # Configuration
 WORKERS=12
+export WEB_CONCURRENCY=$WORKERS   # lets DB_CONNECTION_BUDGET split connections across workers
 API_PORT=8000
 API_HOST="0.0.0.0"
 
@@ -34,6 +35,10 @@ cleanup() {
 
 trap cleanup SIGINT SIGTERM
 
+# Apply migrations once; the API workers only verify the schema revision at boot
+echo "0️⃣ Applying database migrations..."
+python init_db.py
+
 # Start background tasks worker
 echo "1️⃣ Starting background tasks worker..."
 ENABLE_BACKGROUND_TASKS=false python run_background_tasks.py &
@@ -8,6 +8,10 @@ source venv/bin/activate
 # With 20 cores: 8-16 workers recommended
 # Using 12 workers for production balance
 WORKERS=12
+export WEB_CONCURRENCY=$WORKERS   # lets DB_CONNECTION_BUDGET split connections across workers
+
+# Apply migrations once; the workers only verify the schema revision at boot
+python init_db.py || exit 1
 
 # Start Uvicorn with multiple workers
 echo "🚀 Starting ParkingSpots API with $WORKERS workers..."
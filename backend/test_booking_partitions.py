@@ -0,0 +1,283 @@
+"""
+Booking partitions integration test
+───────────────────────────────────
+Runs the alembic migrations against a scratch PostgreSQL database and checks
+the partitioned bookings schema (revisions 0003 and 0007) end to end:
+
+  • a booking written before 0003 survives the rewrite, and 0007 backfills
+    booking_ids for it
+  • each live month partition rejects overlapping active bookings
+  • a duplicate booking id is rejected even when it lands in another partition
+  • reviews and payouts reference booking ids; a dangling id is rejected
+  • archive_finished_bookings moves rows to the archive side without
+    touching booking_ids, so the reviews and payouts pointing at them stay valid
+  • start_time moving a booking to another month, and ensure_booking_partitions
+    moving rows out of a default partition, both keep booking_ids intact
+  • deleting a referenced booking fails; deleting an unreferenced one frees its id
+  • downgrading to 0002 restores the plain table, its foreign keys and
+    no_overlapping_bookings, with every booking kept, and upgrading to head
+    again works
+
+The database must be empty (or disposable): the test drops and recreates its
+public schema. It needs the btree_gist extension to be available.
+
+Usage:
+  DATABASE_URL=postgresql+asyncpg://postgres@localhost:5432/parking_test python test_booking_partitions.py
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+if not os.environ.get("DATABASE_URL", "").startswith("postgresql"):
+    sys.exit("Set DATABASE_URL to a scratch PostgreSQL database (see the docstring)")
+os.environ["DATABASE_DIRECT_URL"] = ""   # migrate over the same URL
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError, DBAPIError
+
+from app.core.config import settings
+from app.db.partitions import archive_finished_bookings
+from app.db.session import engine, AsyncSessionLocal
+# Register every model so the Booking mapper's relationships resolve
+from app.models.user import User
+from app.models.parking_spot import ParkingSpot
+from app.models.booking import Booking
+from app.models.payment import Payment, Payout
+from app.models.review import Review
+
+B="\033[1m"; G="\033[32m"; R="\033[31m"; X="\033[0m"
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class Check:
+    def __init__(self):
+        self.failures = 0
+
+    def expect(self, ok: bool, label: str):
+        print(f"  {G}✓{X} {label}" if ok else f"  {R}✗{X} {label}")
+        if not ok:
+            self.failures += 1
+
+
+def alembic(*args):
+    """Run an alembic command against DATABASE_URL; output only shown on failure."""
+    result = subprocess.run(
+        [sys.executable, "-m", "alembic", *args], cwd=HERE, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stdout + result.stderr)
+        raise RuntimeError(f"alembic {' '.join(args)} failed")
+
+
+async def scalar(sql: str, **params):
+    async with engine.connect() as conn:
+        return (await conn.execute(text(sql), params)).scalar()
+
+
+async def execute(sql: str, **params):
+    async with engine.begin() as conn:
+        await conn.execute(text(sql), params)
+
+
+async def rejected(sql: str, **params) -> bool:
+    """Whether the statement fails with an integrity error."""
+    try:
+        await execute(sql, **params)
+    except (IntegrityError, DBAPIError):
+        return True
+    return False
+
+
+async def partition_of(booking_id: uuid.UUID) -> str:
+    return await scalar(
+        "SELECT tableoid::regclass::text FROM bookings WHERE id = :id", id=booking_id
+    )
+
+
+async def has_booking_id(booking_id: uuid.UUID) -> bool:
+    return bool(await scalar("SELECT count(*) FROM booking_ids WHERE id = :id", id=booking_id))
+
+
+INSERT_BOOKING = """
+    INSERT INTO bookings (id, user_id, parking_spot_id, start_time, end_time, status, total_amount,
+                          created_at, updated_at)
+    VALUES (:id, :user_id, :spot_id, :start, :end, :status, 1000, now(), now())
+"""
+
+
+async def book(user_id, spot_id, start, hours=2, status="CONFIRMED", booking_id=None):
+    booking_id = booking_id or uuid.uuid4()
+    await execute(
+        INSERT_BOOKING, id=booking_id, user_id=user_id, spot_id=spot_id,
+        start=start, end=start + timedelta(hours=hours), status=status
+    )
+    return booking_id
+
+
+async def main() -> int:
+    check = Check()
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    next_month = (now.replace(day=1) + timedelta(days=32)).replace(day=1, hour=10)
+    user_id, spot_id = uuid.uuid4(), uuid.uuid4()
+
+    await execute("DROP SCHEMA public CASCADE")
+    await execute("CREATE SCHEMA public")
+    try:
+        print(f"\n{B}Before partitioning (0002){X}")
+        alembic("upgrade", "0002")
+        await execute(
+            "INSERT INTO users (id, email, full_name, role, created_at, updated_at) "
+            "VALUES (:id, 'owner@example.com', 'Partition Test', 'OWNER', now(), now())",
+            id=user_id
+        )
+        await execute(
+            "INSERT INTO parking_spots (id, owner_id, title, address, city, prefecture, zip_code, "
+            "latitude, longitude, hourly_rate, created_at, updated_at) VALUES (:id, :owner, 'Spot', "
+            "'1 Main St', 'Zakynthos', 'Ionian Islands', '29100', 37.78, 20.89, 500, now(), now())",
+            id=spot_id, owner=user_id
+        )
+        # Finished long enough ago to be archived later
+        old = now - timedelta(days=settings.BOOKING_ARCHIVE_AFTER_DAYS + 45)
+        legacy_id = await book(user_id, spot_id, old, status="COMPLETED")
+        check.expect(await scalar("SELECT count(*) FROM bookings") == 1, "legacy booking written")
+
+        print(f"\n{B}Upgrade to head{X}")
+        alembic("upgrade", "head")
+        check.expect(
+            await scalar("SELECT count(*) FROM pg_partitioned_table WHERE partrelid = 'bookings'::regclass") == 1,
+            "bookings is partitioned"
+        )
+        check.expect(
+            await partition_of(legacy_id) == f"bookings_{old:%Y_%m}",
+            "legacy booking landed in its month partition"
+        )
+        check.expect(await has_booking_id(legacy_id), "booking_ids backfilled")
+
+        print(f"\n{B}Bookings{X}")
+        live_id = await book(user_id, spot_id, next_month)
+        check.expect(await has_booking_id(live_id), "new booking registered in booking_ids")
+        check.expect(
+            await rejected(INSERT_BOOKING, id=uuid.uuid4(), user_id=user_id, spot_id=spot_id,
+                           start=next_month + timedelta(hours=1), end=next_month + timedelta(hours=4),
+                           status="PENDING"),
+            "overlapping active booking rejected by the month partition"
+        )
+        cancelled_id = await book(user_id, spot_id, next_month + timedelta(hours=1), status="CANCELLED")
+        check.expect(bool(cancelled_id), "overlapping cancelled booking allowed")
+        check.expect(
+            await rejected(INSERT_BOOKING, id=live_id, user_id=user_id, spot_id=spot_id,
+                           start=next_month + timedelta(days=40), end=next_month + timedelta(days=40, hours=2),
+                           status="CONFIRMED"),
+            "duplicate booking id in another partition rejected"
+        )
+
+        print(f"\n{B}Foreign keys into booking_ids{X}")
+        review_id, payout_id = uuid.uuid4(), uuid.uuid4()
+        await execute(
+            "INSERT INTO reviews (id, booking_id, parking_spot_id, reviewer_id, overall_rating, "
+            "created_at, updated_at) VALUES (:id, :booking, :spot, :user, 5, now(), now())",
+            id=review_id, booking=legacy_id, spot=spot_id, user=user_id
+        )
+        await execute(
+            "INSERT INTO payouts (id, owner_id, booking_id, amount, status, created_at, updated_at) "
+            "VALUES (:id, :owner, :booking, 850, 'PENDING', now(), now())",
+            id=payout_id, owner=user_id, booking=legacy_id
+        )
+        check.expect(
+            await scalar(
+                "SELECT (SELECT count(*) FROM reviews WHERE booking_id = :id) "
+                "+ (SELECT count(*) FROM payouts WHERE booking_id = :id)", id=legacy_id
+            ) == 2,
+            "review and payout reference the legacy booking"
+        )
+        check.expect(
+            await rejected(
+                "INSERT INTO reviews (id, booking_id, parking_spot_id, reviewer_id, overall_rating, "
+                "created_at, updated_at) VALUES (:id, :booking, :spot, :user, 5, now(), now())",
+                id=uuid.uuid4(), booking=uuid.uuid4(), spot=spot_id, user=user_id
+            ),
+            "review for a missing booking rejected"
+        )
+
+        print(f"\n{B}Archival and partition moves{X}")
+        async with AsyncSessionLocal() as db:
+            archived = await archive_finished_bookings(db)
+        check.expect(archived == 1, f"archive_finished_bookings moved {archived} booking(s)")
+        check.expect(
+            await partition_of(legacy_id) == f"bookings_archive_{old:%Y_%m}",
+            "legacy booking now in the archive partition"
+        )
+        check.expect(await has_booking_id(legacy_id), "booking_ids kept across archival")
+
+        await execute(
+            "UPDATE bookings SET start_time = start_time + interval '40 days', "
+            "end_time = end_time + interval '40 days' WHERE id = :id", id=live_id
+        )
+        check.expect(await partition_of(live_id) != f"bookings_{next_month:%Y_%m}", "booking moved month")
+        check.expect(await has_booking_id(live_id), "booking_ids kept across a month move")
+        await execute("UPDATE bookings SET status = 'IN_PROGRESS' WHERE id = :id", id=live_id)
+        check.expect(await has_booking_id(live_id), "booking_ids kept across an in-place update")
+        check.expect(
+            await rejected("UPDATE bookings SET id = :new WHERE id = :id", new=uuid.uuid4(), id=live_id),
+            "changing a booking id rejected"
+        )
+
+        far = (now.replace(day=1) + timedelta(days=31 * (settings.BOOKING_PARTITION_MONTHS_AHEAD + 14))).replace(day=3)
+        parked_id = await book(user_id, spot_id, far)
+        check.expect(await partition_of(parked_id) == "bookings_active_default", "far-future booking parked in default")
+        await execute("SELECT ensure_booking_partitions(:month, :month)", month=far.date())
+        check.expect(await partition_of(parked_id) == f"bookings_{far:%Y_%m}", "ensure_booking_partitions moved it out")
+        check.expect(await has_booking_id(parked_id), "booking_ids kept across the default partition move")
+
+        print(f"\n{B}Deletes{X}")
+        check.expect(
+            await rejected("DELETE FROM bookings WHERE id = :id", id=legacy_id),
+            "deleting a reviewed booking rejected"
+        )
+        await execute("DELETE FROM bookings WHERE id = :id", id=cancelled_id)
+        check.expect(not await has_booking_id(cancelled_id), "deleting a booking frees its id")
+
+        print(f"\n{B}Downgrade to 0002 and back{X}")
+        total = await scalar("SELECT count(*) FROM bookings")
+        alembic("downgrade", "0002")
+        check.expect(
+            await scalar("SELECT count(*) FROM pg_partitioned_table") == 0, "bookings is a plain table again"
+        )
+        check.expect(await scalar("SELECT count(*) FROM bookings") == total, f"all {total} bookings kept")
+        check.expect(
+            not await scalar(
+                "SELECT count(*) FROM information_schema.columns "
+                "WHERE table_name = 'bookings' AND column_name = 'archived'"
+            ),
+            "archived column dropped"
+        )
+        check.expect(
+            await scalar(
+                "SELECT count(*) FROM pg_constraint WHERE contype = 'f' AND confrelid = 'bookings'::regclass"
+            ) == 3,
+            "reviews, payments and payouts reference bookings again"
+        )
+        check.expect(
+            await rejected(INSERT_BOOKING, id=uuid.uuid4(), user_id=user_id, spot_id=spot_id,
+                           start=far + timedelta(hours=1), end=far + timedelta(hours=3), status="CONFIRMED"),
+            "no_overlapping_bookings restored"
+        )
+        alembic("upgrade", "head")
+        check.expect(await scalar("SELECT count(*) FROM booking_ids") == total, "upgrade to head again")
+    finally:
+        await engine.dispose()
+
+    print()
+    if check.failures:
+        print(f"{R}{check.failures} checks failed{X}")
+        return 1
+    print(f"{G}Booking partitions behave as expected{X}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,165 @@
+"""
+Google ID token verifier test
+─────────────────────────────
+Exercises GoogleIdTokenVerifier against a local stand-in for Google's JWKS
+endpoint (an httpx MockTransport serving freshly generated RSA keys), so it
+needs no network and no Google credentials:
+
+  • valid tokens verify; the key set is fetched once and then cached
+  • wrong audience / issuer, expired, tampered and unknown-key tokens fail
+  • a rotated-in key triggers exactly one refetch
+  • an expired key set keeps verifying while it refreshes in the background
+  • verification latency with a warm cache
+
+Usage:
+  python test_google_verifier.py
+"""
+import asyncio
+import base64
+import sys
+import time
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwt
+
+from app.core.google_tokens import GoogleIdTokenVerifier, InvalidGoogleToken
+
+CLIENT_ID = "test-client.apps.googleusercontent.com"
+CERTS_URL = "https://stand-in.test/oauth2/v3/certs"
+LATENCY_ROUNDS = 1000
+
+B="\033[1m"; G="\033[32m"; R="\033[31m"; X="\033[0m"
+
+
+def _b64(number: int) -> str:
+    raw = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+class StandInKey:
+    def __init__(self, kid: str):
+        self.kid = kid
+        self.private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.pem = self.private.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+
+    def jwk(self) -> dict:
+        numbers = self.private.public_key().public_numbers()
+        return {"kty": "RSA", "alg": "RS256", "use": "sig", "kid": self.kid,
+                "n": _b64(numbers.n), "e": _b64(numbers.e)}
+
+    def sign(self, **overrides) -> str:
+        now = int(time.time())
+        claims = {
+            "iss": "https://accounts.google.com", "aud": CLIENT_ID, "sub": "1234567890",
+            "email": "stand-in@example.com", "email_verified": True,
+            "iat": now, "exp": now + 3600,
+        }
+        claims.update(overrides)
+        return jwt.encode(claims, self.pem, algorithm="RS256", headers={"kid": self.kid})
+
+
+class StandInJwks:
+    """What Google's certs endpoint would serve, with a configurable max-age."""
+
+    def __init__(self, keys, max_age: int = 3600):
+        self.keys = list(keys)
+        self.max_age = max_age
+        self.requests = 0
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        return httpx.Response(
+            200,
+            json={"keys": [key.jwk() for key in self.keys]},
+            headers={"Cache-Control": f"public, max-age={self.max_age}, must-revalidate, no-transform"},
+        )
+
+
+class Check:
+    def __init__(self):
+        self.failures = 0
+
+    def expect(self, ok: bool, label: str):
+        print(f"  {G}✓{X} {label}" if ok else f"  {R}✗{X} {label}")
+        if not ok:
+            self.failures += 1
+
+    async def rejects(self, verifier, token, label):
+        try:
+            await verifier.verify(token)
+        except InvalidGoogleToken:
+            self.expect(True, label)
+        else:
+            self.expect(False, label)
+
+
+def make_verifier(jwks: StandInJwks) -> GoogleIdTokenVerifier:
+    return GoogleIdTokenVerifier(
+        certs_url=CERTS_URL,
+        client_id=CLIENT_ID,
+        transport=httpx.MockTransport(jwks.handler),
+        min_refetch_interval=0,
+    )
+
+
+async def main() -> int:
+    check = Check()
+    first, second = StandInKey("key-1"), StandInKey("key-2")
+
+    print(f"\n{B}Verification and caching{X}")
+    jwks = StandInJwks([first])
+    verifier = make_verifier(jwks)
+    claims = await verifier.verify(first.sign())
+    check.expect(claims["email"] == "stand-in@example.com", "valid token verifies")
+    await verifier.verify(first.sign(sub="other"))
+    check.expect(jwks.requests == 1, f"key set fetched once for two verifications ({jwks.requests})")
+
+    print(f"\n{B}Rejections{X}")
+    await check.rejects(verifier, first.sign(aud="someone-else"), "wrong audience")
+    await check.rejects(verifier, first.sign(iss="https://evil.example.com"), "wrong issuer")
+    await check.rejects(verifier, first.sign(exp=int(time.time()) - 120), "expired token")
+    token = first.sign()
+    head, payload, signature = token.split(".")
+    await check.rejects(verifier, f"{head}.{payload}.{signature[::-1]}", "tampered signature")
+    await check.rejects(verifier, second.sign(), "key not in the published set")
+    await check.rejects(verifier, "not-a-jwt", "malformed token")
+
+    print(f"\n{B}Key rotation{X}")
+    jwks.keys.append(second)
+    before = jwks.requests
+    await verifier.verify(second.sign())
+    check.expect(jwks.requests == before + 1, "rotated-in key verifies after one refetch")
+
+    print(f"\n{B}Expired key set{X}")
+    jwks = StandInJwks([first], max_age=1)
+    verifier = make_verifier(jwks)
+    await verifier.verify(first.sign())
+    await asyncio.sleep(1.1)
+    started = time.perf_counter()
+    await verifier.verify(first.sign())
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    await asyncio.sleep(0.05)
+    check.expect(jwks.requests == 2, f"stale keys still verify ({elapsed_ms:.2f}ms), refreshed in the background")
+
+    print(f"\n{B}Latency with a warm cache{X}")
+    token = first.sign()
+    started = time.perf_counter()
+    for _ in range(LATENCY_ROUNDS):
+        await verifier.verify(token)
+    per_call = (time.perf_counter() - started) * 1000 / LATENCY_ROUNDS
+    print(f"  {per_call:.3f}ms per verification, {jwks.requests} key set fetches in total")
+
+    print()
+    if check.failures:
+        print(f"{R}{check.failures} checks failed{X}")
+        return 1
+    print(f"{G}Google ID token verifier behaves as expected{X}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
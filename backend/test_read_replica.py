@@ -0,0 +1,160 @@
+"""
+Read replica routing test
+─────────────────────────
+Runs the API in-process (httpx against the ASGI app) with two SQLite files
+standing in for a primary and a replica. "Replication" is copying the
+primary file over the replica, so the replica lags until the test copies it:
+
+  • reads go to the replica (a spot written to the primary 404s there)
+  • a 404 served by the replica is not negative-cached
+  • after a write, the sticky cookie or header pins reads to the primary
+  • reads fall back to the primary when the replica lags past the limit
+    or fails its health check
+
+Needs no services; Redis is not connected, so caching stays out of the way.
+
+Usage:
+  python test_read_replica.py
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+
+WORKDIR = tempfile.mkdtemp(prefix="urbee-replica-")
+PRIMARY = os.path.join(WORKDIR, "primary.db")
+REPLICA = os.path.join(WORKDIR, "replica.db")
+
+# Must be set before the app (and its settings) are imported
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{PRIMARY}"
+os.environ["DATABASE_REPLICA_URL"] = f"sqlite+aiosqlite:///{REPLICA}"
+os.environ["SPOT_BLOOM_ENABLED"] = "false"   # the filter would answer unknown IDs itself
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+import httpx
+
+from app.main import app
+from app.api.v1.endpoints import parking_spots
+from app.core.config import settings
+from app.db.base import Base
+from app.db.session import (
+    engine, read_engine, replica_state, check_replica_lag, STICKY_COOKIE, STICKY_HEADER
+)
+
+BASE = "/api/v1"
+PASSWORD = "Test1234!"
+
+B="\033[1m"; G="\033[32m"; R="\033[31m"; X="\033[0m"
+
+
+class Check:
+    def __init__(self):
+        self.failures = 0
+
+    def expect(self, ok: bool, label: str):
+        print(f"  {G}✓{X} {label}" if ok else f"  {R}✗{X} {label}")
+        if not ok:
+            self.failures += 1
+
+
+async def replicate():
+    """Bring the replica up to date with the primary."""
+    await read_engine.dispose()
+    shutil.copyfile(PRIMARY, REPLICA)
+
+
+def client(transport):
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+async def main() -> int:
+    check = Check()
+    run = uuid.uuid4().hex[:8]
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+
+    # Negative-cache writes are recorded instead of going to Redis
+    remembered = []
+
+    async def record_missing(kind, entity_id):
+        remembered.append((kind, entity_id))
+
+    parking_spots.remember_missing = record_missing
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await replicate()
+    await check_replica_lag()
+
+    async with client(transport) as writer, client(transport) as reader:
+        print(f"\n{B}Reads go to the replica{X}")
+        r = await writer.post(f"{BASE}/auth/register",
+                              json={"email": f"replica-{run}@example.com", "full_name": "Replica Test", "password": PASSWORD})
+        r.raise_for_status()
+        r = await writer.post(f"{BASE}/auth/login", json={"email": f"replica-{run}@example.com", "password": PASSWORD})
+        r.raise_for_status()
+        auth = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+        r = await writer.post(f"{BASE}/parking-spots/", headers=auth, json={
+            "title": f"Replica test spot {run}",
+            "address": "1 Test Street",
+            "city": "Zakynthos",
+            "prefecture": "Ionian Islands",
+            "zip_code": "29100",
+            "latitude": 37.78,
+            "longitude": 20.89,
+            "hourly_rate": 300,
+        })
+        check.expect(r.status_code == 201, f"spot created on the primary ({r.status_code})")
+        spot_id = r.json()["id"]
+        sticky = r.headers.get(STICKY_HEADER)
+        check.expect(bool(sticky) and STICKY_COOKIE in r.cookies, "write response pins the client (cookie and header)")
+
+        r = await reader.get(f"{BASE}/parking-spots/{spot_id}")
+        check.expect(r.status_code == 404, f"unpinned read served by the lagging replica ({r.status_code})")
+        check.expect(not remembered, "replica 404 is not negative-cached")
+
+        print(f"\n{B}Read-your-writes{X}")
+        r = await writer.get(f"{BASE}/parking-spots/{spot_id}")
+        check.expect(r.status_code == 200, f"sticky cookie reads from the primary ({r.status_code})")
+        r = await reader.get(f"{BASE}/parking-spots/{spot_id}", headers={STICKY_HEADER: sticky})
+        check.expect(r.status_code == 200, f"sticky header reads from the primary ({r.status_code})")
+        r = await reader.get(f"{BASE}/parking-spots/{spot_id}", headers={STICKY_HEADER: "0"})
+        check.expect(r.status_code == 404, f"expired pin reads from the replica again ({r.status_code})")
+
+        print(f"\n{B}Fallback to the primary{X}")
+        replica_state.lag_seconds = settings.DB_REPLICA_MAX_LAG + 1
+        r = await reader.get(f"{BASE}/parking-spots/{spot_id}")
+        check.expect(r.status_code == 200, f"replica lagging past DB_REPLICA_MAX_LAG: primary ({r.status_code})")
+        replica_state.lag_seconds = 0.0
+        replica_state.healthy = False
+        r = await reader.get(f"{BASE}/parking-spots/{spot_id}")
+        check.expect(r.status_code == 200, f"unhealthy replica: primary ({r.status_code})")
+        await check_replica_lag()
+        check.expect(replica_state.usable, "next health check puts the replica back in rotation")
+
+        print(f"\n{B}Replica catches up{X}")
+        await replicate()
+        r = await reader.get(f"{BASE}/parking-spots/{spot_id}")
+        check.expect(r.status_code == 200, f"unpinned read finds the replicated spot ({r.status_code})")
+
+        missing = str(uuid.uuid4())
+        replica_state.lag_seconds = settings.DB_REPLICA_MAX_LAG + 1
+        r = await reader.get(f"{BASE}/parking-spots/{missing}")
+        check.expect(r.status_code == 404 and remembered == [("spot", missing)],
+                     "a 404 from the primary is still negative-cached")
+
+    await engine.dispose()
+    await read_engine.dispose()
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+    print()
+    if check.failures:
+        print(f"{R}{check.failures} checks failed{X}")
+        return 1
+    print(f"{G}Replica routing behaves as expected{X}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
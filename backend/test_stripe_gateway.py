@@ -0,0 +1,178 @@
+"""
+Stripe gateway test
+───────────────────
+Exercises StripeGateway against the in-process fake Stripe (fake_stripe.py,
+over httpx's ASGI transport), so it needs no network and no Stripe account:
+
+  • the payment flow the routes use: customer, intent, payment method, refund
+  • Stripe's refusals (declined card, bad refund) are not retried
+  • 500s and timeouts are retried with one Idempotency-Key, so a response
+    lost in transit never creates an object twice
+  • the circuit opens after repeated failures, fails fast, then recovers
+  • concurrent calls overlap instead of queueing behind each other
+
+Usage:
+  python test_stripe_gateway.py
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+from app.core.stripe_gateway import CircuitBreaker, StripeError, StripeGateway, StripeUnavailable
+from fake_stripe import Faults, create_app
+
+CONCURRENT_CALLS = 200
+FAKE_LATENCY_MS = 20
+
+B="\033[1m"; G="\033[32m"; R="\033[31m"; X="\033[0m"
+
+
+class FlakyTransport(httpx.AsyncBaseTransport):
+    """ASGI transport that can time out before a request, or after it was handled."""
+
+    def __init__(self, app):
+        self._inner = httpx.ASGITransport(app=app)
+        self.timeout_next = 0
+        self.lose_response_next = 0
+
+    async def handle_async_request(self, request):
+        if self.timeout_next:
+            self.timeout_next -= 1
+            raise httpx.ReadTimeout("stand-in timeout", request=request)
+        response = await self._inner.handle_async_request(request)
+        if self.lose_response_next:
+            self.lose_response_next -= 1
+            await response.aread()
+            raise httpx.ReadTimeout("response lost", request=request)
+        return response
+
+
+class Check:
+    def __init__(self):
+        self.failures = 0
+
+    def expect(self, ok: bool, label: str):
+        print(f"  {G}✓{X} {label}" if ok else f"  {R}✗{X} {label}")
+        if not ok:
+            self.failures += 1
+
+    async def raises(self, call, error_type, label):
+        try:
+            await call
+        except error_type as e:
+            self.expect(True, f"{label} ({type(e).__name__}: {e.message})")
+            return e
+        except Exception as e:
+            self.expect(False, f"{label} (got {type(e).__name__})")
+        else:
+            self.expect(False, f"{label} (no error)")
+
+
+async def fake_stats(client) -> dict:
+    return (await client.get("/_fake/stats")).json()
+
+
+async def main() -> int:
+    check = Check()
+    faults = Faults()
+    app = create_app(faults)
+    transport = FlakyTransport(app)
+    breaker = CircuitBreaker(threshold=3, cooldown=0.5)
+    gateway = StripeGateway(
+        api_key="sk_test_fake", api_base="http://fake-stripe", transport=transport,
+        max_retries=2, breaker=breaker,
+    )
+    control = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake-stripe")
+
+    print(f"\n{B}Payment flow{X}")
+    customer = await gateway.create_customer(email="renter@example.com", name="Renter", metadata={"user_id": "42"})
+    check.expect(customer["metadata"] == {"user_id": "42"}, "customer created with nested metadata")
+    intent = await gateway.create_payment_intent(
+        amount=2500, currency="usd", customer=customer["id"],
+        metadata={"booking_id": "b1"}, automatic_payment_methods={"enabled": True},
+    )
+    check.expect(intent["client_secret"].startswith(intent["id"]), "payment intent has a client secret")
+    await gateway.request("POST", f"/v1/payment_intents/{intent['id']}/confirm", {"payment_method": "pm_card_visa"})
+    intent = await gateway.retrieve_payment_intent(intent["id"])
+    check.expect(intent["status"] == "succeeded", "confirmed intent reads back as succeeded")
+    method = await gateway.retrieve_payment_method(intent["payment_method"])
+    check.expect(method["card"]["last4"] == "4242", "payment method card details")
+    refund = await gateway.create_refund(payment_intent=intent["id"], amount=1000, reason="requested_by_customer")
+    check.expect(refund["amount"] == 1000, "partial refund")
+    account = await gateway.create_account(type="express", country="US", capabilities={"transfers": {"requested": True}})
+    link = await gateway.create_account_link(account=account["id"], type="account_onboarding")
+    check.expect(link["url"].startswith("https://"), "Connect account and onboarding link")
+
+    print(f"\n{B}Refusals are not retried{X}")
+    before = gateway.requests
+    await check.raises(
+        gateway.create_refund(payment_intent=intent["id"], amount=5000), StripeError, "over-refund refused"
+    )
+    declined = await gateway.create_payment_intent(amount=500, currency="usd")
+    await check.raises(
+        gateway.request("POST", f"/v1/payment_intents/{declined['id']}/confirm", {"payment_method": "pm_card_chargeDeclined"}),
+        StripeError, "declined card"
+    )
+    check.expect(gateway.requests - before == 3, f"one attempt each ({gateway.requests - before} requests for 3 calls)")
+    check.expect(breaker.state == "closed", "refusals don't count against the circuit")
+
+    print(f"\n{B}Retries{X}")
+    retries, customers = gateway.retries, (await fake_stats(control))["customers"]
+    faults.fail_next = 2
+    await gateway.create_customer(email="retry@example.com")
+    check.expect(gateway.retries - retries == 2, "two 500s retried, third attempt succeeds")
+    transport.timeout_next = 1
+    await gateway.create_customer(email="timeout@example.com")
+    transport.lose_response_next = 1
+    await gateway.create_customer(email="lost@example.com")
+    stats = await fake_stats(control)
+    check.expect(stats["customers"] - customers == 3, f"three customers, none duplicated ({stats['customers'] - customers})")
+    check.expect(stats["idempotent_replays"] == 1, "lost response recovered by an idempotent replay")
+    transport.timeout_next = 3
+    await check.raises(gateway.retrieve_payment_intent(intent["id"]), StripeUnavailable, "timeouts past the retry budget")
+
+    print(f"\n{B}Circuit breaker{X}")
+    faults.fail_next = 100
+    for _ in range(breaker.threshold):
+        try:
+            await gateway.retrieve_payment_intent(intent["id"])
+        except StripeUnavailable:
+            pass
+    check.expect(breaker.state == "open", f"open after {breaker.threshold} consecutive failed calls")
+    requests = (await fake_stats(control))["requests"]
+    started = time.perf_counter()
+    error = await check.raises(gateway.retrieve_payment_intent(intent["id"]), StripeUnavailable, "open circuit fails fast")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    check.expect(
+        (await fake_stats(control))["requests"] == requests and elapsed_ms < 5,
+        f"no request sent ({elapsed_ms:.2f}ms), Retry-After {error.retry_after if error else 0:.2f}s"
+    )
+    faults.fail_next = 0
+    await asyncio.sleep(breaker.cooldown)
+    await gateway.retrieve_payment_intent(intent["id"])
+    check.expect(breaker.state == "closed", "a successful probe closes it again")
+
+    print(f"\n{B}Concurrency{X}")
+    faults.latency_ms = FAKE_LATENCY_MS
+    started = time.perf_counter()
+    await asyncio.gather(*(gateway.retrieve_payment_intent(intent["id"]) for _ in range(CONCURRENT_CALLS)))
+    elapsed = time.perf_counter() - started
+    serial = CONCURRENT_CALLS * FAKE_LATENCY_MS / 1000
+    check.expect(elapsed < serial / 4, f"{CONCURRENT_CALLS} calls at {FAKE_LATENCY_MS}ms each took {elapsed:.2f}s (serial: {serial:.1f}s)")
+
+    await gateway.close()
+    await control.aclose()
+    print(f"\n  gateway stats: {gateway.stats()}")
+
+    print()
+    if check.failures:
+        print(f"{R}{check.failures} checks failed{X}")
+        return 1
+    print(f"{G}Stripe gateway behaves as expected{X}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))